@@ -0,0 +1,73 @@
+"""
+Times queries against the Surveyor's annotation index for a synthetic run, comparing each with a full scan of the
+sequences' features, as was needed before the index.
+
+    python -m benchmarks.annotation_index [n_sequences] [features_per_sequence]
+"""
+
+import random
+import sys
+import time
+from collections import Counter
+
+from residual.protein_sequence import ProteinSequence, Feature, GoTerm
+from residual.surveyor.annotation_index import AnnotationIndex
+
+CATEGORIES = ['BIOLOGICAL_PROCESS', 'MOLECULAR_FUNCTION', 'CELLULAR_COMPONENT']
+
+
+def _synthetic_sequences(n: int, per_sequence: int) -> list[ProteinSequence]:
+    rng = random.Random(0)
+    terms = [GoTerm(f'GO:{i:07}', rng.choice(CATEGORIES), f'Term {i}') for i in range(3000)]
+    sequences = []
+    for i in range(n):
+        seq = ProteinSequence(f'seq_{i}', 'M')
+        seq.add_features([Feature(rng.choice(['InterProScan', 'Hydropathy']), f'IPR{rng.randrange(20000):06}',
+                                  [(1, 10)], rng.sample(terms, rng.randrange(3)))
+                          for _ in range(per_sequence)])
+        sequences.append(seq)
+    return sequences
+
+
+def _best_of(repeats: int, query) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        query()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(n: int = 100_000, per_sequence: int = 5) -> None:
+
+    sequences = _synthetic_sequences(n, per_sequence)
+    index = AnnotationIndex()
+    start = time.perf_counter()
+    for seq in sequences:
+        index.add(seq)
+    print(f'Indexed {n} sequences ({n * per_sequence} features) in {time.perf_counter() - start:.2f} s')
+
+    go_id = index.most_common('go', 1)[0][0]
+    queries = {
+        f'sequences with {go_id}': (
+            lambda: index.sequences('go', go_id),
+            lambda: [seq.name for seq in sequences if any(t.id == go_id for ft in seq.features for t in ft.go_terms)]),
+        'count of one entry': (
+            lambda: index.count('name', 'IPR000001'),
+            lambda: sum(any(ft.name == 'IPR000001' for ft in seq.features) for seq in sequences)),
+        'sequences per service': (
+            lambda: index.counts('service'),
+            lambda: Counter(s for seq in sequences for s in {ft.service for ft in seq.features})),
+    }
+    for label, (indexed, scan) in queries.items():
+        indexed_time, scan_time = _best_of(20, indexed), _best_of(3, scan)
+        print(f'{label:<36}{indexed_time * 1e6:10.1f} us indexed  {scan_time * 1000:8.1f} ms scanning')
+
+    for label, query in {'counts of every entry': lambda: index.counts('name', service='InterProScan'),
+                         'GO category summary': index.summary,
+                         'top 10 entries': lambda: index.most_common('name', 10, service='InterProScan')}.items():
+        print(f'{label:<36}{_best_of(20, query) * 1e6:10.1f} us indexed')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,81 @@
+"""
+Compares the memory used by InterProScan-like result sets under each feature representation:
+plain dataclasses with a fresh GoTerm per reference (as features were originally stored), slotted features
+sharing interned GoTerms, and a columnar FeatureTable.
+
+    python -m benchmarks.feature_memory [n_features]
+"""
+
+import random
+import sys
+import tracemalloc
+from collections import namedtuple
+from dataclasses import dataclass, field
+
+from residual.protein_sequence import Feature, FeatureTable
+from residual.protein_sequence.feature import GoTermRegistry
+
+GoTerm = namedtuple('goTerm', ['id', 'category', 'name'])
+
+
+@dataclass
+class DictFeature:  # The original, un-slotted representation.
+    service: str
+    name: str
+    locations: list[tuple[int, int]] | None = field(default_factory=list)
+    go_terms: list = field(default_factory=list)
+
+
+def _synthetic_records(n_features: int, seed: int = 0) -> list[tuple]:
+    """Feature data drawn from a limited vocabulary of names and GO terms, as in real InterProScan output."""
+    rng = random.Random(seed)
+    names = [f'Domain family {i}' for i in range(2000)]
+    go_terms = [(f'GO:{i:07}', rng.choice(['BIOLOGICAL_PROCESS', 'MOLECULAR_FUNCTION', 'CELLULAR_COMPONENT']),
+                 f'process {i}') for i in range(3000)]
+    records = []
+    for _ in range(n_features):
+        start = rng.randint(1, 500)
+        locations = [(start, start + rng.randint(20, 200)) for _ in range(rng.randint(1, 3))]
+        records.append((rng.choice(names), locations, rng.sample(go_terms, rng.randint(0, 4))))
+    return records
+
+
+def _measure(build) -> int:
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def _original(records):
+    # Parsed JSON gives a distinct string and GoTerm object for every occurrence.
+    return [DictFeature('iprscan5', ''.join(name), [tuple(loc) for loc in locs],
+                        [GoTerm(*(''.join(v) for v in term)) for term in terms]) for name, locs, terms in records]
+
+
+def _slotted(records):
+    registry = GoTermRegistry()
+    return [Feature('iprscan5', sys.intern(''.join(name)), [tuple(loc) for loc in locs],
+                    [registry.intern(*term) for term in terms]) for name, locs, terms in records]
+
+
+def _columnar(records):
+    table = FeatureTable(GoTermRegistry())
+    table.add(Feature('iprscan5', name, locs, [GoTerm(*term) for term in terms]) for name, locs, terms in records)
+    return table
+
+
+def main(n_features: int = 200_000) -> None:
+    records = _synthetic_records(n_features)
+    baseline = _measure(lambda: _original(records))
+    print(f'{n_features} features')
+    for label, build in [('original dataclass', _original), ('slotted + interned', _slotted),
+                         ('columnar table', _columnar)]:
+        size = _measure(lambda: build(records)) if build is not _original else baseline
+        print(f'{label:<20} {size / 2**20:8.1f} MiB  {size / baseline:6.1%}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,79 @@
+"""
+Times rendering of feature-dense sequences to text, comparing SequenceDisplay with the original implementation,
+which re-inspected every feature with vars() and built the rows several times over to find column widths.
+
+    python -m benchmarks.rendering [n_sequences] [features_per_sequence]
+"""
+
+import io
+import random
+import sys
+import time
+from itertools import batched, chain, zip_longest
+
+from residual.protein_sequence import ProteinSequence, Feature, GoTerm, SequenceDisplay
+from residual.protein_sequence.encoding import ALPHABET
+
+
+class LegacyDisplay(SequenceDisplay):
+    """The original rendering path, for comparison."""
+
+    def feature_into_rows(self, ft: Feature):
+        columns = []
+        for prop in ft.__slots__:
+            if parser := getattr(self, f'_parse_{prop}', None):
+                columns.append(parser(getattr(ft, prop)))
+        return list(zip_longest(*columns, fillvalue=''))
+
+    def tabulate_features(self, features):
+        first_feature = features[0]
+        empty = [['' for _ in self.feature_into_rows(first_feature)[0]]]
+        rows = list(chain(*(self.feature_into_rows(ft) + empty for ft in features)))
+        widths = [max(max(map(len, col)), 15) + 2 for col in zip(*rows)]
+        row_layout = ''.join('{:<w}'.replace('w', str(size)) for size in widths)
+        headers = [row_layout.format(*[prop.capitalize() for prop in first_feature.__slots__])]
+        return headers + ['-' * sum(widths)] + [row_layout.format(*row) for row in rows]
+
+    def __str__(self):
+        seq_lines = [''.join(batch) for batch in batched(self.seq.sequence, 80)]
+        features = sorted(self.seq.features, key=lambda f: f.locations[0][0] if f.locations else 0)
+        feature_lines = self.tabulate_features(features) if features else []
+        return f">{self.seq.name}\n{'\n'.join(seq_lines)}\n\n{'\n'.join(feature_lines)}"
+
+
+def _synthetic_sequences(n_sequences: int, n_features: int, seed: int = 0) -> list[ProteinSequence]:
+    rng = random.Random(seed)
+    go_terms = [GoTerm(f'GO:{i:07}', 'MOLECULAR_FUNCTION', f'activity {i}') for i in range(500)]
+    sequences = []
+    for i in range(n_sequences):
+        seq = ProteinSequence(f'seq_{i}', ''.join(rng.choices(ALPHABET, k=rng.randint(200, 1000))))
+        for _ in range(n_features):
+            start = rng.randint(1, len(seq) - 50)
+            seq.features.append(Feature('iprscan5', f'Domain family {rng.randint(0, 2000)}',
+                                        [(start, start + rng.randint(10, 50)) for _ in range(rng.randint(1, 3))],
+                                        rng.sample(go_terms, rng.randint(0, 4))))
+        sequences.append(seq)
+    return sequences
+
+
+def _time(render, sequences) -> tuple[float, str]:
+    sink = io.StringIO()
+    start = time.perf_counter()
+    for seq in sequences:
+        render(seq, sink)
+    return time.perf_counter() - start, sink.getvalue()
+
+
+def main(n_sequences: int = 2000, n_features: int = 40) -> None:
+    sequences = _synthetic_sequences(n_sequences, n_features)
+    legacy_time, legacy_out = _time(lambda seq, sink: sink.write(LegacyDisplay(seq)() + '\n'), sequences)
+    new_time, new_out = _time(lambda seq, sink: SequenceDisplay(seq).write(sink), sequences)
+    assert legacy_out == new_out, 'Rendered output differs.'
+
+    print(f'{n_sequences} sequences x {n_features} features')
+    print(f'original   {legacy_time:7.3f} s')
+    print(f'current    {new_time:7.3f} s  ({legacy_time / new_time:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,77 @@
+"""
+Writes a synthetic run to a run store, then reopens it and times random lookups by name and rendering of the
+sequences found, reporting the Python memory allocated while doing so. Then times opening the store through
+Surveyor.open_store, and building its annotation index on first use.
+
+    python -m benchmarks.run_store [n_sequences] [features_per_sequence]
+"""
+
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from residual.protein_sequence import ProteinSequence, Feature, GoTerm, SequenceDisplay
+from residual.protein_sequence.alphabet import ALPHABET
+from residual.surveyor import Surveyor
+from residual.surveyor.run_store import RunStore, RunStoreWriter
+
+
+def _synthetic_sequence(rng: random.Random, i: int, per_sequence: int, terms: list[GoTerm]) -> ProteinSequence:
+    seq = ProteinSequence(f'seq_{i}', ''.join(rng.choices(ALPHABET, k=rng.randint(100, 600))))
+    seq.add_features([Feature('iprscan5', f'Family {rng.randrange(20000)}', [(1, 50), (60, 90)],
+                              rng.sample(terms, rng.randrange(3))) for _ in range(per_sequence)])
+    return seq
+
+
+def main(n: int = 200_000, per_sequence: int = 5) -> None:
+
+    rng = random.Random(0)
+    terms = [GoTerm(f'GO:{i:07}', 'MOLECULAR_FUNCTION', f'Term {i}') for i in range(3000)]
+    path = os.path.join(tempfile.mkdtemp(), 'run.rstore')
+
+    start = time.perf_counter()
+    writer = RunStoreWriter(path)
+    for i in range(n):
+        writer.add(_synthetic_sequence(rng, i, per_sequence, terms))
+    writer.close()
+    print(f'Wrote {n} sequences ({os.path.getsize(path) / 2 ** 20:.0f} MiB) in {time.perf_counter() - start:.1f} s')
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    store = RunStore(path)
+    print(f'Opened in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    names = [f'seq_{rng.randrange(n)}' for _ in range(10_000)]
+    start = time.perf_counter()
+    for name in names:
+        store.index_of(name)
+    print(f'Lookup by name: {(time.perf_counter() - start) / len(names) * 1e6:.1f} us')
+
+    start = time.perf_counter()
+    for name in names:
+        SequenceDisplay(store[name]).write(io.StringIO())
+    print(f'Lookup and render: {(time.perf_counter() - start) / len(names) * 1e6:.1f} us')
+    print(f'Peak Python memory while reading: {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MiB')
+    store.close()
+
+    tracemalloc.reset_peak()
+    surveyor = Surveyor(user_email='')
+    start = time.perf_counter()
+    surveyor.open_store(path)
+    print(f'Surveyor.open_store: {(time.perf_counter() - start) * 1000:.1f} ms, '
+          f'peak Python memory {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MiB')
+
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    surveyor.index.most_common('name', 10)
+    print(f'Index built on first use: {time.perf_counter() - start:.1f} s, '
+          f'peak Python memory {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MiB')
+    surveyor.sequences.close()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
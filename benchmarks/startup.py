@@ -0,0 +1,52 @@
+"""
+Times CLI startup in fresh interpreters: python -m residual --help, and importing the CLI then loading a selection
+of services, showing which heavy dependencies each selection pulls in.
+
+    python -m benchmarks.startup [repeats]
+"""
+
+import json
+import subprocess
+import sys
+import time
+
+SELECTIONS = {
+    'none': [],
+    'Composition': ['Composition'],
+    'InterProScan': ['InterProScan'],
+    'all': None,
+}
+
+_PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import residual.__main__
+from residual.services.loader import load_services
+load_services({names!r})
+print(json.dumps([time.perf_counter() - start, [m for m in ('numpy', 'aiohttp') if m in sys.modules]]))
+'''
+
+
+def _best_of(repeats: int, command: list[str]) -> tuple[float, str]:
+    best, output = float('inf'), ''
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def main(repeats: int = 5) -> None:
+
+    wall, _ = _best_of(repeats, [sys.executable, '-m', 'residual', '--help'])
+    print(f'{"residual --help":<28}{wall * 1000:8.1f} ms wall')
+
+    for label, names in SELECTIONS.items():
+        wall, output = _best_of(repeats, [sys.executable, '-c', _PROBE.format(names=names)])
+        imports, loaded = json.loads(output)
+        print(f'{"load " + label:<28}{wall * 1000:8.1f} ms wall  {imports * 1000:7.1f} ms importing  '
+              f'loads: {", ".join(loaded) or "-"}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
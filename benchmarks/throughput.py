@@ -0,0 +1,98 @@
+"""
+Runs InterProScan end to end through Surveyor.run against the local mock API, reporting sequences per second,
+the requests made to each endpoint and peak traced memory for each run size.
+
+    python -m benchmarks.throughput [--sizes 10 1000 100000] [--batch_jobs] [--latency 0.05] [--error_rate 0]
+
+The mock API runs in its own process, so peak memory is that of the run alone.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from aiohttp import ClientSession
+from loguru import logger
+
+from residual.protein_sequence import ProteinSequence
+from residual.protein_sequence.encoding import ALPHABET
+from residual.services.base_class import service_registry
+from residual.services.batching import BatchSizer
+from residual.services.http_client import RateLimit
+from residual.services.interpro_scan import InterProScan
+from residual.services.polling import PollingConfig
+from residual.surveyor import Surveyor
+from tests.mock_ebi import MockConfig, mock_server
+
+
+def _synthetic_sequences(n_sequences: int, seed: int = 0) -> dict[str, ProteinSequence]:
+    rng = random.Random(seed)
+    return {f'seq_{i}': ProteinSequence(f'seq_{i}', ''.join(rng.choices(ALPHABET, k=rng.randint(50, 500))))
+            for i in range(n_sequences)}
+
+
+async def _request_counts(base_url: str) -> dict[str, int]:
+    async with ClientSession() as session:
+        async with session.get(f'{base_url}stats') as res:
+            return (await res.json())['requests']
+
+
+def _run(sv: Surveyor, n_sequences: int, base_url: str) -> None:
+
+    sv.sequences = _synthetic_sequences(n_sequences)
+    before = asyncio.run(_request_counts(base_url))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        start = time.perf_counter()
+        sv.run(os.path.join(tmp, 'out.jsonl'))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    after = asyncio.run(_request_counts(base_url))
+    requests = {endpoint: after.get(endpoint, 0) - before.get(endpoint, 0) for endpoint in ('run', 'status', 'result')}
+    print(f'{n_sequences:>8}  {elapsed:8.2f} s  {n_sequences / elapsed:9.1f} seq/s  '
+          f'{requests["run"]:>7} run  {requests["status"]:>8} status  {requests["result"]:>7} result  '
+          f'{peak / 2**20:8.1f} MiB peak')
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1_000, 100_000])
+    parser.add_argument('--batch_jobs', action='store_true', help='Submit sequences in multi-FASTA batches.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds each mock job runs for.')
+    parser.add_argument('--failure_rate', type=float, default=0.0)
+    parser.add_argument('--error_rate', type=float, default=0.0)
+    parser.add_argument('--max_jobs', type=int, default=200)
+    parser.add_argument('--target_latency', type=float, default=10.0, help='Batch turnaround to aim for.')
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level='ERROR')
+    service_registry.clear()
+    service_registry['InterProScan'] = InterProScan
+
+    config = MockConfig(latency=args.latency, failure_rate=args.failure_rate, error_rate=args.error_rate)
+    with mock_server(config) as base_url:
+        options = {'base_url': base_url,
+                   'max_jobs': args.max_jobs,
+                   'rate_limit': RateLimit(rate=100_000, burst=1_000, max_connections=100),
+                   'polling': PollingConfig(initial_delay=args.latency, seconds_per_residue=0, max_delay=1, jitter=0.1),
+                   'batching': BatchSizer(target_latency=args.target_latency) if args.batch_jobs else None}
+        sv = Surveyor('benchmark@example.com', service_options={'InterProScan': options})
+
+        print(f'InterProScan against mock API, {args.latency} s jobs, '
+              f'{"batched" if args.batch_jobs else "one sequence per job"}, up to {args.max_jobs} jobs at once')
+        for n_sequences in args.sizes:
+            _run(sv, n_sequences, base_url)
+
+
+if __name__ == '__main__':
+    main()
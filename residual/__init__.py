@@ -1 +1,10 @@
-from residual.surveyor import Surveyor
\ No newline at end of file
+__all__ = ['Surveyor']
+
+
+def __getattr__(name: str):
+    # Surveyor is imported on first use, so that running the CLI, or importing a submodule, doesn't load asyncio and
+    # loguru before they are needed.
+    if name == 'Surveyor':
+        from residual.surveyor import Surveyor
+        return Surveyor
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,23 +1,113 @@
 import argparse
-from residual import Surveyor
-from residual.services.loader import load_services
+from residual.metrics import metrics
+from residual.services.loader import available_services
+from residual.surveyor.exporters import exporter_registry
+
+# The Surveyor, sharding, the cache and the journal are imported once the arguments call for them, as they pull in
+# asyncio and loguru, which would otherwise slow down every invocation, even --help.
+
+def _shard(spec: str) -> tuple[int, int]:
+    from residual.surveyor.sharding import parse_shard
+    try:
+        return parse_shard(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
 
 def main():
 
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', '--fasta',
-                        help='Path to sequence file.')
+                        help='Path to sequence file, optionally gzip-compressed.')
     parser.add_argument('-u', '--user_email',
                         help='Email to use as identification for APIs.')
     parser.add_argument('-o', '--outfile',
                         help='File name to write results to.')
+    parser.add_argument('-s', '--services', nargs='+', choices=list(available_services()), metavar='SERVICE',
+                        help=f'Services to run, default = all of: {", ".join(available_services())}. '
+                             f'Only the selected services are loaded.')
+    parser.add_argument('--format', choices=list(exporter_registry),
+                        help='Output format, default = chosen by output file extension, or text.')
+    parser.add_argument('-b', '--batch_size', type=int, default=1000,
+                        help='Number of sequences to read and run at a time.')
+    parser.add_argument('-w', '--workers', type=int,
+                        help='Number of worker processes for local analyses, default = number of CPUs.')
+    parser.add_argument('-c', '--cache',
+                        help='Path to a database of previous InterProScan results, reused for repeated sequences.')
+    parser.add_argument('--cache_ttl', type=float, default=30, metavar='DAYS',
+                        help='Days after which cached results are stale and scanned again, default = 30.')
+    parser.add_argument('--cache_max_entries', type=int, metavar='N',
+                        help='Most results to keep in the cache, dropping the least recently used, default = no limit.')
+    parser.add_argument('-j', '--journal',
+                        help='Path to record submitted jobs in, default = the output file name plus .jobs.jsonl.')
+    parser.add_argument('--rate', type=float,
+                        help='Maximum InterProScan requests per second, default = 10.')
+    parser.add_argument('--batch_jobs', action='store_true',
+                        help='Submit several sequences per InterProScan job, sized by residues and job turnaround. '
+                             'Only for InterProScan servers that accept multi-FASTA jobs.')
+    parser.add_argument('--cluster', type=float, metavar='IDENTITY',
+                        help='Only scan one sequence of each cluster of close homologs with InterProScan, inferring '
+                             'the features of the rest through their alignments; clusters are formed at the given '
+                             'identity, e.g. 0.9.')
+    parser.add_argument('--metrics',
+                        help='Path to write timings and counts for each stage of the run to, as JSON. Also logs a '
+                             'summary at the end of the run.')
+    parser.add_argument('--prometheus',
+                        help='Path to write the same metrics to in Prometheus text format.')
+    parser.add_argument('--shard', type=_shard,
+                        help='Only run the i-th of N shards of the fasta file, given as i/N, counting from 0.')
+    parser.add_argument('--merge', nargs='+', metavar='SHARD_OUTPUT',
+                        help='Instead of running, combine the output files of each shard, given in shard order, '
+                             'into the output file, in the order of the fasta file.')
+    parser.add_argument('-r', '--resume', action='store_true',
+                        help='Reattach to jobs recorded in the journal by an interrupted run instead of resubmitting.')
 
     args = parser.parse_args()
-    sv = Surveyor(args.user_email)
-    load_services()
+    if args.merge:
+        if not args.fasta or not args.outfile:
+            parser.error('--merge needs the fasta file that was sharded (-f) and an output file (-o).')
+        from residual.surveyor.sharding import merge_shards
+        try:
+            merge_shards(args.fasta, args.merge, args.outfile, output_format=args.format)
+        except ValueError as e:
+            parser.error(str(e))
+        return
+    if not args.fasta or not args.outfile:
+        parser.error('a fasta file (-f) and an output file (-o) are required.')
+    if args.metrics or args.prometheus:
+        metrics.enable()
+    services = args.services or list(available_services())
+    uses_interpro = 'InterProScan' in services
+    cache = journal = None
+    if uses_interpro and args.cache:
+        from residual.services.cache import ResultCache
+        cache = ResultCache(args.cache, ttl=args.cache_ttl * 24 * 60 * 60, max_entries=args.cache_max_entries)
+    if uses_interpro:
+        from residual.services.journal import JobJournal
+        journal = JobJournal(args.journal or f'{args.outfile}.jobs.jsonl', resume=args.resume)
+    service_options = {'InterProScan': {'cache': cache, 'journal': journal}}
+    if args.batch_jobs:
+        from residual.services.batching import BatchSizer
+        service_options['InterProScan']['batching'] = BatchSizer()
+    if args.cluster:
+        from residual.services.clustering import ClusterConfig
+        service_options['InterProScan']['clustering'] = ClusterConfig(identity=args.cluster)
+    if args.rate:
+        from residual.services.http_client import RateLimit
+        service_options['InterProScan']['rate_limit'] = RateLimit(rate=args.rate, burst=max(1, round(args.rate)))
+    from residual import Surveyor
+    sv = Surveyor(args.user_email, service_options=service_options, workers=args.workers, services=services)
 
-    sv.load_fasta(args.fasta)
-    sv.run(outfile=args.outfile)
+    sv.run_fasta(args.fasta, outfile=args.outfile, batch_size=args.batch_size,
+                 output_format=args.format, shard=args.shard)
+    if journal:
+        journal.close()
+    if cache:
+        cache.close()
+    if args.metrics:
+        metrics.dump(args.metrics)
+    if args.prometheus:
+        with open(args.prometheus, 'w') as file:
+            file.write(metrics.prometheus())
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,177 @@
+import json
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+
+# Upper bounds of histogram buckets, in seconds.
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, float('inf'))
+
+_DISABLED = nullcontext()
+
+Labels = tuple[tuple[str, str], ...]
+
+
+@dataclass(slots=True)
+class Histogram:
+    counts: list[int] = field(default_factory=lambda: [0] * len(BUCKETS))
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket the quantile falls in, or the largest value seen if that is smaller."""
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+@dataclass(slots=True)
+class Gauge:
+    value: float = 0
+    peak: float = 0
+
+    def add(self, amount: float) -> None:
+        self.value += amount
+        self.peak = max(self.peak, self.value)
+
+
+def _format_labels(labels: Labels, extra: str = '') -> str:
+    items = [f'{key}="{value}"' for key, value in labels] + ([extra] if extra else [])
+    return '{' + ','.join(items) + '}' if items else ''
+
+
+class Metrics:
+
+    """
+    Counters, gauges and timing histograms for the stages of a run, each identified by a name and optional labels
+    such as the service. Off by default: while disabled, every method returns straight away, so instrumented code
+    costs no more than a method call.
+    """
+
+    def __init__(self, *, enabled: bool = False) -> None:
+        self.enabled = enabled
+        self.counters: dict[tuple[str, Labels], float] = {}
+        self.gauges: dict[tuple[str, Labels], Gauge] = {}
+        self.histograms: dict[tuple[str, Labels], Histogram] = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.gauges.clear()
+        self.histograms.clear()
+
+    def count(self, name: str, amount: float = 1, **labels) -> None:
+        if self.enabled:
+            key = name, tuple(sorted(labels.items()))
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def gauge(self, name: str, amount: float, **labels) -> None:
+        """Moves a gauge up or down by the amount, keeping track of its peak."""
+        if self.enabled:
+            key = name, tuple(sorted(labels.items()))
+            if (gauge := self.gauges.get(key)) is None:
+                gauge = self.gauges[key] = Gauge()
+            gauge.add(amount)
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        if self.enabled:
+            key = name, tuple(sorted(labels.items()))
+            if (histogram := self.histograms.get(key)) is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, name: str, **labels):
+        """Context manager timing its block into a histogram; also usable around awaits."""
+        return self._timer(name, labels) if self.enabled else _DISABLED
+
+    @contextmanager
+    def _timer(self, name: str, labels: dict):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def in_flight(self, name: str, **labels):
+        """Context manager counting its block in a gauge while it runs."""
+        return self._in_flight(name, labels) if self.enabled else _DISABLED
+
+    @contextmanager
+    def _in_flight(self, name: str, labels: dict):
+        self.gauge(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.gauge(name, -1, **labels)
+
+    def as_dict(self) -> dict:
+        def _entry(name: str, labels: Labels, **values) -> dict:
+            return {'name': name, 'labels': dict(labels), **values}
+
+        return {
+            'counters': [_entry(name, labels, value=value) for (name, labels), value in self.counters.items()],
+            'gauges': [_entry(name, labels, value=gauge.value, peak=gauge.peak)
+                       for (name, labels), gauge in self.gauges.items()],
+            'histograms': [_entry(name, labels, count=h.count, total=h.total, max=h.max,
+                                  buckets=dict(zip(map(str, BUCKETS), h.counts)))
+                           for (name, labels), h in self.histograms.items()],
+        }
+
+    def dump(self, path: str) -> None:
+        """Writes all metrics to a JSON file."""
+        with open(path, 'w') as file:
+            json.dump(self.as_dict(), file, indent=2)
+
+    def prometheus(self, prefix: str = 'residual_') -> str:
+
+        """Formats all metrics in the Prometheus text exposition format."""
+
+        lines = []
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append(f'{prefix}{name}_total{_format_labels(labels)} {value}')
+        for (name, labels), gauge in sorted(self.gauges.items()):
+            lines.append(f'{prefix}{name}{_format_labels(labels)} {gauge.value}')
+            lines.append(f'{prefix}{name}_peak{_format_labels(labels)} {gauge.peak}')
+        for (name, labels), h in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, n in zip(BUCKETS, h.counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{prefix}{name}_bucket{_format_labels(labels, f'le="{le}"')} {cumulative}')
+            lines.append(f'{prefix}{name}_sum{_format_labels(labels)} {h.total}')
+            lines.append(f'{prefix}{name}_count{_format_labels(labels)} {h.count}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+
+        """A table of timings by stage, followed by counters and gauges, for logging at the end of a run."""
+
+        def _label(name: str, labels: Labels) -> str:
+            return name + (f' ({", ".join(str(value) for _, value in labels)})' if labels else '')
+
+        lines = [f'{"Stage":<40}{"Count":>9}{"Total s":>11}{"Mean s":>10}{"p95 s":>10}{"Max s":>10}']
+        for (name, labels), h in sorted(self.histograms.items()):
+            lines.append(f'{_label(name, labels):<40}{h.count:>9}{h.total:>11.3f}{h.total / h.count:>10.4f}'
+                         f'{h.quantile(0.95):>10.3f}{h.max:>10.3f}')
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append(f'{_label(name, labels):<40}{value:>9g}')
+        for (name, labels), gauge in sorted(self.gauges.items()):
+            lines.append(f'{_label(name, labels):<40}{gauge.value:>9g}  (peak {gauge.peak:g})')
+        return '\n'.join(lines)
+
+
+metrics = Metrics()
@@ -1,3 +1,5 @@
 from .protein_sequence import ProteinSequence
-from .feature import Feature, GoTerm
-from .sequence_display import SequenceDisplay
\ No newline at end of file
+from .feature import Feature, GoTerm, go_term_registry
+from .feature_table import FeatureTable
+from .sequence_display import SequenceDisplay
+from .fasta import read_fasta
\ No newline at end of file
@@ -0,0 +1 @@
+ALPHABET = 'ACDEFGHIKLMNPQRSTVWY'  # Residue index is the position of its symbol here.
@@ -0,0 +1,123 @@
+from collections.abc import Iterable
+
+import numpy as np
+
+from residual.protein_sequence.alphabet import ALPHABET
+
+INVALID = 255
+
+_CODES = np.full(256, INVALID, dtype=np.uint8)  # Character code -> residue index.
+_CODES[np.frombuffer(ALPHABET.encode(), dtype=np.uint8)] = np.arange(len(ALPHABET), dtype=np.uint8)
+_SYMBOLS = np.frombuffer(ALPHABET.encode(), dtype=np.uint8)  # Residue index -> character code.
+
+
+def encode(sequence: str) -> np.ndarray:
+
+    """
+    Converts a sequence to an array of residue indices, checking every symbol in a single vectorized lookup.
+
+    :param sequence: amino acid sequence.
+    :return: uint8 array of indices into ALPHABET.
+    :raises: ValueError if the sequence contains symbols outside ALPHABET.
+    """
+
+    raw = np.frombuffer(sequence.encode('ascii', errors='replace'), dtype=np.uint8)
+    codes = _CODES[raw]
+    if (codes == INVALID).any():
+        disallowed = set(sequence) - set(ALPHABET)
+        raise ValueError(f'Invalid sequence characters: {" ".join(str(i) for i in disallowed)}')
+    return codes
+
+
+def decode(codes: np.ndarray) -> str:
+    """Converts an array of residue indices back to a sequence string."""
+    return _SYMBOLS[codes].tobytes().decode()
+
+
+class EncodedBatch:
+
+    """
+    Many sequences encoded into one shared buffer of residue indices, with offsets marking where each begins.
+    Computations over the batch run on the whole buffer at once, discarding results that span two sequences.
+    """
+
+    def __init__(self, codes: np.ndarray, offsets: np.ndarray) -> None:
+
+        """
+        :param codes: residue indices of all sequences, end to end.
+        :param offsets: start of each sequence in codes, followed by the total length.
+        """
+
+        self.codes = codes
+        self.offsets = offsets
+
+    @classmethod
+    def from_sequences(cls, sequences: Iterable) -> 'EncodedBatch':
+        """Encodes strings or ProteinSequences into a single batch."""
+        sequences = [getattr(seq, 'sequence', seq) for seq in sequences]
+        offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+        np.cumsum([len(seq) for seq in sequences], out=offsets[1:])
+        return cls(encode(''.join(sequences)), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        """Residue indices of one sequence, as a view onto the shared buffer."""
+        return self.codes[self.offsets[index]:self.offsets[index + 1]]
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def _split_windows(self, values: np.ndarray, window: int) -> list[np.ndarray]:
+
+        """
+        Given a value for each window start across the whole buffer, keeps only those of windows lying within a
+        single sequence and splits them per sequence.
+        """
+
+        counts = np.maximum(self.lengths - window + 1, 0)
+        owner = np.repeat(np.arange(len(self)), self.lengths)[:len(values)]
+        position = np.arange(len(values)) - self.offsets[owner]
+        valid = position < counts[owner]
+        return np.split(values[valid], np.cumsum(counts)[:-1])
+
+    def window_means(self, scale: np.ndarray, window: int) -> list[np.ndarray]:
+
+        """
+        Mean of a per-residue scale over every full window in each sequence.
+
+        :param scale: value for each residue, indexed as ALPHABET.
+        :param window: number of residues per window.
+        :return: array of window means for each sequence, empty for sequences shorter than the window.
+        """
+
+        if len(self.codes) < window:
+            return [np.empty(0) for _ in range(len(self))]
+        sums = np.cumsum(np.concatenate(([0], scale[self.codes])))
+        return self._split_windows((sums[window:] - sums[:-window]) / window, window)
+
+    def kmer_codes(self, k: int) -> list[np.ndarray]:
+
+        """
+        Identifies every k-mer in each sequence by a single integer, treating it as a base-20 number.
+
+        :param k: k-mer length, up to 14 so codes fit in 64 bits.
+        :return: array of k-mer codes for each sequence.
+        """
+
+        if len(self.codes) < k:
+            return [np.empty(0, dtype=np.int64) for _ in range(len(self))]
+        kmers = np.zeros(len(self.codes) - k + 1, dtype=np.int64)
+        for i in range(k):
+            kmers = kmers * len(ALPHABET) + self.codes[i:len(self.codes) - k + 1 + i]
+        return self._split_windows(kmers, k)
+
+    def kmer_profile(self, k: int) -> np.ndarray:
+        """Counts of each possible k-mer (columns) in each sequence (rows)."""
+        codes = self.kmer_codes(k)
+        owner = np.repeat(np.arange(len(self)), [len(c) for c in codes])
+        n_kmers = len(ALPHABET) ** k
+        flat = owner * n_kmers + np.concatenate(codes)
+        return np.bincount(flat, minlength=len(self) * n_kmers).reshape(len(self), n_kmers)
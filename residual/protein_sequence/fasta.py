@@ -0,0 +1,65 @@
+import gzip
+from collections.abc import Iterator
+from typing import BinaryIO
+
+from residual.protein_sequence.protein_sequence import ProteinSequence
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _open(path: str) -> BinaryIO:
+    """Opens a file for binary reading, transparently decompressing it if it is gzipped."""
+
+    with open(path, 'rb') as file:
+        magic = file.read(2)
+    return gzip.open(path, 'rb') if magic == GZIP_MAGIC else open(path, 'rb')
+
+
+def _read_lines(file: BinaryIO, chunk_size: int) -> Iterator[bytes]:
+    """Reads a file forward in fixed-size chunks, yielding complete lines without their line endings."""
+
+    remainder = b''
+    while chunk := file.read(chunk_size):
+        lines = (remainder + chunk).split(b'\n')
+        remainder = lines.pop()  # Last piece may be an incomplete line, so carry it into the next chunk.
+        yield from lines
+    if remainder:
+        yield remainder
+
+
+def _build_sequence(name: str, seq_lines: list[bytes]) -> ProteinSequence | None:
+    sequence = b''.join(seq_lines).decode('ascii', errors='replace')
+    try:
+        return ProteinSequence(name, sequence)
+    except ValueError as e:
+        from loguru import logger  # Imported here so loguru loads only if needed.
+        logger.error(f'Error parsing {name}: {e}')
+        return None
+
+
+def read_fasta(path: str, /, *, chunk_size: int = 1 << 20) -> Iterator[ProteinSequence]:
+
+    """
+    Lazily parse a fasta-formatted file, which may be gzip-compressed, yielding one sequence at a time.
+    Only the record currently being read is held in memory. Records with invalid sequences are logged and skipped.
+
+    :param path: path to file.
+    :param chunk_size: number of bytes to read from the file at a time.
+    """
+
+    with _open(path) as file:
+        name = None
+        seq_lines = []
+
+        for line in _read_lines(file, chunk_size):
+            line = line.strip()
+            if line.startswith(b'>'):  # Header marks the end of the previous record.
+                if name is not None and (seq := _build_sequence(name, seq_lines)) is not None:
+                    yield seq
+                name = line.lstrip(b'>').decode()
+                seq_lines = []
+            elif line:
+                seq_lines.append(line)
+
+        if name is not None and (seq := _build_sequence(name, seq_lines)) is not None:
+            yield seq
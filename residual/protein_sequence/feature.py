@@ -1,11 +1,44 @@
+import threading
 from collections import namedtuple
 from dataclasses import dataclass, field
 
 GoTerm = namedtuple('goTerm', ['id', 'category', 'name'])
 
-@dataclass
+class GoTermRegistry:
+
+    """
+    Shares one GoTerm instance between all features referring to the same term, as the same few thousand terms
+    recur across many features. Each term is also given an index, for compact references in a FeatureTable.
+    Results may be parsed on several threads at once, so new terms are registered under a lock.
+    """
+
+    def __init__(self) -> None:
+        self.terms: list[GoTerm] = []
+        self._indices: dict[GoTerm, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.terms)
+
+    def index(self, term: GoTerm) -> int:
+        """Returns the index of the term, registering it if new."""
+        if (index := self._indices.get(term)) is None:
+            with self._lock:
+                if (index := self._indices.get(term)) is None:  # Another thread may have registered it meanwhile.
+                    self.terms.append(term)
+                    index = self._indices[term] = len(self.terms) - 1
+        return index
+
+    def intern(self, id: str, category: str, name: str) -> GoTerm:
+        """Returns the shared instance of the given term."""
+        return self.terms[self.index(GoTerm(id, category, name))]
+
+go_term_registry = GoTermRegistry()
+
+@dataclass(slots=True)
 class Feature:
     service: str
     name: str
     locations: list[tuple[int, int]] | None = field(default_factory=list)
     go_terms: list = field(default_factory=list)
+    inferred: bool = False  # Whether the feature was carried over from a similar sequence, rather than found on it.
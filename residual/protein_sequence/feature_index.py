@@ -0,0 +1,132 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+
+from residual.protein_sequence.feature import Feature
+
+
+class FeatureIndex:
+
+    """
+    Sorted-array index over the locations of a sequence's features, for positional queries in O(log n + k).
+    Each location is kept in two sorted lists, by start and by end, with the position of its feature in the
+    feature list. The list by start doubles as an implicit balanced search tree, each midpoint the root of its
+    range, with the furthest end in each subtree alongside, so overlap queries skip subtrees ending too early even
+    when some features are long. The index is brought up to date incrementally, only indexing features added since
+    the last update, and locations are only added to the sorted lists once a positional query needs them.
+    Positions are 1-based and inclusive, as in Feature.locations.
+    """
+
+    def __init__(self) -> None:
+        self._features: Sequence[Feature] = []
+        self._by_start: list[tuple[int, int, int]] = []  # (start, end, feature position)
+        self._by_end: list[tuple[int, int, int]] = []  # (end, start, feature position)
+        self._starts: list[int] = []  # Start of each entry in _by_start, for bisecting.
+        self._ends: list[int] = []  # End of each entry in _by_end, for bisecting.
+        self._max_ends: list[int] = []  # Furthest end in the subtree rooted at each entry of _by_start.
+        self._order: list[tuple[int, int]] = []  # (first location start, feature position)
+        self._located = 0  # Number of features whose locations are in the sorted lists.
+
+    def __len__(self):
+        return len(self._order)
+
+    def update(self, features: Sequence[Feature]) -> None:
+
+        """
+        Indexes any features added to the list since the last update.
+
+        :param features: the sequence's full list of features.
+        """
+
+        if features is not self._features or len(features) < len(self):  # Replaced, not added to, so start again.
+            self.__init__()
+        self._features = features
+
+        if len(features) == len(self):
+            return
+
+        self._order += [(ft.locations[0][0] if ft.locations else 0, pos)
+                        for pos, ft in enumerate(features[len(self):], len(self))]
+        # The list is already sorted up to the new entries, so re-sorting only costs about as much as merging.
+        self._order.sort()
+
+    def _sort_locations(self) -> None:
+
+        """Adds the locations of features indexed since the last positional query to the sorted lists."""
+
+        if self._located == len(self):
+            return
+        for pos in range(self._located, len(self)):
+            for start, end in self._features[pos].locations or []:
+                self._by_start.append((start, end, pos))
+                self._by_end.append((end, start, pos))
+        self._located = len(self)
+
+        self._by_start.sort()
+        self._by_end.sort()
+        self._starts = [entry[0] for entry in self._by_start]
+        self._ends = [entry[0] for entry in self._by_end]
+        self._max_ends = [0] * len(self._by_start)
+        self._fill_max_ends(0, len(self._by_start))
+
+    def _fill_max_ends(self, lo: int, hi: int) -> int:
+        """Sets the furthest end in the subtree over _by_start[lo:hi] and each of its own subtrees, returning it."""
+        if lo >= hi:
+            return 0
+        mid = (lo + hi) // 2
+        left, right = self._fill_max_ends(lo, mid), self._fill_max_ends(mid + 1, hi)
+        self._max_ends[mid] = max(self._by_start[mid][1], left, right)
+        return self._max_ends[mid]
+
+    def _collect(self, positions) -> list[Feature]:
+        """Features at the given positions, each once, in the order first seen."""
+        return [self._features[pos] for pos in dict.fromkeys(positions)]
+
+    def in_order(self) -> list[Feature]:
+        """All features, sorted by the start of their first location."""
+        return [self._features[pos] for _, pos in self._order]
+
+    def overlapping(self, start: int, end: int) -> list[Feature]:
+
+        """Features with a location overlapping the region."""
+
+        self._sort_locations()
+        by_start, max_ends = self._by_start, self._max_ends
+        positions, stack = [], []
+        lo, hi = 0, len(by_start)
+        while True:  # In-order walk of the implicit tree, so locations are visited by start.
+            while lo < hi and max_ends[mid := (lo + hi) // 2] >= start:  # Skipping subtrees ending too early.
+                stack.append((mid, hi))
+                hi = mid
+            if not stack:
+                break
+            mid, hi = stack.pop()
+            loc_start, loc_end, pos = by_start[mid]
+            if loc_start > end:  # As does every location visited after it.
+                break
+            if loc_end >= start:
+                positions.append(pos)
+            lo = mid + 1
+        return self._collect(positions)
+
+    def within(self, start: int, end: int) -> list[Feature]:
+        """Features with a location contained entirely within the region."""
+        self._sort_locations()
+        lo, hi = bisect_left(self._starts, start), bisect_right(self._starts, end)
+        return self._collect(pos for _, loc_end, pos in self._by_start[lo:hi] if loc_end <= end)
+
+    def nearest(self, position: int) -> Feature | None:
+
+        """The feature with a location closest to the position; any covering it are closest of all."""
+
+        if covering := self.overlapping(position, position):
+            return covering[0]
+
+        candidates = []  # (distance, feature position)
+        self._sort_locations()
+        if (i := bisect_left(self._ends, position) - 1) >= 0:  # Last location ending before the position.
+            end, _, pos = self._by_end[i]
+            candidates.append((position - end, pos))
+        if (i := bisect_right(self._starts, position)) < len(self._starts):  # First location starting after it.
+            start, _, pos = self._by_start[i]
+            candidates.append((start - position, pos))
+        return self._features[min(candidates)[1]] if candidates else None
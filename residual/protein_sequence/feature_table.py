@@ -0,0 +1,98 @@
+from array import array
+from collections.abc import Iterable, Sequence
+
+from residual.protein_sequence.feature import Feature, GoTermRegistry, go_term_registry
+
+
+class FeatureTable:
+
+    """
+    Columnar store for the features of a whole run. Each column is a typed array rather than a list of objects:
+    service and name strings are stored once and referenced by index, locations are flattened into start and
+    end arrays, and GO terms are referenced by their index in a GoTermRegistry. Features are rebuilt on access.
+    """
+
+    def __init__(self, registry: GoTermRegistry = go_term_registry) -> None:
+        self.registry = registry
+
+        self._strings: list[str] = []
+        self._string_ids: dict[str, int] = {}
+
+        self.services = array('I')
+        self.names = array('I')
+        self.loc_offsets = array('I', [0])  # Locations of feature i are starts/ends[loc_offsets[i]:loc_offsets[i+1]]
+        self.starts = array('I')
+        self.ends = array('I')
+        self.go_offsets = array('I', [0])  # GO terms of feature i are go_ids[go_offsets[i]:go_offsets[i+1]]
+        self.go_ids = array('I')
+        self.inferred = array('B')
+
+    def __len__(self):
+        return len(self.services)
+
+    def _string_id(self, value: str) -> int:
+        if (index := self._string_ids.get(value)) is None:
+            index = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+        return index
+
+    def add(self, features: Iterable[Feature]) -> range:
+
+        """
+        Stores features in the table.
+
+        :param features: features to be added.
+        :return: the rows the features were stored in.
+        """
+
+        first = len(self)
+        for ft in features:
+            self.services.append(self._string_id(ft.service))
+            self.names.append(self._string_id(ft.name))
+            for start, end in ft.locations or ():
+                self.starts.append(start)
+                self.ends.append(end)
+            self.loc_offsets.append(len(self.starts))
+            self.go_ids.extend(map(self.registry.index, ft.go_terms))
+            self.go_offsets.append(len(self.go_ids))
+            self.inferred.append(ft.inferred)
+        return range(first, len(self))
+
+    def __getitem__(self, row: int) -> Feature:
+        loc_slice = slice(self.loc_offsets[row], self.loc_offsets[row + 1])
+        go_slice = slice(self.go_offsets[row], self.go_offsets[row + 1])
+        return Feature(service=self._strings[self.services[row]],
+                       name=self._strings[self.names[row]],
+                       locations=list(zip(self.starts[loc_slice], self.ends[loc_slice])),
+                       go_terms=[self.registry.terms[i] for i in self.go_ids[go_slice]],
+                       inferred=bool(self.inferred[row]))
+
+    def view(self, rows: range) -> 'FeatureView':
+        return FeatureView(self, rows)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the numeric columns, excluding the shared strings."""
+        columns = (self.services, self.names, self.loc_offsets, self.starts, self.ends, self.go_offsets, self.go_ids,
+                   self.inferred)
+        return sum(col.itemsize * len(col) for col in columns)
+
+
+class FeatureView(Sequence):
+
+    """Read-only sequence of a ProteinSequence's features, backed by rows of a FeatureTable rather than copies."""
+
+    def __init__(self, table: FeatureTable, rows: range) -> None:
+        self.table = table
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table[row] for row in self.rows[index]]
+        return self.table[self.rows[index]]
+
+    def __repr__(self):
+        return f'FeatureView(rows={self.rows.start}-{self.rows.stop})'
@@ -1,7 +1,16 @@
+import hashlib
+import threading
 from itertools import chain
-from collections.abc import Iterable, Sized
+from collections.abc import Iterable, Sequence, Sized
+from typing import TYPE_CHECKING
 
+from residual.protein_sequence.alphabet import ALPHABET
 from residual.protein_sequence.feature import Feature
+from residual.protein_sequence.feature_index import FeatureIndex
+
+if TYPE_CHECKING:
+    import numpy as np
+    from residual.protein_sequence.feature_table import FeatureTable
 
 class ProteinSequence:
 
@@ -9,12 +18,14 @@ class ProteinSequence:
     Holds the sequence and accumulated analysis data.
     """
 
-    ALLOWED_SYMBOLS = set('ACDEFGHIKLMNPQRSTVWY')  # Valid amino acid symbols
+    ALLOWED_SYMBOLS = set(ALPHABET)  # Valid amino acid symbols
+    _features_lock = threading.Lock()  # Services may add features from different threads at once.
 
     def __init__(self, name: str, sequence: str):
         self.name = name
         self.sequence = sequence
-        self.features: list[Feature | None] = []
+        self.features: list[Feature | None] | Sequence[Feature] = []
+        self._feature_index: FeatureIndex | None = None
 
     def __len__(self):
         return len(self.sequence)
@@ -26,15 +37,51 @@ class ProteinSequence:
     def __hash__(self):
         return hash(self.sequence)
 
+    @property
+    def digest(self) -> str:
+        """Stable MD5 digest of the sequence content, consistent between runs (unlike hash())."""
+        return hashlib.md5(self.sequence.encode()).hexdigest()
+
     @property
     def sequence(self):
         return self._sequence
 
     @sequence.setter
     def sequence(self, value: str):
-        if disallowed := (set(value) - self.ALLOWED_SYMBOLS):
+        if not self.ALLOWED_SYMBOLS.issuperset(value):
+            disallowed = set(value) - self.ALLOWED_SYMBOLS
             raise ValueError(f'Invalid sequence characters: {" ".join(str(i) for i in disallowed)}')
         self._sequence = value
+        self._encoded = None
+
+    @property
+    def encoded(self) -> 'np.ndarray':
+        """The sequence as an array of residue indices (see encoding.ALPHABET), computed on first use."""
+        if self._encoded is None:
+            from residual.protein_sequence.encoding import encode  # Imported here so numpy loads only if needed.
+            self._encoded = encode(self.sequence)
+        return self._encoded
+
+    @property
+    def feature_index(self) -> FeatureIndex:
+        """Positional index over the features, built on first use and brought up to date with each access."""
+        if self._feature_index is None:
+            self._feature_index = FeatureIndex()
+        self._feature_index.update(self.features)
+        return self._feature_index
+
+    def add_features(self, features: Iterable[Feature]) -> None:
+        """Attaches features from a service; safe to call from several services running concurrently."""
+        features = list(features)
+        with self._features_lock:
+            if not isinstance(self.features, list):  # Compacted features are read-only, so take a copy first.
+                self.features = list(self.features)
+            self.features += features
+
+    def compact(self, table: 'FeatureTable') -> None:
+        """Moves the sequence's features into a columnar table, keeping a read-only view of them."""
+        with self._features_lock:
+            self.features = table.view(table.add(self.features))
 
     def features_as_lines(self) -> list[str]:
 
@@ -0,0 +1,91 @@
+from collections.abc import Callable, Iterable
+from dataclasses import fields
+from functools import cache
+from itertools import chain, starmap, zip_longest
+from operator import attrgetter, call, itemgetter
+from typing import TextIO
+
+
+class ColumnPlan:
+
+    """
+    The columns a feature type is tabulated with: a header and cell parser for each of its fields that the display
+    class has a _parse_<field> method for. Resolved once per feature type and display class, rather than
+    looked up for every feature. Fields the display class lists in optional_fields only get a column when some
+    feature sets them; the plan without them is resolved separately, with those fields hidden.
+    """
+
+    def __init__(self, display_cls: type, feature_cls: type, hidden: frozenset[str] = frozenset()) -> None:
+        self.fields: list[str] = []
+        self.parsers: list[Callable] = []
+        for prop in fields(feature_cls):
+            if prop.name not in hidden and (parser := getattr(display_cls, f'_parse_{prop.name}', None)):
+                self.fields.append(prop.name)
+                self.parsers.append(parser)
+        self.optional = [name for name in self.fields if name in getattr(display_cls, 'optional_fields', ())]
+        self.headers = [name.capitalize() for name in self.fields]
+        self._values = attrgetter(*self.fields) if len(self.fields) > 1 else lambda ft: (getattr(ft, self.fields[0]),)
+
+    def columns(self, ft) -> list[list[str]]:
+        """The cells of each column for a feature; columns may have different numbers of cells."""
+        return list(map(call, self.parsers, self._values(ft)))
+
+    def unused(self, features: Iterable) -> frozenset[str]:
+        """Optional fields that none of the features set, whose columns are left out."""
+        return frozenset(name for name in self.optional if not any(getattr(ft, name, None) for ft in features))
+
+
+@cache
+def column_plan(display_cls: type, feature_cls: type, hidden: frozenset[str] = frozenset()) -> ColumnPlan:
+    return ColumnPlan(display_cls, feature_cls, hidden)
+
+
+class FeatureRenderer:
+
+    """
+    Lays features out as a fixed-width table. Cells are parsed once, a column at a time, using the column plan
+    for the features' type; column widths are then found in one pass over the parsed cells, and rows formatted
+    straight into the output lines.
+    """
+
+    def __init__(self, display_cls: type, *, min_width: int = 15, padding: int = 2) -> None:
+        self.display_cls = display_cls
+        self.min_width = min_width
+        self.padding = padding
+
+    def lines(self, features: Iterable) -> list[str]:
+
+        """Lays out the table: headers, a divider, then each feature's rows followed by a blank row."""
+
+        features = list(features)
+        if not features:
+            return []
+        plan = column_plan(self.display_cls, type(features[0]))  # Headers are taken from the first feature.
+        if hidden := plan.unused(features):
+            plan = column_plan(self.display_cls, type(features[0]), hidden)
+
+        if all(type(ft) is type(features[0]) for ft in features):
+            # Parse a whole column at a time, then regroup the cells by feature.
+            cells = [list(map(parser, map(attrgetter(field), features)))
+                     for field, parser in zip(plan.fields, plan.parsers)]
+            parsed = list(zip(*cells))
+        else:
+            parsed = [column_plan(self.display_cls, type(ft), hidden).columns(ft) for ft in features]
+            cells = [list(map(itemgetter(i), parsed)) for i in range(len(plan.headers))]
+
+        widths = [max(self.min_width, max(map(len, chain.from_iterable(column)), default=0)) + self.padding
+                  for column in cells]
+        row_format = ''.join(f'{{:<{width}}}' for width in widths).format
+        blank = ' ' * sum(widths)
+
+        lines = [row_format(*plan.headers), '-' * sum(widths)]
+        for columns in parsed:
+            lines += starmap(row_format, zip_longest(*columns, fillvalue=''))
+            lines.append(blank)
+        return lines
+
+    def write(self, features: Iterable, sink: TextIO) -> None:
+        """Writes the table to a file-like object."""
+        if lines := self.lines(features):
+            sink.write('\n'.join(lines))
+            sink.write('\n')
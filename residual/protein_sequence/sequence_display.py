@@ -1,19 +1,22 @@
-from itertools import chain, zip_longest, batched
-from typing import Iterable, Sized
+from itertools import zip_longest
+from typing import Iterable, Iterator, TextIO
 
 from residual.protein_sequence import ProteinSequence, Feature, GoTerm
+from residual.protein_sequence.rendering import FeatureRenderer, column_plan
 
 class SequenceDisplay:
 
+    optional_fields = ('inferred',)  # Only given a column when some feature in the table sets them.
+
     def __init__(self, __seq: ProteinSequence, /):
         self.seq = __seq
 
     def feature_into_rows(self, ft: Feature):
-        columns = []
-        for prop, value in vars(ft).items():  # For each property in the feature...
-            if parser := getattr(self, f'_parse_{prop}', None):  # ...get the respective parser, if defined
-                columns.append(parser(value))
-        rows = zip_longest(*columns, fillvalue='')  # Rearrange columns into rows with blank cells.
+        plan = column_plan(type(self), type(ft))
+        if hidden := plan.unused([ft]):
+            plan = column_plan(type(self), type(ft), hidden)
+        columns = plan.columns(ft)  # Parse the feature's displayed properties...
+        rows = zip_longest(*columns, fillvalue='')  # ...and rearrange the columns into rows with blank cells.
         return list(rows)
 
     @staticmethod
@@ -33,40 +36,40 @@ class SequenceDisplay:
         return [f'{id_} ({category}) {name}' for id_, category, name in go_terms]
 
     @staticmethod
-    def _get_max_length(items: Iterable[Sized], minimum: int):
-        return max(max(map(len, items)), minimum)
-
-    @staticmethod
-    def _get_row_layout(sizes: Iterable[int]):
-        cells = ['{:<w}'.replace('w', str(size)) for size in sizes]
-        return ''.join(cells)
+    def _parse_inferred(inferred: bool):
+        return ['yes'] if inferred else []
 
     def tabulate_features(self, features: Iterable[Feature]) -> list[str]:
-
-        features = sorted(features, key=lambda f: f.locations[0][0] if f.locations else 0)
-
-        # Sample features to determine headers and columns before tabulating.
-        first_feature = features[0]
-        first_row = self.feature_into_rows(first_feature)[0]
-        empty = [['' for _ in first_row]]
-
-        # Get the features as rows, adding an empty row after each for readability.
-        rows = list(chain(*(self.feature_into_rows(ft) + empty for ft in features)))
-
-        # Make a template row layout, with column widths to accommodate the longest cells.
-        padding = 2
-        widths = [self._get_max_length(col, minimum=15) + padding for col in zip(*rows)]
-        row_layout = self._get_row_layout(widths)
-
-        headers = [row_layout.format(*[prop.capitalize() for prop in vars(first_feature)])]
-        divider = ['-' * sum(widths)]
-        data = [row_layout.format(*row) for row in rows]
-        return headers + divider + data
+        """Lines of the feature table; lines and write both go through here, so subclasses can change the layout."""
+        return list(FeatureRenderer(type(self)).lines(features))
+
+    def lines(self) -> Iterator[str]:
+        """Generates the representation of the sequence line by line, so it can be written out without being
+        held in memory whole."""
+        yield f'>{self.seq.name}'
+        sequence = self.seq.sequence
+        yield from (sequence[i:i + 80] for i in range(0, len(sequence), 80)) if sequence else ['']
+        yield ''
+        if self.seq.features:
+            yield from self.tabulate_features(self.seq.feature_index.in_order())
+        else:
+            yield ''
+
+    def write(self, sink: TextIO) -> None:
+        """Writes the representation of the sequence straight to a file-like object."""
+        sequence = self.seq.sequence
+        sink.write(f'>{self.seq.name}\n')
+        sink.write('\n'.join(sequence[i:i + 80] for i in range(0, len(sequence), 80)))
+        sink.write('\n\n')
+        if self.seq.features:
+            if table := self.tabulate_features(self.seq.feature_index.in_order()):
+                sink.write('\n'.join(table))
+                sink.write('\n')
+        else:
+            sink.write('\n')
 
     def __str__(self):
-        seq_lines: list[str] = [''.join(batch) for batch in batched(self.seq.sequence, 80)]
-        feature_lines: list[str] = self.tabulate_features(self.seq.features) if self.seq.features else []
-        return f">{self.seq.name}\n{'\n'.join(seq_lines)}\n\n{'\n'.join(feature_lines)}"
+        return '\n'.join(self.lines())
 
     def __call__(self):
-        return str(self)
\ No newline at end of file
+        return str(self)
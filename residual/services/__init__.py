@@ -1 +1,9 @@
-from .base_class import ServiceBaseClass, service_registry, register_service
+__all__ = ['ServiceBaseClass', 'CpuBoundService', 'service_registry', 'register_service']
+
+
+def __getattr__(name: str):
+    # Imported on first use, so that services can be listed through the loader without loading asyncio.
+    if name in __all__:
+        from . import base_class
+        return getattr(base_class, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,7 +1,11 @@
+import asyncio
 from abc import ABC, abstractmethod
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable
+from concurrent.futures import Executor
+from itertools import batched
 
-from residual.protein_sequence import ProteinSequence
+from residual.metrics import metrics
+from residual.protein_sequence import ProteinSequence, Feature
 
 service_registry = {}
 
@@ -13,6 +17,9 @@ def register_service(cls):
 class ServiceBaseClass(ABC):
     """Base class for a service provider."""
 
+    cpu_bound = False  # Whether the service does its work locally, and so may be spread across worker processes.
+    on_complete: Callable[[ProteinSequence], None] | None = None  # Set by the Surveyor to follow progress.
+
     def __init__(self):
         ...
 
@@ -23,4 +30,98 @@ class ServiceBaseClass(ABC):
 
         :param inputs: ProteinSequence instances to be analysed.
         :return:
-        """
\ No newline at end of file
+        """
+
+    async def arun(self, inputs: Iterable[ProteinSequence]) -> list[ProteinSequence]:
+        """
+        Asynchronous counterpart to run, used when the Surveyor runs services concurrently. By default the blocking
+        run is moved to a worker thread, so it doesn't hold up the event loop; services doing asynchronous I/O
+        should override this to run natively on the loop instead.
+
+        :param inputs: ProteinSequence instances to be analysed.
+        :return:
+        """
+        sequences = list(inputs)
+        await asyncio.to_thread(self.run, sequences)
+        for seq in sequences:
+            self.completed(seq)
+        return sequences
+
+    def completed(self, seq: ProteinSequence) -> None:
+        """
+        Signals that the service has finished with a sequence, so its results can be written out without waiting
+        for the rest. Services overriding arun should call this for each sequence, on the event loop's thread.
+        """
+        if self.on_complete:
+            self.on_complete(seq)
+
+
+class CpuBoundService(ServiceBaseClass):
+
+    """
+    Base class for a service that computes its features locally. Rather than running per ProteinSequence, it
+    analyses plain sequence strings in chunks, which the Surveyor can send to a pool of worker processes
+    without the cost of pickling each ProteinSequence and its features.
+    """
+
+    cpu_bound = True
+    chunk_size = 500  # Sequences sent to a worker process at a time.
+
+    def __init__(self, user_email: str | None = None):
+        super().__init__()
+
+    @abstractmethod
+    def analyse(self, sequence: str) -> list[Feature]:
+        """
+        Compute features for a single sequence. Runs in a worker process, so should only rely on the service's
+        own (picklable) attributes.
+
+        :param sequence: amino acid sequence to be analysed.
+        :return: features found in the sequence.
+        """
+
+    def __getstate__(self):
+        """Progress callbacks stay behind in the main process when the service is sent to a worker."""
+        state = self.__dict__.copy()
+        state.pop('on_complete', None)
+        return state
+
+    def analyse_chunk(self, sequences: list[str]) -> list[list[Feature]]:
+        return [self.analyse(sequence) for sequence in sequences]
+
+    def run(self, inputs: Iterable[ProteinSequence]) -> list[ProteinSequence]:
+        sequences = list(inputs)
+        for seq, features in zip(sequences, self.analyse_chunk([seq.sequence for seq in sequences])):
+            seq.add_features(features)
+        return sequences
+
+    async def arun(self,
+                   inputs: Iterable[ProteinSequence],
+                   executor: Executor | None = None,
+                   ) -> list[ProteinSequence]:
+
+        """
+        Analyse the sequences in chunks on the given executor, typically a process pool. Without one, falls back
+        to running in a worker thread.
+
+        :param inputs: ProteinSequence instances to be analysed.
+        :param executor: executor to send chunks of sequence strings to.
+        :return:
+        """
+
+        if executor is None:
+            return await super().arun(inputs)
+
+        loop = asyncio.get_running_loop()
+
+        async def _run_chunk(chunk: tuple[ProteinSequence, ...]) -> None:
+            with metrics.timer('analyse_chunk_seconds', service=type(self).__name__):
+                chunk_features = await loop.run_in_executor(executor, self.analyse_chunk,
+                                                            [seq.sequence for seq in chunk])
+            for seq, features in zip(chunk, chunk_features):
+                seq.add_features(features)
+                self.completed(seq)
+
+        chunks = list(batched(inputs, self.chunk_size))
+        await asyncio.gather(*map(_run_chunk, chunks))
+        return [seq for chunk in chunks for seq in chunk]
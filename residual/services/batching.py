@@ -0,0 +1,45 @@
+from collections import deque
+from dataclasses import dataclass
+
+from residual.protein_sequence import ProteinSequence
+
+
+@dataclass
+class BatchSizer:
+
+    """
+    Sizes jobs that submit several sequences at once. Each batch is filled up to a residue budget, and after every
+    job the budget is moved towards the number of residues that would have come back in the target time, a step at
+    a time, so batches grow while jobs return quickly and shrink when they start to keep results waiting.
+    """
+
+    max_sequences: int = 100
+    min_residues: int = 1_000
+    max_residues: int = 100_000
+    target_latency: float = 120.0  # Seconds from submission to results that a batch should take.
+    residues: float = 10_000  # Current budget.
+    smoothing: float = 0.5  # Weight given to the latest job when updating the budget.
+    max_step: float = 2.0  # Most the budget can grow or shrink by, as a factor, after one job.
+
+    def take(self, pending: deque[ProteinSequence]) -> list[ProteinSequence]:
+        """Removes the next batch from the front of the queue; a sequence over budget by itself is sent alone."""
+        batch = [pending.popleft()]
+        total = len(batch[0])
+        while pending and len(batch) < self.max_sequences and total + len(pending[0]) <= self.residues:
+            total += len(pending[0])
+            batch.append(pending.popleft())
+        return batch
+
+    def record(self, residues: int, latency: float) -> None:
+
+        """
+        Updates the budget from a finished job, assuming its run time grows in proportion to its residues.
+
+        :param residues: total length of the job's sequences.
+        :param latency: seconds from submission to results.
+        """
+
+        estimate = residues * self.target_latency / max(latency, 1e-3)
+        budget = (1 - self.smoothing) * self.residues + self.smoothing * estimate
+        budget = min(self.residues * self.max_step, max(self.residues / self.max_step, budget))
+        self.residues = min(self.max_residues, max(self.min_residues, budget))
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+
+
+class ResultCache:
+
+    """
+    Persistent on-disk store of raw service results, held in an SQLite database. Entries are keyed on the
+    content digest of a sequence together with the parameters of the service that produced them, so identical
+    sequences share results regardless of their names.
+    """
+
+    def __init__(self,
+                 path: str,
+                 *,
+                 ttl: float | None = 30 * 24 * 60 * 60,
+                 max_entries: int | None = None,
+                 sweep_every: int = 1000,
+                 ) -> None:
+
+        """
+        :param path: path to the database file, created if it does not exist.
+        :param ttl: seconds after which an entry is considered stale, default = 30 days. None to never expire.
+        :param max_entries: maximum number of entries to keep, evicting the least recently used first.
+        :param sweep_every: number of puts between deletions of stale entries, which lookups already ignore.
+        """
+
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_every = sweep_every
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS results '
+                         '(key TEXT PRIMARY KEY, data BLOB, created REAL, accessed REAL)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS accessed_idx ON results (accessed)')
+        self._db.commit()
+        self._count = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]  # Kept up to date from here on.
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @staticmethod
+    def make_key(digest: str, params: dict) -> str:
+        """Combines a sequence digest with service parameters into a single cache key."""
+        encoded_params = json.dumps(params, sort_keys=True)
+        return hashlib.sha256(f'{digest}:{encoded_params}'.encode()).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        """Returns the cached data for a key, or None if there is no live entry."""
+        return None if (body := self.get_raw(key)) is None else json.loads(body)
+
+    def get_raw(self, key: str) -> bytes | None:
+
+        """Returns the cached data for a key as undecoded JSON, or None if there is no live entry."""
+
+        row = self._db.execute('SELECT data, created FROM results WHERE key = ?', (key,)).fetchone()
+        now = time.time()
+
+        if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._db.execute('UPDATE results SET accessed = ? WHERE key = ?', (now, key))  # Committed with next write.
+        return zlib.decompress(row[0])
+
+    def put(self, key: str, data: dict) -> None:
+
+        """
+        Stores data under a key, replacing any existing entry. The least recently used entries are evicted as soon
+        as the cache is over capacity, while stale entries are only swept out every sweep_every puts, as finding
+        them takes a scan of the table.
+        """
+
+        now = time.time()
+        blob = zlib.compress(json.dumps(data).encode())
+        exists = self._db.execute('SELECT 1 FROM results WHERE key = ?', (key,)).fetchone()
+        self._db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (key, blob, now, now))
+        self._count += exists is None
+        self._puts += 1
+        if self._puts % self.sweep_every == 0:
+            self.evict()
+        else:
+            self._evict_excess()
+            self._db.commit()
+
+    def _evict_excess(self) -> int:
+        if self.max_entries is None or (excess := self._count - self.max_entries) <= 0:
+            return 0
+        removed = self._db.execute('DELETE FROM results WHERE key IN '
+                                   '(SELECT key FROM results ORDER BY accessed LIMIT ?)', (excess,)).rowcount
+        self._count -= removed
+        return removed
+
+    def evict(self) -> int:
+
+        """Removes expired entries and, if over capacity, the least recently used. Returns the number removed."""
+
+        removed = 0
+        if self.ttl is not None:
+            removed += self._db.execute('DELETE FROM results WHERE created < ?', (time.time() - self.ttl,)).rowcount
+            self._count -= removed
+        removed += self._evict_excess()
+        self._db.commit()
+        return removed
+
+    def report(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0
+        return f'Cache: {self.hits} hits, {self.misses} misses ({hit_rate:.1%} hit rate), {len(self)} entries stored.'
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
@@ -0,0 +1,248 @@
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from residual.protein_sequence import ProteinSequence, Feature
+from residual.protein_sequence.alphabet import ALPHABET
+
+_GAP = 0  # Position a residue is mapped to when it is aligned against a gap.
+
+
+@dataclass
+class ClusterConfig:
+
+    """
+    Settings for grouping close homologs, so a slow service only needs to run one sequence of each group. Candidate
+    pairs are found by comparing MinHash sketches of the sequences' k-mers, then confirmed with a banded alignment.
+    """
+
+    identity: float = 0.9  # Fraction of the longer sequence's residues that must be identical in the alignment.
+    k: int = 4  # Length of the k-mers sketched.
+    sketch_size: int = 64  # Hashes kept per sequence.
+    band_rows: int = 2  # Sketch hashes per LSH band; sequences sharing any band are compared.
+    band_width: int = 32  # Diagonals either side of the main one (after any length difference) that are aligned.
+    max_alignments: int = 4  # Most representatives a sequence is aligned against before starting a cluster itself.
+    seed: int = 0
+
+    @property
+    def min_similarity(self) -> float:
+        """
+        Lowest estimated k-mer Jaccard similarity worth aligning: half that expected of two sequences at the
+        identity threshold with independent substitutions, leaving room for the error of the estimate.
+        """
+        shared = self.identity ** self.k
+        return shared / (2 - shared) / 2
+
+
+def sketch(encoded: Sequence[np.ndarray], config: ClusterConfig) -> np.ndarray:
+
+    """
+    MinHash sketches of each sequence's set of k-mers, for many sequences at once: the k-mers of a chunk of
+    sequences are hashed together, and each sequence's minima taken with a single reduceat.
+
+    :param encoded: sequences as arrays of residue indices, each at least k long.
+    :return: uint32 array with a row of sketch_size hashes per sequence.
+    """
+
+    rng = np.random.default_rng(config.seed)
+    multipliers = rng.integers(1, 1 << 63, config.sketch_size, dtype=np.uint64) | np.uint64(1)
+    offsets = rng.integers(0, 1 << 63, config.sketch_size, dtype=np.uint64)
+    powers = len(ALPHABET) ** np.arange(config.k, dtype=np.uint64)
+
+    sketches = np.empty((len(encoded), config.sketch_size), dtype=np.uint32)
+    chunk = 64
+    for first in range(0, len(encoded), chunk):
+        kmers = [np.lib.stride_tricks.sliding_window_view(enc, config.k) @ powers for enc in encoded[first:first + chunk]]
+        starts = np.cumsum([0] + [len(codes) for codes in kmers[:-1]])
+        # Multiply-shift hashing: the top 32 bits of a random odd multiple, wrapping at 64 bits.
+        hashes = (np.concatenate(kmers)[:, None] * multipliers + offsets) >> np.uint64(32)
+        sketches[first:first + len(kmers)] = np.minimum.reduceat(hashes, starts, axis=0)
+    return sketches
+
+
+def band_keys(sketches: np.ndarray, config: ClusterConfig) -> np.ndarray:
+    """Combines each band of band_rows sketch hashes into one key, distinct between bands."""
+    n, size = sketches.shape
+    bands = sketches[:, :size - size % config.band_rows].reshape(n, -1, config.band_rows).astype(np.uint64)
+    rng = np.random.default_rng(config.seed + 1)
+    weights = rng.integers(1, 1 << 63, (bands.shape[1], config.band_rows), dtype=np.uint64) | np.uint64(1)
+    return (bands * weights).sum(axis=2)
+
+
+def align(a: np.ndarray, b: np.ndarray, band_width: int, min_identity: float = 0.0) -> tuple[float, np.ndarray | None]:
+
+    """
+    Global alignment of two encoded sequences by edit distance, only filling a band of cells around the diagonal.
+    Each row of the band is filled in a few vectorized steps: substitutions and deletions come from the row above,
+    and runs of insertions along the row are resolved with a cumulative minimum.
+
+    :param a: the sequence to map positions from.
+    :param b: the sequence to map positions onto.
+    :param band_width: cells either side of the diagonal, beyond the difference in length, that are filled.
+    :param min_identity: identity below which to give up before tracing the alignment back.
+    :return: identity, as identical residues over the longer length, and the position in b (1-based) that each
+             position of a is aligned to, 0 for a gap, indexed from 1. The mapping is None if the alignment was
+             abandoned.
+    """
+
+    n, m = len(a), len(b)
+    inf = n + m + 1
+    lo = min(0, m - n) - band_width  # Column of the first band cell in row i is i + lo.
+    width = abs(m - n) + 2 * band_width + 1
+    steps = np.arange(width, dtype=np.int32)
+
+    # Whether each band cell's residues differ, from windows over b padded with sentinels that never match.
+    b_padded = np.concatenate((np.full(1 - lo, 255, dtype=b.dtype), b, np.full(width, 255, dtype=b.dtype)))
+    windows = np.lib.stride_tricks.sliding_window_view(b_padded, width)[1:n + 1]
+    mismatches = (a[:, None] != windows).astype(np.int32)
+
+    # Cells left of column 0 start out of reach, which also gives column 0 its cost of i. Cells right of column m
+    # fill up with values that only ever flow further right, so are left as they are.
+    band = np.empty((n + 1, width), dtype=np.int32)
+    band[0] = np.where(lo + steps >= 0, lo + steps, inf)
+    above = np.empty(width, dtype=np.int32)
+    above[-1] = inf
+    for i in range(1, n + 1):
+        previous, row = band[i - 1], band[i]
+        np.add(previous[1:], 1, out=above[:-1])
+        np.add(previous, mismatches[i - 1], out=row)
+        np.minimum(row, above, out=row)
+        row -= steps
+        np.minimum.accumulate(row, out=row)  # Take any run of insertions from the left.
+        row += steps
+
+    distance = int(band[n, m - n - lo])
+    longer = max(n, m)
+    if (n + m - distance) / 2 < min_identity * longer:  # Even the most matches this distance allows fall short.
+        return 0.0, None
+
+    mapping = np.zeros(n + 1, dtype=np.int32)
+    matches = 0
+    a, b = a.tobytes(), b.tobytes()
+    i, j = n, m
+    while i > 0 and j > 0:
+        k = j - i - lo
+        here = band[i, k]
+        match = a[i - 1] == b[j - 1]
+        if here == band[i - 1, k] + (not match):
+            mapping[i] = j
+            matches += match
+            i, j = i - 1, j - 1
+        elif k + 1 < width and here == band[i - 1, k + 1] + 1:
+            i -= 1
+        else:
+            j -= 1
+    return matches / longer, mapping
+
+
+def map_features(features: Iterable[Feature], mapping: np.ndarray) -> list[Feature]:
+
+    """
+    Carries features over to an aligned sequence, flagged as inferred. Each location is moved to the span of the
+    positions its residues are aligned to; locations aligned entirely against gaps are dropped, as are features
+    left with none.
+    """
+
+    mapped = []
+    for ft in features:
+        locations = []
+        for start, end in ft.locations or ():
+            aligned = mapping[start:end + 1]
+            aligned = aligned[aligned != _GAP]
+            if aligned.size:
+                locations.append((int(aligned[0]), int(aligned[-1])))
+        if locations or not ft.locations:
+            mapped.append(Feature(ft.service, ft.name, locations, list(ft.go_terms), inferred=True))
+    return mapped
+
+
+class SequenceClusters:
+
+    """
+    Groups sequences into clusters of close homologs, each led by a representative that every other member aligns
+    to above the identity threshold. Sequences are taken longest first, each joining the first representative it
+    aligns to well enough or else starting a cluster of its own. Representatives to align against are found through
+    locality-sensitive hashing of the sketches, most similar first, so a sequence is only aligned against a few.
+    Once a service has added features to a representative, transfer maps them onto the members.
+    """
+
+    def __init__(self, sequences: Iterable[ProteinSequence], config: ClusterConfig | None = None) -> None:
+
+        self.config = config or ClusterConfig()
+        self._members: dict[int, list[tuple[ProteinSequence, np.ndarray]]] = {}  # By id of the representative.
+        self.representatives: list[ProteinSequence] = []
+
+        sequences = sorted(sequences, key=len, reverse=True)
+        sketchable = [seq for seq in sequences if len(seq) >= self.config.k]
+        self.representatives += [seq for seq in sequences if len(seq) < self.config.k]
+        for seq in self.representatives:
+            self._members[id(seq)] = []
+        if not sketchable:
+            return
+
+        sketches = sketch([seq.encoded for seq in sketchable], self.config)
+        keys = band_keys(sketches, self.config).tolist()
+        buckets: dict[int, list[int]] = {}  # Band key -> indices of the representatives with it.
+
+        for i, seq in enumerate(sketchable):
+            candidates = {rep for key in keys[i] for rep in buckets.get(key, ())}
+            if candidates and self._join(i, sketchable, sketches, sorted(candidates)):
+                continue
+            self.representatives.append(seq)
+            self._members[id(seq)] = []
+            for key in keys[i]:
+                buckets.setdefault(key, []).append(i)
+
+    def _join(self, i: int, sequences: list[ProteinSequence], sketches: np.ndarray, candidates: list[int]) -> bool:
+
+        """Aligns a sequence against its most similar candidate representatives, joining the first close enough."""
+
+        config, seq = self.config, sequences[i]
+        similarity = (sketches[candidates] == sketches[i]).mean(axis=1)
+        tried = 0
+        for c in np.argsort(-similarity, kind='stable'):
+            if similarity[c] < config.min_similarity or tried == config.max_alignments:
+                break
+            rep = sequences[candidates[c]]
+            if len(seq) < config.identity * len(rep):  # Too short to reach the identity over rep's length.
+                continue
+            tried += 1
+            identity, mapping = align(rep.encoded, seq.encoded, config.band_width, config.identity)
+            if identity >= config.identity:
+                self._members[id(rep)].append((seq, mapping))
+                return True
+        return False
+
+    def __len__(self):
+        return len(self.representatives)
+
+    @property
+    def total(self) -> int:
+        return sum(len(members) + 1 for members in self._members.values())
+
+    @property
+    def saved(self) -> int:
+        """Number of sequences a service need not run, as they are covered by a representative."""
+        return self.total - len(self)
+
+    def members(self, representative: ProteinSequence) -> list[ProteinSequence]:
+        """Returns the other sequences in the representative's cluster."""
+        return [seq for seq, _ in self._members[id(representative)]]
+
+    def transfer(self, representative: ProteinSequence, features: Iterable[Feature]) -> list[ProteinSequence]:
+
+        """
+        Maps a representative's features onto each member of its cluster through their alignments, adding them
+        as inferred features.
+
+        :param representative: sequence the features were found on.
+        :param features: features to transfer, typically those one service added to the representative.
+        :return: the members of the cluster.
+        """
+
+        features = list(features)
+        members = self._members.get(id(representative), [])
+        for seq, mapping in members:
+            seq.add_features(map_features(features, mapping))
+        return [seq for seq, _ in members]
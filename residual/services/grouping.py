@@ -0,0 +1,53 @@
+from collections.abc import Iterable
+
+from residual.protein_sequence import ProteinSequence
+
+
+class SequenceGroups:
+
+    """
+    Groups ProteinSequences by sequence content, so that services need only analyse each unique sequence once.
+    The first sequence of each group acts as its representative; once services have attached features to the
+    representatives, fan_out copies them to the rest of the group.
+    """
+
+    def __init__(self, sequences: Iterable[ProteinSequence]) -> None:
+        self._groups: dict[str, list[ProteinSequence]] = {}
+        for seq in sequences:
+            self._groups.setdefault(seq.sequence, []).append(seq)
+
+        # Only features added after grouping are fanned out, so note where each representative's new features begin.
+        self._offsets = {id(group[0]): len(group[0].features) for group in self._groups.values()}
+
+    def __len__(self):
+        return len(self._groups)
+
+    @property
+    def representatives(self) -> list[ProteinSequence]:
+        return [group[0] for group in self._groups.values()]
+
+    @property
+    def total(self) -> int:
+        return sum(map(len, self._groups.values()))
+
+    @property
+    def saved(self) -> int:
+        """Number of jobs per service avoided by only running the representatives."""
+        return self.total - len(self)
+
+    def members(self, representative: ProteinSequence) -> list[ProteinSequence]:
+        """Returns the other sequences sharing the representative's content."""
+        return self._groups[representative.sequence][1:]
+
+    def fan_out(self) -> None:
+
+        """Attaches the features gathered by each representative to every other member of its group."""
+
+        for group in self._groups.values():
+            self.fan_out_group(group[0])
+
+    def fan_out_group(self, representative: ProteinSequence) -> None:
+        """Attaches the features gathered by a single representative to the rest of its group."""
+        new_features = representative.features[self._offsets[id(representative)]:]
+        for member in self.members(representative):
+            member.add_features(new_features)
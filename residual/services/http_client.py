@@ -0,0 +1,217 @@
+import asyncio
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+from loguru import logger
+
+from residual.metrics import metrics
+
+
+@dataclass
+class RateLimit:
+
+    """
+    Limits on the requests made to a host. Requests are paced by a token bucket refilled at a steady rate, which
+    allows short bursts. When the host answers 429 or 503 the rate is cut, and it then creeps back up towards the
+    configured rate with each successful request, so a run settles just under the host's real limit.
+    """
+
+    rate: float = 10.0  # Requests per second.
+    burst: int = 10  # Requests that can be made at once after a quiet spell.
+    max_connections: int = 30
+    keepalive_timeout: float = 30.0  # Seconds to keep an idle connection open for reuse.
+    slowdown: float = 0.5  # Factor the rate is cut by when throttled.
+    recovery: float = 0.1  # Requests per second the rate recovers by with each success.
+    min_rate: float = 0.2
+    max_retries: int = 5  # Times a throttled request is retried before its response is passed on.
+
+
+class TokenBucket:
+
+    """
+    Token bucket, with tokens taken as soon as a request asks for one, so the bucket can go into debt and each
+    waiter sleeps for its share of it. Needs no lock, so it can be kept across event loops.
+    """
+
+    def __init__(self, limit: RateLimit) -> None:
+        self.limit = limit
+        self.rate = limit.rate
+        self._tokens = float(limit.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._cut_at = float('-inf')  # When the rate was last cut.
+
+    def _reserve(self) -> float:
+        """Takes a token, returning how long to wait before it can be used."""
+        now = time.monotonic()
+        self._tokens = min(self.limit.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= 1
+        return max(-self._tokens / self.rate, self._paused_until - now, 0)
+
+    async def acquire(self) -> None:
+        if wait := self._reserve():
+            await asyncio.sleep(wait)
+
+    def throttle(self, retry_after: float | None = None, sent: float | None = None) -> bool:
+
+        """
+        Slows down after the host has refused a request, pausing for as long as the host asked. Requests already in
+        flight when the rate was last cut were sent too fast for the old rate, not the new one, so their refusals
+        only extend the pause, and a burst of refusals cuts the rate once.
+
+        :param retry_after: seconds the host asked to wait, if it said.
+        :param sent: time.monotonic() when the refused request was sent, default = now.
+        :return: whether the rate was cut.
+        """
+
+        now = time.monotonic()
+        cut = sent is None or sent >= self._cut_at
+        if cut:
+            self.rate = max(self.limit.min_rate, self.rate * self.limit.slowdown)
+            self._cut_at = now
+        self._paused_until = max(self._paused_until,
+                                 now + (retry_after if retry_after is not None else 1 / self.rate))
+        return cut
+
+    def restrict(self, limit: RateLimit) -> None:
+        """Switches to a stricter limit, keeping any slowdown below its rate."""
+        self.limit = limit
+        self.rate = min(self.rate, limit.rate)
+        self._tokens = min(self._tokens, limit.burst)
+
+    def recover(self) -> None:
+        self.rate = min(self.limit.rate, self.rate + self.limit.recovery)
+
+
+def _retry_after(res: aiohttp.ClientResponse) -> float | None:
+    try:
+        return float(res.headers['Retry-After'])
+    except (KeyError, ValueError):  # Missing, or given as a date.
+        return None
+
+
+class _Host:
+
+    """A host's session, opened while any client needs it, and its rate limiter, which outlives the session."""
+
+    def __init__(self, limit: RateLimit) -> None:
+        self.limit = limit
+        self.bucket = TokenBucket(limit)
+        self.session: aiohttp.ClientSession | None = None
+        self.users = 0
+        self.requests = 0
+        self.throttled: Counter[int] = Counter()  # Throttling responses, by status.
+
+    def open(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit.max_connections,
+                                             keepalive_timeout=self.limit.keepalive_timeout,
+                                             ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector)
+        return self.session
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class HttpClient:
+
+    """
+    Makes rate-limited requests to one host through its shared session. Relative URLs are resolved against the
+    base URL. Request methods return async context managers, as with aiohttp.ClientSession.
+    """
+
+    THROTTLE_STATUSES = {429, 503}
+
+    def __init__(self, host: _Host, base_url: str) -> None:
+        self._host = host
+        self.base_url = base_url
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, **kwargs):
+        host = self._host
+        url = urljoin(self.base_url, url)
+        for attempt in range(host.limit.max_retries + 1):
+            await host.bucket.acquire()
+            host.requests += 1
+            sent = time.monotonic()
+            res = await host.session.request(method, url, **kwargs)
+            metrics.count('http_responses', status=res.status)
+            if res.status not in self.THROTTLE_STATUSES or attempt == host.limit.max_retries:
+                break
+            host.throttled[res.status] += 1
+            if host.bucket.throttle(_retry_after(res), sent):
+                logger.warning(f'{urlsplit(url).netloc}: Throttled with HTTP {res.status}, '
+                               f'slowing to {host.bucket.rate:.2g} requests/s.')
+            res.release()
+
+        if res.ok:
+            host.bucket.recover()
+        try:
+            yield res
+        finally:
+            res.release()
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def report(self) -> str:
+        host = self._host
+        throttled = ', '.join(f'{count} x HTTP {status}' for status, count in sorted(host.throttled.items()))
+        return (f'{urlsplit(self.base_url).netloc}: {host.requests} requests, now limited to '
+                f'{host.bucket.rate:.2g}/s' + (f', throttled {throttled}.' if throttled else '.'))
+
+
+class ClientPool:
+
+    """
+    Shares one connection pool and rate limiter per host between all the services using it. A host's session
+    stays open while any client for it is in use, and its rate limiter is kept for the rest of the process, so
+    a slowdown carries over between batches. Where services give a host different limits, the one with the lower
+    rate is kept; connection limits change the next time the host's session is opened.
+    """
+
+    def __init__(self) -> None:
+        self._hosts: dict[str, _Host] = {}
+
+    @asynccontextmanager
+    async def client(self, base_url: str, limit: RateLimit | None = None):
+
+        """
+        Opens a client for the host of a URL.
+
+        :param base_url: URL that relative request URLs are resolved against.
+        :param limit: limits for the host, used if it is not yet in use or stricter than its current limits.
+        """
+
+        netloc = urlsplit(base_url).netloc
+        if (host := self._hosts.get(netloc)) is None:
+            host = self._hosts[netloc] = _Host(limit or RateLimit())
+        elif limit is not None and limit.rate < host.limit.rate:
+            logger.info(f'{netloc}: Lowering the limit to {limit.rate:.2g} requests/s, from {host.limit.rate:.2g}.')
+            host.limit = limit
+            host.bucket.restrict(limit)
+        elif limit is not None and limit != host.limit:
+            logger.debug(f'{netloc}: Already has stricter limits set, ignoring {limit}.')
+
+        host.open()
+        host.users += 1
+        try:
+            yield HttpClient(host, base_url)
+        finally:
+            host.users -= 1
+            if not host.users:
+                await host.close()
+
+
+client_pool = ClientPool()
@@ -1,16 +1,34 @@
 import asyncio
+import codecs
+import json
+import re
+import sys
+import time
+from collections import deque
+from itertools import chain
+
+from typing import Iterable, TYPE_CHECKING
 
 import aiohttp
-from typing import Iterable
 
 from loguru import logger
 
-from residual.protein_sequence import ProteinSequence, Feature, GoTerm
+from residual.metrics import metrics
+from residual.protein_sequence import ProteinSequence, Feature, GoTerm, go_term_registry
 from residual.services import ServiceBaseClass, register_service
+from residual.services.batching import BatchSizer
+from residual.services.cache import ResultCache
+from residual.services.http_client import HttpClient, RateLimit, client_pool
+from residual.services.journal import JobJournal
+from residual.services.polling import PollingConfig, StatusPoller
 
+if TYPE_CHECKING:
+    from residual.services.clustering import ClusterConfig, SequenceClusters
 
 class MatchParser:
 
+    service = 'iprscan5'  # Service name given to the parsed features.
+
     @staticmethod
     def _compose_name(data: dict) -> str | None:
         """Forms feature name from data; returns None if not enough information to give a meaningful name."""
@@ -25,7 +43,7 @@ class MatchParser:
         if go_refs := data.get('goXRefs'):
             for ref in go_refs:
                 if 'databaseName' in ref: ref.pop('databaseName')
-                go_terms.append(GoTerm(**ref))
+                go_terms.append(go_term_registry.intern(**ref))
         return go_terms
 
     def _parse_match(self, match: dict) -> Feature | None:
@@ -42,7 +60,7 @@ class MatchParser:
             name = self._compose_name(entry) or name
             go_terms += self._collect_go_terms(entry)
 
-        return Feature('iprscan5', name, locations, go_terms) if name else None
+        return Feature(self.service, sys.intern(name), locations, go_terms) if name else None
 
     def _parse_iprscan_data(self, data: dict) -> list[Feature]:
         """Parses response from an InterProScan job into a list of Features."""
@@ -53,21 +71,247 @@ class MatchParser:
         return self._parse_iprscan_data(__match)
 
 
+class _NeedMore(Exception):
+    """Raised when the buffered text ends partway through a value."""
+
+
+class ResultStream:
+
+    """
+    Incremental parser for the JSON results of a job, fed the response body a chunk at a time. Each match is
+    decoded as soon as the whole of it has arrived and parsed straight into a feature, so a large result is never
+    parsed in one go and only the undecoded tail of the body is kept as text. The results are still collected
+    whole, for caching.
+    """
+
+    _whitespace = re.compile(r'[\s,]*')  # Separators are skipped along with whitespace.
+    _structure = re.compile(r'["\\{}\[\]]')  # Characters that open or close strings, objects and arrays.
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, parser: MatchParser) -> None:
+        self.parser = parser
+        self.data: dict = {}
+        self.features: list[list[Feature]] = []  # Features of each result, in order.
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._state = self._start
+        self._final = False
+        self._scan: tuple[int, int, int, bool] | None = None  # Progress through an unfinished object or array.
+
+    def feed(self, chunk: bytes) -> None:
+        self._parse(self._text.decode(chunk))
+
+    def close(self) -> 'ResultStream':
+        """Parses whatever is left of the body; raises JSONDecodeError if it was incomplete."""
+        self._final = True
+        self._parse(self._text.decode(b'', final=True))
+        if self._state is not None:
+            raise json.JSONDecodeError('Unexpected end of results', self._buffer, len(self._buffer))
+        return self
+
+    def parse(self, body: bytes) -> 'ResultStream':
+        """Parses a whole body at once, such as a cached result."""
+        self.feed(body)
+        return self.close()
+
+    def split(self) -> dict[str, tuple[dict, list[Feature]]]:
+        """Splits the results of a job with several sequences by their ids, each in the form of a single-sequence
+        job's results, with its features."""
+        return {result['xref'][0]['id']: ({'results': [result]}, features)
+                for result, features in zip(self.data['results'], self.features)}
+
+    def _parse(self, text: str) -> None:
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        try:
+            while self._state is not None:
+                self._state = self._state()
+        except _NeedMore:
+            pass
+
+    # Each state consumes one step of the document and returns the next state. Position only moves on once the
+    # whole step has been read, so a step cut short by the end of a chunk is tried again with the next one.
+
+    def _skip(self, pos: int) -> int:
+        pos = self._whitespace.match(self._buffer, pos).end()
+        if pos == len(self._buffer):
+            raise _NeedMore
+        return pos
+
+    def _expect(self, pos: int, char: str) -> int:
+        pos = self._skip(pos)
+        if self._buffer[pos] != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', self._buffer, pos)
+        return pos + 1
+
+    def _container_end(self, start: int) -> int:
+
+        """
+        Finds the end of the object or array starting at start. A value cut short by the end of the buffer is
+        scanned from where the last attempt stopped, rather than from its start, so a value spread over many
+        chunks is only read through once. Offsets are kept relative to the current step, as the buffer is trimmed
+        up to it before each chunk.
+        """
+
+        if self._scan is not None and self._scan[0] == start - self._pos:
+            _, pos, depth, in_string = self._scan
+            pos += self._pos
+        else:
+            pos, depth, in_string = start, 0, False
+
+        buffer = self._buffer
+        while match := self._structure.search(buffer, pos):
+            char, pos = match.group(), match.end()
+            if in_string:
+                if char == '\\':
+                    pos += 1  # Skip the escaped character.
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                depth += 1
+            elif char in '}]':
+                depth -= 1
+                if depth == 0:
+                    self._scan = None
+                    return pos
+        self._scan = (start - self._pos, pos - self._pos, depth, in_string)
+        raise _NeedMore
+
+    def _decode(self, pos: int):
+        pos = self._skip(pos)
+        if self._buffer[pos] in '{[':  # Only decode once the whole value has arrived.
+            self._container_end(pos)
+            return self._decoder.raw_decode(self._buffer, pos)
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            if self._final:
+                raise
+            raise _NeedMore
+        if end == len(self._buffer) and not self._final:  # A number may continue in the next chunk.
+            raise _NeedMore
+        return value, end
+
+    def _key(self, pos: int) -> tuple[str | None, int]:
+        """Reads an object key and its colon, or the end of the object, as a key of None."""
+        pos = self._skip(pos)
+        if self._buffer[pos] == '}':
+            return None, pos + 1
+        key, pos = self._decode(pos)
+        return key, self._expect(pos, ':')
+
+    def _start(self):
+        self._pos = self._expect(self._pos, '{')
+        return self._top_key
+
+    def _top_key(self):
+        key, pos = self._key(self._pos)
+        if key is None:
+            self._pos = pos
+            return None
+        if key == 'results':
+            self._pos = self._expect(pos, '[')
+            self.data['results'] = []
+            return self._result_start
+        self.data[key], self._pos = self._decode(pos)
+        return self._top_key
+
+    def _result_start(self):
+        pos = self._skip(self._pos)
+        if self._buffer[pos] == ']':
+            self._pos = pos + 1
+            return self._top_key
+        self._pos = self._expect(pos, '{')
+        self.data['results'].append({})
+        self.features.append([])
+        return self._result_key
+
+    def _result_key(self):
+        key, pos = self._key(self._pos)
+        if key is None:
+            self._pos = pos
+            return self._result_start
+        if key == 'matches':
+            self._pos = self._expect(pos, '[')
+            self.data['results'][-1]['matches'] = []
+            return self._match
+        self.data['results'][-1][key], self._pos = self._decode(pos)
+        return self._result_key
+
+    def _match(self):
+        pos = self._skip(self._pos)
+        if self._buffer[pos] == ']':
+            self._pos = pos + 1
+            return self._result_key
+        match, self._pos = self._decode(pos)
+        self.data['results'][-1]['matches'].append(match)
+        if (ft := self.parser._parse_match(match)) is not None:
+            self.features[-1].append(ft)
+        return self._match
+
+
 @register_service
 class InterProScan(ServiceBaseClass):
 
     base_url = 'https://www.ebi.ac.uk/Tools/services/rest/iprscan5/'
     max_jobs = 30
+    chunk_size = 1 << 16  # Bytes of results to parse at a time.
+    rate_limit = RateLimit(rate=10, burst=10, max_connections=30)
     parser = MatchParser()
 
-    def __init__(self, user_email: str):
+    def __init__(self,
+                 user_email: str,
+                 *,
+                 cache: ResultCache | None = None,
+                 polling: PollingConfig | None = None,
+                 journal: JobJournal | None = None,
+                 rate_limit: RateLimit | None = None,
+                 max_jobs: int | None = None,
+                 batching: BatchSizer | None = None,
+                 base_url: str | None = None,
+                 clustering: 'ClusterConfig | None' = None,
+                 ):
+
+        """
+        :param base_url: address of the API, to use a mirror or a local stand-in instead of EBI's.
+        :param batching: sizes jobs that submit several sequences at once, as multi-FASTA. By default, each
+        sequence is submitted as a job of its own. EBI's own client splits multi-FASTA input into a job per sequence,
+        and the public service has not been checked to scan every sequence of a multi-FASTA job, so batching is meant
+        for mirrors or local installs known to; sequences missing from a batch's results are logged as errors.
+        :param clustering: groups close homologs so only one sequence of each group is scanned, with features
+        mapped onto the others through their alignments and flagged as inferred. By default, every sequence is scanned.
+        """
+
         super().__init__()
         self.user_email = user_email
+        self.base_url = base_url or self.base_url
+        self.rate_limit = rate_limit or self.rate_limit
+        self.max_jobs = max_jobs or self.max_jobs
+        self.cache = cache
+        self.journal = journal
+        self.batching = batching
+        self.clustering = clustering
+        self._clusters: 'SequenceClusters | None' = None  # Clusters of the current run, if clustering.
+        self.polling = polling or PollingConfig()
+        self.status_requests: dict[str, int] = {}  # Status checks made for each job, by job id.
+        self.params = {
+            'goterms': True,
+            'pathways': False,
+            'stype': 'p',
+        }
+
+    def _job_key(self, seq: ProteinSequence) -> str:
+        """Identifies a job by its inputs: the sequence content and the scan parameters."""
+        return ResultCache.make_key(seq.digest, self.params)
 
     async def _submit_sequence(self,
-                               session: aiohttp.ClientSession,
+                               session: HttpClient,
+                               poller: StatusPoller,
                                seq: ProteinSequence,
-                               ) -> dict:
+                               ) -> ResultStream | None:
 
         """
         Sends request for a given sequence to the InterProScan API, waits for the result and returns it.
@@ -76,70 +320,98 @@ class InterProScan(ServiceBaseClass):
         payload = {
             'email': self.user_email,
             'title': seq.name,
-            'goterms': True,
-            'pathways': False,
-            'stype': 'p',
+            **self.params,
             'sequence': seq.sequence,
         }
 
+        key = self._job_key(seq)
+        if self.journal and (job_id := self.journal.resumable(key)):
+            logger.info(f'{seq.name}: Reattaching to job {job_id}...')
+            try:
+                if results := await self._retrieve_results(session, poller, job_id, len(seq), reattaching=True):
+                    return results
+            except aiohttp.ClientResponseError as e:
+                logger.error(f'HTTP Error {e.status}: {e.message}')
+            logger.warning(f'{seq.name}: Could not retrieve job {job_id}, resubmitting.')
+
+        if job_id := await self._post_job(session, payload):
+            if self.journal:
+                self.journal.submitted(key, seq.digest, job_id)
+            return await self._retrieve_results(session, poller, job_id, len(seq))
+        return None
+
+    @staticmethod
+    async def _post_job(session: HttpClient, payload: dict) -> str | None:
+
+        """
+        Submits a job, retrying on server-side errors.
+
+        :return: id of the job, or None if it could not be submitted.
+        """
+
         retries = 3
         for attempt in range(1, retries+1):
             try:
                 async with session.post('run', data=payload) as res:
                     res.raise_for_status()
-                    job_id = await res.text()
-                    return await self._retrieve_results(session, job_id)
+                    metrics.count('jobs_submitted')
+                    return await res.text()
 
             except aiohttp.ClientResponseError as e:
                 logger.error(f'HTTP Error {e.status}: {e.message} (Attempt {attempt} of {retries})')
                 if e.status >= 500:  # Server-side error
+                    metrics.count('submit_retries')
                     await asyncio.sleep(2**attempt)
                     continue
                 else:  # Client-side error
                     break
 
-        return {}
+        metrics.count('submit_failures')
+        return None
 
     async def _retrieve_results(self,
-                                session: aiohttp.ClientSession,
+                                session: HttpClient,
+                                poller: StatusPoller,
                                 job_id: str,
-                                check_delay: int = 1,
-                                ) -> dict:
+                                seq_length: int = 0,
+                                reattaching: bool = False,
+                                ) -> ResultStream | None:
 
         """
-        Fetch results for a job.
+        Fetch results for a job, once the poller reports that it has finished.
 
         :param job_id: id of the job, provided at submission.
-        :param check_delay: how long in seconds to wait between checking job status.
-        :return: dictionary containing json data.
-        :raises: HTTPError if a problem with the status checking or data retrieval.
-        :raises: ValueError if save filepath is not to a file ending '.json'.
-        :raises: FileNotFoundError if save filepath is not valid.
+        :param seq_length: length of the submitted sequence, used to pace status checks.
+        :param reattaching: whether the job was submitted by an earlier run, so its status is checked straight away.
+        :return: the parsed results, or None if the job did not finish successfully.
+        :raises: HTTPError if a problem with the data retrieval.
         """
 
-        while True:
-            try:
-                async with session.get(f'status/{job_id}') as res:
-                    res.raise_for_status()
-                    status = await res.text()
-            except aiohttp.ClientResponseError as e:
-                logger.error(f'HTTP Error {e.status}: {e.message}')
-                return {}
-
-            if status != 'FINISHED':
-                await asyncio.sleep(check_delay)
-            else:
-                break
-
-        async with session.get(f'result/{job_id}/json') as res:
-            res.raise_for_status()
-            job_data = await res.json()
-            return job_data
+        with metrics.timer('job_wait_seconds'):  # Time queued and running at EBI, as seen through polling.
+            status = await poller.wait(job_id, seq_length, first_delay=0 if reattaching else None)
+        metrics.count('job_status', status=status)
+        if self.journal:
+            self.journal.update(job_id, status)
+        if status != 'FINISHED':
+            logger.error(f'Job {job_id} ended with status {status}.')
+            return None
+
+        # Parse the body as it downloads, off the event loop so that other jobs' polling isn't held up.
+        loop = asyncio.get_running_loop()
+        results = ResultStream(self.parser)
+        with metrics.timer('result_seconds'):
+            async with session.get(f'result/{job_id}/json') as res:
+                res.raise_for_status()
+                async for chunk in res.content.iter_chunked(self.chunk_size):
+                    metrics.count('result_bytes', len(chunk))
+                    await loop.run_in_executor(None, results.feed, chunk)
+            return await loop.run_in_executor(None, results.close)
 
     async def _scan_sequence(self,
                              seq: ProteinSequence,
                              semaphore: asyncio.Semaphore,
-                             session: aiohttp.ClientSession) -> None:
+                             session: HttpClient,
+                             poller: StatusPoller) -> None:
 
         """
         Query the InterProScan with a sequence, collect the results and write the data
@@ -150,34 +422,187 @@ class InterProScan(ServiceBaseClass):
         :return:
         """
 
-        logger.info(f'{seq.name}: Waiting for semaphore...')
+        try:
+            logger.info(f'{seq.name}: Waiting for semaphore...')
+
+            with metrics.timer('semaphore_wait_seconds'):
+                await semaphore.acquire()
+            try:
+                logger.info(f'{seq.name}: Scanning now...')
+                with metrics.in_flight('jobs_in_flight'):
+                    results = await self._submit_sequence(session, poller, seq)
+                if not results or not results.features:
+                    logger.error('No data returned from job.')
+                    return
+                self._add_result(seq, results.data, results.features[0])
+            finally:
+                semaphore.release()
+
+            logger.info(f'{seq.name}: Scan finished.')
+
+        finally:
+            self.completed(seq)
+
+    async def _take_cached(self, sequences: list[ProteinSequence]) -> list[ProteinSequence]:
+
+        """
+        Adds features from cached results, marking those sequences complete, so each sequence is only looked up
+        once per run whether it is then clustered, batched or scanned alone. Cached bodies are parsed off the event
+        loop, as results fetched from the API are.
+
+        :return: the sequences without a cached result, left to scan.
+        """
 
-        async with semaphore:
-            logger.info(f'{seq.name}: Scanning now...')
-            data = await self._submit_sequence(session, seq)
-            if not data:
-                logger.error('No data returned from job.')
-                return
-            seq.features += self.parser(data)
+        if not self.cache:
+            return sequences
+        loop = asyncio.get_running_loop()
+        uncached = []
+        for seq in sequences:
+            if (body := self.cache.get_raw(self._job_key(seq))) is None:
+                uncached.append(seq)
+                continue
+            logger.info(f'{seq.name}: Using cached result.')
+            metrics.count('cache_hits')
+            results = await loop.run_in_executor(None, ResultStream(self.parser).parse, body)
+            seq.add_features(results.features[0])
+            self.completed(seq)
+        return uncached
+
+    def _add_result(self, seq: ProteinSequence, data: dict, features: list[Feature]) -> None:
+        if self.cache:
+            self.cache.put(self._job_key(seq), data)
+        seq.add_features(features)
+
+    async def _scan_batch(self,
+                          batch: list[ProteinSequence],
+                          session: HttpClient,
+                          poller: StatusPoller,
+                          job_id: str | None = None,
+                          ) -> list[ProteinSequence]:
 
-        logger.info(f'{seq.name}: Scan finished.')
+        """
+        Scans several sequences in one job, submitted as multi-FASTA with each sequence identified by its digest,
+        and adds the features to each sequence from its share of the results.
+
+        :param batch: sequences to be scanned together.
+        :param job_id: id of a job submitted by an earlier run to retrieve, instead of submitting a new one.
+        :return: sequences left without results, which have not been marked complete.
+        """
+
+        reattaching = job_id is not None
+        residues = sum(map(len, batch))
+        start = time.monotonic()
+
+        if not reattaching:
+            payload = {
+                'email': self.user_email,
+                'title': batch[0].name if len(batch) == 1 else f'{batch[0].name} and {len(batch) - 1} more',
+                **self.params,
+                'sequence': ''.join(f'>{seq.digest}\n{seq.sequence}\n' for seq in batch),
+            }
+            if (job_id := await self._post_job(session, payload)) and self.journal:
+                self.journal.submitted_batch([(self._job_key(seq), seq.digest) for seq in batch], job_id)
+
+        results = None
+        if job_id:
+            try:
+                results = await self._retrieve_results(session, poller, job_id, residues, reattaching=reattaching)
+            except aiohttp.ClientResponseError as e:
+                logger.error(f'HTTP Error {e.status}: {e.message}')
+        if results and not reattaching:
+            self.batching.record(residues, time.monotonic() - start)
+
+        by_id = results.split() if results else {}
+        missing = []
+        for seq in batch:
+            if (result := by_id.get(seq.digest)) is None:
+                missing.append(seq)
+                continue
+            self._add_result(seq, *result)
+            self.completed(seq)
+        return missing
+
+    async def _batch_worker(self, pending: deque[ProteinSequence], session: HttpClient, poller: StatusPoller):
+        """Takes batches from the queue and scans them, one job at a time, until the queue is empty."""
+        while pending:
+            batch = self.batching.take(pending)
+            logger.info(f'Scanning batch of {len(batch)} sequences ({sum(map(len, batch))} residues)...')
+            with metrics.in_flight('jobs_in_flight'):
+                missing = await self._scan_batch(batch, session, poller)
+            for seq in missing:
+                logger.error(f'{seq.name}: No results returned from batch job.')
+                self.completed(seq)
+
+    async def _dispatch_batches(self, sequences: list[ProteinSequence], session: HttpClient, poller: StatusPoller):
+
+        pending = sequences
+        if self.journal:  # Reattach to jobs recorded by an earlier run, resubmitting any sequences left over.
+            recorded: dict[str | None, list[ProteinSequence]] = {}
+            for seq in pending:
+                recorded.setdefault(self.journal.resumable(self._job_key(seq)), []).append(seq)
+            fresh = recorded.pop(None, [])
+            for job_id in recorded:
+                logger.info(f'Reattaching to job {job_id} for {len(recorded[job_id])} sequences...')
+            left_over = await asyncio.gather(*(self._scan_batch(batch, session, poller, job_id=job_id)
+                                               for job_id, batch in recorded.items()))
+            pending = fresh + list(chain.from_iterable(left_over))
+
+        queue = deque(pending)
+        await asyncio.gather(*(self._batch_worker(queue, session, poller) for _ in range(self.max_jobs)))
 
     async def _dispatch_jobs(self, sequences: Iterable[ProteinSequence]):
 
         semaphore = asyncio.Semaphore(self.max_jobs)
 
-        async with aiohttp.ClientSession(base_url=self.base_url) as session:
-            jobs = [self._scan_sequence(seq, semaphore, session) for seq in sequences]
-            await asyncio.gather(*jobs)
+        async with client_pool.client(self.base_url, self.rate_limit) as client:
+            poller = StatusPoller(client, self.polling)
+            try:
+                if self.batching:
+                    await self._dispatch_batches(list(sequences), client, poller)
+                else:
+                    await asyncio.gather(*(self._scan_sequence(seq, semaphore, client, poller) for seq in sequences))
+            finally:
+                poller.close()
+                self.status_requests.update(poller.requests)
+                logger.info(client.report())
 
 
-    def run(self, inputs: Iterable[ProteinSequence]) -> list[ProteinSequence]:
+    def completed(self, seq: ProteinSequence) -> None:
+        """Marks a sequence as finished, along with the rest of its cluster once its features are mapped onto them."""
+        if self._clusters is not None:
+            features = [ft for ft in seq.features if ft.service == self.parser.service and not ft.inferred]
+            for member in self._clusters.transfer(seq, features):
+                super().completed(member)
+        super().completed(seq)
+
+    async def _cluster(self, sequences: list[ProteinSequence]) -> list[ProteinSequence]:
+
+        """Clusters the sequences left to scan, returning the representatives."""
+
+        from residual.services.clustering import SequenceClusters  # Only loads numpy if clustering is used.
+
+        clusters = await asyncio.to_thread(SequenceClusters, sequences, self.clustering)
+        logger.info(f'{clusters.total} sequences clustered into {len(clusters)} at {self.clustering.identity:.0%} '
+                    f'identity, saving {clusters.saved} jobs.')
+        metrics.count('clustered_sequences', clusters.saved)
+        self._clusters = clusters
+        return clusters.representatives
+
+    async def arun(self, inputs: Iterable[ProteinSequence]) -> list[ProteinSequence]:
 
         logger.info('Running InterProScan...')
-        sequences = iter(inputs)
-        asyncio.run(self._dispatch_jobs(sequences))
+        sequences = list(inputs)
+        try:
+            pending = await self._take_cached(sequences)
+            await self._dispatch_jobs(await self._cluster(pending) if self.clustering else pending)
+        finally:
+            self._clusters = None
 
         logger.info('InterProScan run complete')
-        return list(sequences)
-
+        logger.info(f'{sum(self.status_requests.values())} status checks made for {len(self.status_requests)} jobs.')
+        if self.cache:
+            logger.info(self.cache.report())
+        return sequences
 
+    def run(self, inputs: Iterable[ProteinSequence]) -> list[ProteinSequence]:
+        return asyncio.run(self.arun(inputs))
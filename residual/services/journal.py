@@ -0,0 +1,106 @@
+import json
+import os
+import time
+
+from loguru import logger
+
+
+class JobJournal:
+
+    """
+    Append-only JSON Lines record of submitted jobs and their statuses, written through to disk as each event
+    happens. If a run is interrupted, reopening the journal with resume=True recovers the latest state of each
+    job so it can be reattached to rather than submitted again.
+    """
+
+    FAILED_STATUSES = {'FAILURE', 'ERROR', 'NOT_FOUND'}
+
+    def __init__(self, path: str, *, resume: bool = False) -> None:
+
+        """
+        :param path: path to the journal file.
+        :param resume: whether to load and extend an existing journal, rather than starting a new one.
+        """
+
+        self.path = path
+        self._entries: dict[str, dict] = {}  # Job key -> latest entry.
+        self._job_keys: dict[str, set[str]] = {}  # Job id -> keys of the inputs submitted in the job.
+
+        if resume and os.path.exists(path):
+            self._load()
+            logger.info(f'Resuming from journal with {len(self._entries)} recorded jobs.')
+
+        self._file = open(path, 'a' if resume else 'w')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def _load(self) -> None:
+
+        """Reads the recorded entries, cutting off a last line left unfinished when the process died, so that new
+        entries aren't appended onto it."""
+
+        with open(self.path, 'rb+') as file:
+            content = file.read()
+            complete = content.rfind(b'\n') + 1
+            for line in content[:complete].splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f'Skipping unreadable journal entry: {line[:80]!r}')
+                    continue
+                self._entries[entry['key']] = entry
+                self._job_keys.setdefault(entry['job_id'], set()).add(entry['key'])
+            if complete < len(content):
+                logger.warning('Discarding an incomplete last entry in the journal.')
+                file.truncate(complete)
+
+    def _write(self, *entries: dict) -> None:
+        for entry in entries:
+            self._entries[entry['key']] = entry
+            self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def submitted(self, key: str, digest: str, job_id: str) -> None:
+
+        """
+        Records a newly submitted job.
+
+        :param key: identifies the job's inputs, i.e. the sequence and service parameters.
+        :param digest: digest of the submitted sequence.
+        :param job_id: id of the job, provided at submission.
+        """
+
+        self.submitted_batch([(key, digest)], job_id)
+
+    def submitted_batch(self, inputs: list[tuple[str, str]], job_id: str) -> None:
+
+        """
+        Records a newly submitted job covering several sequences, with an entry for each.
+
+        :param inputs: (key, digest) of each sequence in the job.
+        :param job_id: id of the job, provided at submission.
+        """
+
+        self._job_keys.setdefault(job_id, set()).update(key for key, _ in inputs)
+        now = time.time()
+        self._write(*({'key': key, 'digest': digest, 'job_id': job_id, 'status': 'SUBMITTED', 'time': now}
+                      for key, digest in inputs))
+
+    def update(self, job_id: str, status: str) -> None:
+        """Records a change in status of a previously submitted job."""
+        now = time.time()
+        entries = (self._entries[key] for key in self._job_keys[job_id])
+        self._write(*(entry | {'status': status, 'time': now} for entry in entries if entry['job_id'] == job_id))
+
+    def resumable(self, key: str) -> str | None:
+        """Returns the id of a recorded job for the given inputs that may still be retrievable, if there is one."""
+        entry = self._entries.get(key)
+        return entry['job_id'] if entry and entry['status'] not in self.FAILED_STATUSES else None
+
+    def close(self) -> None:
+        self._file.close()
@@ -1,7 +1,53 @@
 import importlib
-import pkgutil
-import residual.services as services
+from collections.abc import Mapping
+from functools import cache
+from importlib.metadata import entry_points
+from types import MappingProxyType
 
-def load_services():
-    for _, module_name, _ in pkgutil.iter_modules(services.__path__):
-        importlib.import_module(f"residual.services.{module_name}")
+ENTRY_POINT_GROUP = 'residual.services'
+
+# Where each built-in service is defined, as module:class, so it can be listed and selected without being imported.
+SERVICE_MANIFEST = {
+    'InterProScan': 'residual.services.interpro_scan:InterProScan',
+    'Hydropathy': 'residual.services.local_analysis:Hydropathy',
+    'LowComplexity': 'residual.services.local_analysis:LowComplexity',
+    'Composition': 'residual.services.local_analysis:Composition',
+    'PhysicalProperties': 'residual.services.local_analysis:PhysicalProperties',
+}
+
+
+@cache
+def available_services() -> Mapping[str, str]:
+    """
+    Built-in services, together with any that installed packages declare under the 'residual.services' entry point
+    group, by name. Nothing is imported. Installed packages are only scanned on the first call, which takes tens
+    of milliseconds, so the result is kept and shared read-only.
+    """
+    return MappingProxyType(SERVICE_MANIFEST | {ep.name: ep.value for ep in entry_points(group=ENTRY_POINT_GROUP)})
+
+
+def load_services(names: list[str] | None = None) -> dict[str, type]:
+
+    """
+    Imports the selected services, registering them to be run by the Surveyor.
+
+    :param names: names of the services to load, default = all available services.
+    :return: the loaded service classes, by class name, as they are registered.
+    :raises: ValueError if a name is not an available service.
+    """
+
+    available = available_services()
+    names = list(available) if names is None else names
+    if unknown := [name for name in names if name not in available]:
+        raise ValueError(f'Unknown service(s) {", ".join(unknown)}, expected any of: {", ".join(available)}')
+
+    from residual.services.base_class import service_registry
+
+    loaded = {}
+    for name in names:
+        module_name, _, class_name = available[name].partition(':')
+        cls = getattr(importlib.import_module(module_name), class_name)
+        # Registered on import if decorated, but entry points needn't be, and may be named apart from their class.
+        service_registry.setdefault(cls.__name__, cls)
+        loaded[cls.__name__] = cls
+    return loaded
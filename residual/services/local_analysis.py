@@ -0,0 +1,157 @@
+import numpy as np
+
+from residual.protein_sequence import Feature
+from residual.protein_sequence.encoding import ALPHABET, EncodedBatch, encode
+from residual.services import CpuBoundService, register_service
+
+KYTE_DOOLITTLE = {
+    'A': 1.8, 'R': -4.5, 'N': -3.5, 'D': -3.5, 'C': 2.5, 'Q': -3.5, 'E': -3.5, 'G': -0.4, 'H': -3.2, 'I': 4.5,
+    'L': 3.8, 'K': -3.9, 'M': 1.9, 'F': 2.8, 'P': -1.6, 'S': -0.8, 'T': -0.7, 'W': -0.9, 'Y': -1.3, 'V': 4.2,
+}
+
+RESIDUE_MASSES = {  # Average masses of amino acid residues in daltons.
+    'A': 71.0788, 'R': 156.1875, 'N': 114.1038, 'D': 115.0886, 'C': 103.1388, 'E': 129.1155, 'Q': 128.1307,
+    'G': 57.0519, 'H': 137.1411, 'I': 113.1594, 'L': 113.1594, 'K': 128.1741, 'M': 131.1926, 'F': 147.1766,
+    'P': 97.1167, 'S': 87.0782, 'T': 101.1051, 'W': 186.2132, 'Y': 163.1760, 'V': 99.1326,
+}
+WATER_MASS = 18.01524
+
+# pKa values of ionisable groups (EMBOSS), as (pKa, charge when protonated).
+TERMINAL_PKA = [(8.6, 1), (3.6, 0)]  # N-terminus, C-terminus
+SIDE_CHAIN_PKA = {'K': (10.8, 1), 'R': (12.5, 1), 'H': (6.5, 1), 'D': (3.9, 0), 'E': (4.1, 0), 'C': (8.5, 0),
+                  'Y': (10.1, 0)}
+
+
+def _scale(values: dict[str, float]) -> np.ndarray:
+    """Makes a table indexed by residue index, for converting a whole encoded sequence at once."""
+    return np.array([values[residue] for residue in ALPHABET])
+
+
+def _window_means(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of each full-length window along the array."""
+    sums = np.cumsum(np.concatenate(([0], values)))
+    return (sums[window:] - sums[:-window]) / window
+
+
+def _window_regions(mask: np.ndarray, window: int) -> list[tuple[int, int]]:
+
+    """
+    Converts a mask over window start positions into residue locations, merging overlapping windows.
+    Locations are 1-based and inclusive.
+    """
+
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    return [(int(start) + 1, int(end) + window - 1) for start, end in zip(starts, ends)]
+
+
+@register_service
+class Hydropathy(CpuBoundService):
+
+    """Finds hydrophobic segments, such as transmembrane helices, from a Kyte-Doolittle hydropathy profile."""
+
+    scale = _scale(KYTE_DOOLITTLE)
+
+    def __init__(self, user_email: str | None = None, *, window: int = 19, threshold: float = 1.6):
+        super().__init__(user_email)
+        self.window = window
+        self.threshold = threshold
+
+    def _segments(self, profile: np.ndarray) -> list[Feature]:
+        regions = _window_regions(profile >= self.threshold, self.window)
+        return [Feature('hydropathy', f'Hydrophobic segment (peak {profile[start - 1:end - self.window + 1].max():.2f})',
+                        [(start, end)]) for start, end in regions]
+
+    def analyse(self, sequence: str) -> list[Feature]:
+        if len(sequence) < self.window:
+            return []
+        return self._segments(_window_means(self.scale[encode(sequence)], self.window))
+
+    def analyse_chunk(self, sequences: list[str]) -> list[list[Feature]]:
+        """Computes the profiles of the whole chunk in one pass over a shared buffer."""
+        profiles = EncodedBatch.from_sequences(sequences).window_means(self.scale, self.window)
+        return [self._segments(profile) for profile in profiles]
+
+
+@register_service
+class LowComplexity(CpuBoundService):
+
+    """Finds low complexity regions, where a window of residues has low Shannon entropy, as in SEG."""
+
+    def __init__(self, user_email: str | None = None, *, window: int = 12, threshold: float = 2.2):
+        super().__init__(user_email)
+        self.window = window
+        self.threshold = threshold
+
+    def analyse(self, sequence: str) -> list[Feature]:
+
+        if len(sequence) < self.window:
+            return []
+
+        # Count residues in every window at once from running totals of each residue.
+        one_hot = encode(sequence)[:, None] == np.arange(len(ALPHABET))
+        totals = np.cumsum(np.vstack((np.zeros((1, len(ALPHABET)), dtype=int), one_hot)), axis=0)
+        frequencies = (totals[self.window:] - totals[:-self.window]) / self.window
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            entropy = -np.nansum(frequencies * np.log2(frequencies), axis=1)
+
+        regions = _window_regions(entropy < self.threshold, self.window)
+        return [Feature('low_complexity', 'Low complexity region', [region]) for region in regions]
+
+
+@register_service
+class Composition(CpuBoundService):
+
+    """Summarises the residue composition of the sequence, naming the most abundant residues."""
+
+    def __init__(self, user_email: str | None = None, *, top: int = 3):
+        super().__init__(user_email)
+        self.top = top
+
+    def analyse(self, sequence: str) -> list[Feature]:
+        if not sequence:
+            return []
+        counts = np.bincount(encode(sequence), minlength=len(ALPHABET))
+        order = np.argsort(-counts, kind='stable')[:self.top]
+        summary = ', '.join(f'{ALPHABET[i]} {counts[i] / len(sequence):.1%}' for i in order if counts[i])
+        return [Feature('composition', f'Most abundant: {summary}', [(1, len(sequence))])]
+
+
+@register_service
+class PhysicalProperties(CpuBoundService):
+
+    """Calculates the average molecular weight and isoelectric point of the sequence."""
+
+    masses = _scale(RESIDUE_MASSES)
+
+    @staticmethod
+    def _charge(counts: np.ndarray, pkas: np.ndarray, positive: np.ndarray, ph: float) -> float:
+        protonated = 1 / (1 + 10 ** (ph - pkas))
+        return float(np.sum(counts * np.where(positive, protonated, protonated - 1)))
+
+    def isoelectric_point(self, sequence: str) -> float:
+
+        """Finds the pH at which the net charge is zero, by bisection."""
+
+        groups = TERMINAL_PKA + [SIDE_CHAIN_PKA[residue] for residue in SIDE_CHAIN_PKA]
+        counts = np.array([1, 1] + [sequence.count(residue) for residue in SIDE_CHAIN_PKA])
+        pkas, positive = np.array(groups).T
+
+        low, high = 0.0, 14.0
+        while high - low > 0.001:
+            mid = (low + high) / 2
+            if self._charge(counts, pkas, positive.astype(bool), mid) > 0:
+                low = mid
+            else:
+                high = mid
+        return (low + high) / 2
+
+    def molecular_weight(self, sequence: str) -> float:
+        return float(self.masses[encode(sequence)].sum()) + WATER_MASS
+
+    def analyse(self, sequence: str) -> list[Feature]:
+        if not sequence:
+            return []
+        name = f'MW {self.molecular_weight(sequence):.1f} Da, pI {self.isoelectric_point(sequence):.2f}'
+        return [Feature('properties', name, [(1, len(sequence))])]
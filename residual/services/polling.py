@@ -0,0 +1,148 @@
+import asyncio
+import heapq
+import random
+from collections import Counter
+from dataclasses import dataclass
+from itertools import count
+
+import aiohttp
+from loguru import logger
+
+from residual.metrics import metrics
+from residual.services.http_client import HttpClient
+
+
+@dataclass
+class PollingConfig:
+
+    """
+    Timing for job status checks. The first check waits a base delay plus a per-residue allowance, as longer
+    sequences take longer to scan; subsequent delays grow geometrically up to a ceiling, with random jitter
+    so that jobs submitted together don't keep checking in lockstep.
+    """
+
+    initial_delay: float = 3.0
+    seconds_per_residue: float = 0.02
+    backoff: float = 1.5
+    max_delay: float = 30.0
+    jitter: float = 0.25
+
+    def _jittered(self, delay: float) -> float:
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def first_delay(self, seq_length: int) -> float:
+        return self._jittered(min(self.initial_delay + self.seconds_per_residue * seq_length, self.max_delay))
+
+    def next_delay(self, last_delay: float) -> float:
+        return self._jittered(min(last_delay * self.backoff, self.max_delay))
+
+
+class StatusPoller:
+
+    """
+    Checks the status of many jobs from a single loop. Each job is scheduled by when it is next due to be
+    checked; the loop sleeps until the earliest is due, checks all jobs due at that point together, then
+    reschedules any still running with a longer delay.
+    """
+
+    TERMINAL_STATUSES = {'FINISHED', 'FAILURE', 'ERROR', 'NOT_FOUND'}
+
+    def __init__(self, session: HttpClient, config: PollingConfig | None = None) -> None:
+        self.session = session
+        self.config = config or PollingConfig()
+        self.requests: Counter[str] = Counter()  # Status requests made for each job.
+
+        self._queue: list[tuple[float, int, str]] = []  # (due time, tiebreak, job id) min-heap.
+        self._pending: dict[str, tuple[asyncio.Future, float]] = {}  # Job id -> (result future, last delay).
+        self._tiebreak = count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def _schedule(self, job_id: str, delay: float) -> None:
+        heapq.heappush(self._queue, (asyncio.get_running_loop().time() + delay, next(self._tiebreak), job_id))
+        self._wakeup.set()
+
+    async def wait(self, job_id: str, seq_length: int = 0, *, first_delay: float | None = None) -> str:
+
+        """
+        Waits until a job reaches a terminal state.
+
+        :param job_id: id of the job, provided at submission.
+        :param seq_length: length of the submitted sequence, used to estimate how long the job will take.
+        :param first_delay: seconds to wait before the first check, overriding the estimate.
+        :return: the final status of the job, or 'ERROR' if its status could not be retrieved.
+        :raises: any unexpected error from checking the job's status.
+        """
+
+        future = asyncio.get_running_loop().create_future()
+        delay = self.config.first_delay(seq_length) if first_delay is None else first_delay
+        self._pending[job_id] = (future, delay)
+        self._schedule(job_id, delay)
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll_loop())
+        try:
+            return await future
+        finally:
+            if self._pending.get(job_id, (None,))[0] is future:  # Waiter was cancelled, so stop checking the job.
+                del self._pending[job_id]
+
+    async def _check(self, job_id: str) -> None:
+
+        """Checks a job's status, resolving its waiter or rescheduling it. Errors only ever affect this job."""
+
+        if (entry := self._pending.get(job_id)) is None:  # Its waiter has gone.
+            return
+        future, delay = entry
+        self.requests[job_id] += 1
+        metrics.count('status_checks')
+        try:
+            async with self.session.get(f'status/{job_id}') as res:
+                res.raise_for_status()
+                status = await res.text()
+        except aiohttp.ClientResponseError as e:
+            logger.error(f'HTTP Error {e.status}: {e.message}')
+            status = 'ERROR'
+        except (aiohttp.ClientError, TimeoutError) as e:  # Usually transient, so check again later.
+            logger.warning(f'{job_id}: Status check failed ({e!r}), retrying.')
+            status = None
+        except Exception as e:  # Anything else goes to the job's waiter, rather than stopping the loop.
+            logger.error(f'{job_id}: Status check failed ({e!r}).')
+            del self._pending[job_id]
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        if self._pending.get(job_id, (None,))[0] is not future:  # Waiter cancelled during the check.
+            return
+
+        if status in self.TERMINAL_STATUSES:
+            del self._pending[job_id]
+            if not future.done():  # Waiter may have been cancelled.
+                future.set_result(status)
+        else:
+            delay = self.config.next_delay(delay)
+            self._pending[job_id] = (future, delay)
+            self._schedule(job_id, delay)
+
+    async def _poll_loop(self) -> None:
+
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            self._wakeup.clear()
+            wait_time = self._queue[0][0] - loop.time()
+            if wait_time > 0:
+                try:  # Sleep until the next job is due, or a newly added job might be due sooner.
+                    await asyncio.wait_for(self._wakeup.wait(), wait_time)
+                except TimeoutError:
+                    pass
+                continue
+
+            due = []
+            while self._queue and self._queue[0][0] <= loop.time():
+                due.append(heapq.heappop(self._queue)[2])
+            await asyncio.gather(*map(self._check, due))
+
+    def close(self) -> None:
+        if self._task:
+            self._task.cancel()
@@ -1 +1,9 @@
-from .surveyor import Surveyor
\ No newline at end of file
+__all__ = ['Surveyor']
+
+
+def __getattr__(name: str):
+    # Imported on first use, so that the exporters and run store can be used without loading asyncio and loguru.
+    if name == 'Surveyor':
+        from .surveyor import Surveyor
+        return Surveyor
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -0,0 +1,264 @@
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+
+from residual.protein_sequence import ProteinSequence, SequenceDisplay
+from residual.surveyor.run_store import RunStoreWriter
+
+exporter_registry = {}
+
+def register_exporter(cls):
+    """Decorator for exporters, making them selectable by format name or file extension."""
+    exporter_registry[cls.format] = cls
+    return cls
+
+def get_exporter(filename: str, output_format: str | None = None, *, append: bool = False) -> 'Exporter':
+
+    """
+    Opens an exporter for the given format or, if none is given, the one matching the file extension.
+    Defaults to the text format.
+
+    :param filename: file to write to.
+    :param output_format: name of a registered exporter.
+    :param append: whether to add to the end of an existing file.
+    """
+
+    return exporter_class(filename, output_format)(filename, append=append)
+
+def exporter_class(filename: str, output_format: str | None = None) -> type['Exporter']:
+    """The exporter for the given format or, if none is given, the one matching the file extension."""
+    if output_format is None:
+        extension = os.path.splitext(filename)[1].lower()
+        output_format = next((name for name, cls in exporter_registry.items() if extension in cls.extensions), 'text')
+    if output_format not in exporter_registry:
+        raise ValueError(f'Unknown output format "{output_format}", expected one of: {", ".join(exporter_registry)}')
+    return exporter_registry[output_format]
+
+
+class Exporter(ABC):
+    """Base class for writing sequences and their features to file, one sequence at a time."""
+
+    format: str  # Name used to select the exporter.
+    extensions: tuple[str, ...] = ()  # File extensions the format is chosen for by default.
+    appendable = True  # Whether output can be added to an existing file.
+    header = ''  # Text at the top of each file, ahead of the records.
+    omits_empty = False  # Whether sequences without features are left out of the file.
+
+    def __init__(self, filename: str, *, append: bool = False) -> None:
+        if append and not self.appendable:
+            raise ValueError(f'Cannot append to existing {self.format} files.')
+        self.filename = filename
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @abstractmethod
+    def write(self, seq: ProteinSequence) -> None:
+        """Writes out a sequence with its features."""
+
+    @classmethod
+    def records(cls, filename: str) -> Iterator[tuple[str, str]]:
+        """
+        Reads a file back as the raw text of each record, with the name of its sequence, so that files can be
+        combined without parsing their contents.
+        """
+        raise ValueError(f'Records cannot be read back from {cls.format} files.')
+
+    def flush(self) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class _TextFileExporter(Exporter, ABC):
+
+    def __init__(self, filename: str, *, append: bool = False) -> None:
+        super().__init__(filename, append=append)
+        self._file = open(filename, 'a' if append else 'w')
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+@register_exporter
+class TextExporter(_TextFileExporter):
+    """Human-readable sequences with tabulated features, as made by SequenceDisplay."""
+
+    format = 'text'
+    extensions = ('.txt',)
+
+    def write(self, seq: ProteinSequence) -> None:
+        SequenceDisplay(seq).write(self._file)
+
+    @classmethod
+    def records(cls, filename: str) -> Iterator[tuple[str, str]]:
+        with open(filename) as file:
+            name, lines = None, []
+            for line in file:
+                if line.startswith('>'):  # Header of the next record.
+                    if name is not None:
+                        yield name, ''.join(lines)
+                    name, lines = line[1:].rstrip('\n'), []
+                lines.append(line)
+            if name is not None:
+                yield name, ''.join(lines)
+
+
+def _feature_record(ft) -> dict:
+    return {'service': ft.service,
+            'name': ft.name,
+            'locations': [[start, end] for start, end in ft.locations or ()],
+            'go_terms': [term._asdict() for term in ft.go_terms],
+            'inferred': ft.inferred}
+
+
+@register_exporter
+class JsonLinesExporter(_TextFileExporter):
+    """One JSON object per line for each sequence, holding its features and their GO terms."""
+
+    format = 'jsonl'
+    extensions = ('.jsonl', '.ndjson')
+
+    def write(self, seq: ProteinSequence) -> None:
+        record = {'name': seq.name, 'sequence': seq.sequence, 'features': list(map(_feature_record, seq.features))}
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    @classmethod
+    def records(cls, filename: str) -> Iterator[tuple[str, str]]:
+        with open(filename) as file:
+            for line in file:
+                yield json.loads(line)['name'], line
+
+
+def _location_rows(seq: ProteinSequence):
+    """One row per feature location, as (sequence, service, name, start, end, GO ids, inferred)."""
+    for ft in seq.features:
+        go_ids = [term.id for term in ft.go_terms]
+        for start, end in ft.locations or [(None, None)]:
+            yield seq.name, ft.service, ft.name, start, end, go_ids, ft.inferred
+
+
+@register_exporter
+class TableExporter(_TextFileExporter):
+    """
+    Tab-separated table with one row per feature location; GO ids are joined with semicolons, and features
+    carried over from a similar sequence are marked true in the inferred column.
+    """
+
+    format = 'tsv'
+    extensions = ('.tsv',)
+    columns = ('sequence', 'service', 'name', 'start', 'end', 'go_terms', 'inferred')
+    header = '\t'.join(columns) + '\n'
+    omits_empty = True
+
+    def __init__(self, filename: str, *, append: bool = False) -> None:
+        super().__init__(filename, append=append)
+        self._writer = csv.writer(self._file, delimiter='\t', lineterminator='\n')
+        if not append or self._file.tell() == 0:
+            self._file.write(self.header)
+
+    def write(self, seq: ProteinSequence) -> None:
+        self._writer.writerows((*cells, ';'.join(go_ids), 'true' if inferred else 'false')
+                               for *cells, go_ids, inferred in _location_rows(seq))
+
+    @classmethod
+    def records(cls, filename: str) -> Iterator[tuple[str, str]]:
+        with open(filename, newline='') as file:
+            raw = []  # Lines the reader has taken for the current row, which may span several if quoted.
+
+            def _lines():
+                for line in file:
+                    raw.append(line)
+                    yield line
+
+            reader = csv.reader(_lines(), delimiter='\t')
+            next(reader, None)  # Header
+            raw.clear()
+            name, text = None, []
+            for row in reader:
+                if row[0] != name and name is not None:
+                    yield name, ''.join(text)
+                    text = []
+                name = row[0]
+                text += raw
+                raw.clear()
+            if name is not None:
+                yield name, ''.join(text)
+
+
+@register_exporter
+class ParquetExporter(Exporter):
+
+    """
+    Columnar Parquet table with one row per feature location, with numeric start and end columns, a list of
+    GO ids and whether the feature was inferred. Rows are buffered and written a row group at a time, so the file
+    is only complete once closed. Requires pyarrow, from the package's parquet extra.
+    """
+
+    format = 'parquet'
+    extensions = ('.parquet',)
+    appendable = False
+    row_group_size = 100_000
+
+    def __init__(self, filename: str, *, append: bool = False) -> None:
+        super().__init__(filename, append=append)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError('Parquet output requires pyarrow, install it with the parquet extra, '
+                              '"pip install residual[parquet]".') from e
+
+        self._pa = pa
+        self._schema = pa.schema([('sequence', pa.string()), ('service', pa.string()), ('name', pa.string()),
+                                  ('start', pa.int32()), ('end', pa.int32()), ('go_terms', pa.list_(pa.string())),
+                                  ('inferred', pa.bool_())])
+        self._writer = pq.ParquetWriter(filename, self._schema)
+        self._rows = []
+
+    def write(self, seq: ProteinSequence) -> None:
+        self._rows.extend(_location_rows(seq))
+        if len(self._rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def _write_row_group(self) -> None:
+        if self._rows:
+            columns = [list(column) for column in zip(*self._rows)]
+            self._writer.write_table(self._pa.Table.from_arrays(columns, schema=self._schema))
+            self._rows = []
+
+    def close(self) -> None:
+        self._write_row_group()
+        self._writer.close()
+
+
+@register_exporter
+class StoreExporter(Exporter):
+
+    """
+    Binary run store, which Surveyor.open_store reopens through a memory map to look up, render or export sequences
+    again without rerunning the services. The file is only complete once closed.
+    """
+
+    format = 'store'
+    extensions = ('.rstore',)
+    appendable = False
+
+    def __init__(self, filename: str, *, append: bool = False) -> None:
+        super().__init__(filename, append=append)
+        self._writer = RunStoreWriter(filename)
+
+    def write(self, seq: ProteinSequence) -> None:
+        self._writer.add(seq)
+
+    def close(self) -> None:
+        self._writer.close()
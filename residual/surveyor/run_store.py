@@ -0,0 +1,280 @@
+"""
+Run stores: the results of a run in one binary file, written once and reopened through a memory map for random
+access by name. Layout, all little-endian:
+
+    header      HEADER
+    records     per sequence: RECORD, name (utf-8), residues (ascii), then per feature: FEATURE, its locations as
+                (start, end) u32 pairs and its GO terms as u32 indices into the term table
+    offsets     u64 file offset of each record, in the order written
+    slots       open-addressing hash table of (crc32 of name, record index + 1) u32 pairs, 0 marking an empty slot
+    strings     u32 count, u32 offset of each string plus the end, then the utf-8 text of every string
+    terms       u32 count, then (id, category, name) u32 string indices of each GO term
+"""
+
+import mmap
+import struct
+import weakref
+import zlib
+from array import array
+from collections.abc import Iterator, Mapping
+
+from residual.protein_sequence import ProteinSequence, Feature, GoTerm, go_term_registry
+
+
+MAGIC = b'RESIDUAL'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQQQQ')  # magic, version, slots, records, offsets at, slots at, strings at, terms at
+RECORD = struct.Struct('<HII')  # name bytes, residues, features
+FEATURE = struct.Struct('<IIHHB')  # service string, name string, locations, GO terms, inferred
+
+
+def _name_hash(name: bytes) -> int:
+    return zlib.crc32(name)
+
+
+class RunStoreWriter:
+
+    """
+    Writes sequences and their features to a run store one at a time, so a run can be stored as it goes. Service
+    and feature names and GO terms are stored once each, in tables written with the index when the store is closed.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self._file = open(filename, 'wb')
+        self._file.write(bytes(HEADER.size))  # Filled in on closing.
+        self._offsets = array('Q')
+        self._hashes = array('I')
+        self._strings: dict[str, int] = {}
+        self._terms: dict[GoTerm, int] = {}
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def _string_id(self, value: str) -> int:
+        if (index := self._strings.get(value)) is None:
+            index = self._strings[value] = len(self._strings)
+        return index
+
+    def _term_id(self, term: GoTerm) -> int:
+        if (index := self._terms.get(term)) is None:
+            index = self._terms[term] = len(self._terms)
+            for value in term:
+                self._string_id(value)
+        return index
+
+    def add(self, seq: ProteinSequence) -> None:
+
+        """Appends a sequence and its features."""
+
+        name = seq.name.encode()
+        parts = [RECORD.pack(len(name), len(seq), len(seq.features)), name, seq.sequence.encode('ascii')]
+        for ft in seq.features:
+            locations = [value for location in ft.locations or () for value in location]
+            go_ids = [self._term_id(term) for term in ft.go_terms]
+            parts += [FEATURE.pack(self._string_id(ft.service), self._string_id(ft.name), len(locations) // 2,
+                                   len(go_ids), ft.inferred),
+                      array('I', locations).tobytes(), array('I', go_ids).tobytes()]
+
+        self._offsets.append(self._file.tell())
+        self._hashes.append(_name_hash(name))
+        self._file.write(b''.join(parts))
+
+    def _slots(self) -> array:
+        """Hash table of the records by name, at most half full, so lookups probe about one slot."""
+        size = 1 << max(1, (2 * len(self)).bit_length())
+        mask = size - 1
+        slots = array('I', bytes(8 * size))
+        for index, name_hash in enumerate(self._hashes):
+            slot = name_hash & mask
+            while slots[2 * slot + 1]:
+                slot = (slot + 1) & mask
+            slots[2 * slot], slots[2 * slot + 1] = name_hash, index + 1
+        return slots
+
+    def close(self) -> None:
+
+        file = self._file
+        offsets_at = file.tell()
+        file.write(self._offsets.tobytes())
+
+        slots_at = file.tell()
+        slots = self._slots()
+        file.write(slots.tobytes())
+
+        strings_at = file.tell()
+        encoded = [value.encode() for value in self._strings]
+        ends = array('I', [0])
+        for value in encoded:
+            ends.append(ends[-1] + len(value))
+        file.write(struct.pack('<I', len(encoded)) + ends.tobytes() + b''.join(encoded))
+
+        terms_at = file.tell()
+        term_strings = array('I', [self._strings[value] for term in self._terms for value in term])
+        file.write(struct.pack('<I', len(self._terms)) + term_strings.tobytes())
+
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, VERSION, len(slots) // 2, len(self), offsets_at, slots_at, strings_at, terms_at))
+        file.close()
+
+
+class StoredSequence(ProteinSequence):
+
+    """
+    Read-only view of a sequence in a run store. Only the record header and name are read on creation; residues
+    and features are decoded from the mapped file when first used, and dropped along with the view. The store hands
+    out the same view of a record for as long as it is in use elsewhere.
+    """
+
+    def __init__(self, store: 'RunStore', offset: int) -> None:
+        name_length, self._length, self._feature_count = RECORD.unpack_from(store._buffer, offset)
+        start = offset + RECORD.size
+        self._store = store
+        self._residues_at = start + name_length
+        super().__init__(str(store._buffer[start:start + name_length], 'utf-8'), '')
+        self._sequence = self._features = None  # Read from the store on first use.
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def sequence(self) -> str:
+        if self._sequence is None:
+            self._sequence = str(self._store._buffer[self._residues_at:self._residues_at + self._length], 'ascii')
+        return self._sequence
+
+    @sequence.setter
+    def sequence(self, value: str) -> None:
+        ProteinSequence.sequence.fset(self, value)
+
+    @property
+    def features(self) -> list[Feature]:
+        if self._features is None:
+            self._features = self._store._read_features(self._residues_at + self._length, self._feature_count)
+        return self._features
+
+    @features.setter
+    def features(self, value) -> None:
+        """Features added in memory, e.g. by add_features, are not written back to the store."""
+        self._features = value
+
+
+class RunStore(Mapping):
+
+    """
+    Results of a run, reopened from a run store through a memory map. Sequences are looked up by name through the
+    store's hash table, or by position, and returned as StoredSequence views, so only the records in use are
+    decoded. Views are only kept while referenced elsewhere, so features added to a view in memory last as long as
+    it does. Where names repeat, lookups by name find the first record with the name.
+    """
+
+    def __init__(self, filename: str) -> None:
+
+        """
+        :param filename: path to a store written by RunStoreWriter.
+        :raises: ValueError if the file is not a run store.
+        """
+
+        self.filename = filename
+        self._views: weakref.WeakValueDictionary[int, StoredSequence] = weakref.WeakValueDictionary()  # By index.
+        with open(filename, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+
+        if len(self._buffer) < HEADER.size:
+            self.close()
+            raise ValueError(f'{filename} is not a run store.')
+        magic, version, slots, records, offsets_at, slots_at, strings_at, terms_at = HEADER.unpack_from(self._buffer)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{filename} is not a run store, or was written by an unsupported version.')
+
+        self._offsets = self._buffer[offsets_at:offsets_at + 8 * records].cast('Q')
+        self._slots = self._buffer[slots_at:slots_at + 8 * slots].cast('I')
+        self._mask = slots - 1
+
+        (count,) = struct.unpack_from('<I', self._buffer, strings_at)
+        ends = self._buffer[strings_at + 4:strings_at + 8 + 4 * count].cast('I')
+        text = strings_at + 8 + 4 * count
+        self._strings = [str(self._buffer[text + ends[i]:text + ends[i + 1]], 'utf-8') for i in range(count)]
+        ends.release()
+
+        (count,) = struct.unpack_from('<I', self._buffer, terms_at)
+        term_strings = struct.unpack_from(f'<{3 * count}I', self._buffer, terms_at + 4)
+        self._terms = [go_term_registry.intern(*map(self._strings.__getitem__, term_strings[i:i + 3]))
+                       for i in range(0, len(term_strings), 3)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    @property
+    def closed(self) -> bool:
+        return self._mmap.closed
+
+    def __getitem__(self, name: str) -> StoredSequence:
+        if (index := self.index_of(name)) is None:
+            raise KeyError(name)
+        return self.at(index)
+
+    def __contains__(self, name) -> bool:
+        return isinstance(name, str) and self.index_of(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        """Names of the sequences, in the order they were stored."""
+        buffer = self._buffer
+        for offset in self._offsets:
+            name_length = RECORD.unpack_from(buffer, offset)[0]
+            yield str(buffer[offset + RECORD.size:offset + RECORD.size + name_length], 'utf-8')
+
+    def values(self) -> Iterator[StoredSequence]:
+        """Views of the sequences in the order they were stored, created one at a time."""
+        return map(self.at, range(len(self)))
+
+    def at(self, index: int) -> StoredSequence:
+        """View of the sequence at the given position in the store."""
+        index = range(len(self))[index]  # Counting from the end if negative.
+        if (view := self._views.get(index)) is None:
+            view = self._views[index] = StoredSequence(self, self._offsets[index])
+        return view
+
+    def index_of(self, name: str) -> int | None:
+
+        """Position of the first sequence of the given name, found by probing the hash table; None if absent."""
+
+        encoded = name.encode()
+        name_hash, slots, buffer = _name_hash(encoded), self._slots, self._buffer
+        slot = name_hash & self._mask
+        while index := slots[2 * slot + 1]:
+            if slots[2 * slot] == name_hash:
+                offset = self._offsets[index - 1]
+                start = offset + RECORD.size
+                if buffer[start:start + RECORD.unpack_from(buffer, offset)[0]] == encoded:
+                    return index - 1
+            slot = (slot + 1) & self._mask
+        return None
+
+    def _read_features(self, offset: int, count: int) -> list[Feature]:
+        features = []
+        buffer, strings, terms = self._buffer, self._strings, self._terms
+        for _ in range(count):
+            service, name, n_locations, n_terms, inferred = FEATURE.unpack_from(buffer, offset)
+            offset += FEATURE.size
+            values = struct.unpack_from(f'<{2 * n_locations + n_terms}I', buffer, offset)
+            offset += 4 * len(values)
+            locations = list(zip(values[0:2 * n_locations:2], values[1:2 * n_locations:2]))
+            features.append(Feature(strings[service], strings[name], locations,
+                                    [terms[i] for i in values[2 * n_locations:]], bool(inferred)))
+        return features
+
+    def close(self) -> None:
+        """Unmaps the file. Views already taken should not be used afterwards."""
+        for view in ('_offsets', '_slots', '_buffer'):
+            if (buffer := self.__dict__.pop(view, None)) is not None:
+                buffer.release()
+        self._mmap.close()
@@ -0,0 +1,89 @@
+from collections.abc import Iterable, Iterator
+
+from loguru import logger
+
+from residual.protein_sequence import ProteinSequence, read_fasta
+from residual.surveyor.exporters import exporter_class
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+
+    """
+    Reads a shard given as 'i/N', the i-th of N shards counting from 0.
+
+    :raises: ValueError if the shard is not of that form or out of range.
+    """
+
+    index, _, count = spec.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError(f'Shard "{spec}" should be given as i/N, e.g. 0/4.') from None
+    if not 0 <= index < count:
+        raise ValueError(f'Shard index {index} is out of range for {count} shards.')
+    return index, count
+
+
+def shard_of(seq: ProteinSequence, count: int) -> int:
+    """Shard a sequence belongs to, by the digest of its content, so the split is the same on every node and
+    identical sequences share a shard."""
+    return int(seq.digest[:16], 16) % count
+
+
+def select_shard(sequences: Iterable[ProteinSequence], index: int, count: int) -> Iterator[ProteinSequence]:
+    return (seq for seq in sequences if shard_of(seq, count) == index)
+
+
+def _merged_records(fasta: str, shard_files: list[str], exporter: type) -> Iterator[str]:
+
+    """Text of each shard's records in the order of the fasta file, raising ValueError where they don't match it."""
+
+    readers = [exporter.records(path) for path in shard_files]
+    pending = [next(reader, None) for reader in readers]  # Next unmerged record from each shard.
+    for seq in read_fasta(fasta):
+        i = shard_of(seq, len(shard_files))
+        if pending[i] is None or pending[i][0] != seq.name:
+            if exporter.omits_empty:  # Sequence had no features, so left no record.
+                continue
+            found = 'the end of the file' if pending[i] is None else f'"{pending[i][0]}"'
+            raise ValueError(f'{shard_files[i]}: Expected a record for "{seq.name}", found {found}.')
+        yield pending[i][1]
+        pending[i] = next(readers[i], None)
+
+    for path, record in zip(shard_files, pending):
+        if record is not None:
+            raise ValueError(f'{path}: Record for "{record[0]}" is not in the fasta file, or is out of order.')
+
+
+def merge_shards(fasta: str, shard_files: list[str], outfile: str, *,
+                 output_format: str | None = None) -> int:
+
+    """
+    Combines the outputs of a sharded run into one file, in the order of the original fasta file. The fasta is
+    read again to recover the order, taking each record from the output of the shard its sequence belongs to, so
+    only one record from each shard is held in memory at a time. Where the format leaves out sequences without
+    features, a record out of order only shows once the files are read to the end, so they are first read through
+    once to check the order, before anything is written.
+
+    :param fasta: the fasta file that was split into shards.
+    :param shard_files: output file of each shard, in shard order.
+    :param outfile: file to write the merged output to.
+    :param output_format: name of the output format, default = chosen by file extension.
+    :return: number of records written.
+    :raises: ValueError if the shard outputs don't match the fasta file.
+    """
+
+    exporter = exporter_class(shard_files[0], output_format)
+    if exporter.omits_empty:
+        for _ in _merged_records(fasta, shard_files, exporter):
+            ...
+
+    written = 0
+    with open(outfile, 'w') as out:
+        out.write(exporter.header)
+        for record in _merged_records(fasta, shard_files, exporter):
+            out.write(record)
+            written += 1
+
+    logger.info(f'Merged {written} records from {len(shard_files)} shards into {outfile}.')
+    return written
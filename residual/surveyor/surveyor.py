@@ -1,17 +1,67 @@
+import asyncio
+import multiprocessing
 from collections.abc import Iterable
-from itertools import count
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import count, batched
 
 from loguru import logger
 
-from residual.protein_sequence import ProteinSequence, SequenceDisplay
-from residual.services.base_class import service_registry
+from residual.metrics import metrics
+from residual.protein_sequence import ProteinSequence, FeatureTable, read_fasta
+from residual.services.base_class import ServiceBaseClass, service_registry
+from residual.services.grouping import SequenceGroups
+from residual.services.loader import load_services
+from residual.surveyor.annotation_index import AnnotationIndex
+from residual.surveyor.run_store import RunStore
+from residual.surveyor.sharding import select_shard
+from residual.surveyor.writer import OutputWriter
 
 class Surveyor:
     """Loads protein sequences, runs services against them and writes out the result."""
 
-    def __init__(self, user_email: str) -> None:
+    def __init__(self,
+                 user_email: str,
+                 *,
+                 service_options: dict[str, dict] | None = None,
+                 workers: int | None = None,
+                 compact_features: bool = False,
+                 services: list[str] | None = None,
+                 ) -> None:
+
+        """
+        :param user_email: email to use as identification for APIs.
+        :param services: names of the services to run, which are imported on demand. Default = every registered
+                         service.
+        :param service_options: extra keyword arguments for each service, keyed by service name.
+        :param workers: number of worker processes for CPU-bound services, default = number of CPUs.
+        :param compact_features: whether to move features into a columnar FeatureTable once services finish,
+                                 reducing memory use for large result sets.
+        """
+
         self.user_email = user_email
+        self.service_options = service_options or {}
+        self.workers = workers
+        self.compact_features = compact_features
+        self.services = services
         self.sequences: dict[str: ProteinSequence] = dict()
+        self._index = AnnotationIndex()
+        self._unindexed: RunStore | None = None  # Run store opened but not yet indexed.
+
+    @property
+    def index(self) -> AnnotationIndex:
+
+        """
+        Sequences by GO term, feature name and service, filled in as they complete. The features of a run store are
+        only indexed when the index is first used, so opening a store stays cheap for runs that don't need it.
+        """
+
+        if (store := self._unindexed) is not None:
+            self._unindexed = None
+            if not store.closed:
+                for seq in store.values():
+                    self._index.add(seq)
+        return self._index
 
     def load_fasta(self,
                    __file: str,
@@ -26,29 +76,13 @@ class Surveyor:
         :param overwrite: whether to replace any currently loaded sequences, default = True.
         """
 
-        with open(__file, "r") as file:
-            lines = [line.strip() for line in file.readlines()][::-1]
-            # Reading file in reverse, so names are encountered after the sequence, makes it easier to
-            # tell when the final sequence has ended.
-
         if overwrite:
-            self.sequences = {}
-
-        seq_lines = []
-
-        for line in lines:
-            if line.startswith('>'):  # File is read in reverse, so header represents the end of a sequence.
-                name = line.lstrip('>')
-                sequence = ''.join(seq_lines)  # Join accumulated sequence lines.
-                try:
-                    self.sequences[name] = ProteinSequence(name, sequence)
-                except ValueError as e:
-                    logger.error(f'Error parsing {name}: {e}')
-                    continue
-                finally:
-                    seq_lines = []
-            else:
-                seq_lines.insert(0, line)  # If not a header, accumulate the sequence line.
+            self._clear()
+        else:
+            self._check_writable()
+
+        for seq in read_fasta(__file):
+            self.sequences[seq.name] = seq
 
         logger.info(f'{len(self.sequences)} total sequences loaded.')
 
@@ -70,7 +104,9 @@ class Surveyor:
         """
 
         if overwrite:
-            self.sequences = {}
+            self._clear()
+        else:
+            self._check_writable()
 
         if names:
             try:
@@ -89,21 +125,188 @@ class Surveyor:
 
         print(f'{len(self.sequences)} total sequences loaded.')
 
-    def write_out(self, filename: str) -> None:
+    def write_out(self, filename: str, *, append: bool = False, output_format: str | None = None) -> None:
+
+        """
+        Write all sequences with their features to a file, by default as text with the features tabulated.
+
+        :param filename: file to write to.
+        :param append: whether to add to the end of an existing file.
+        :param output_format: name of the output format, default = chosen by file extension.
+        """
+
+        with OutputWriter(filename, append=append, output_format=output_format) as writer:
+            for seq in self.sequences.values():  # One at a time, as sequences may be views created on access.
+                writer.expect([seq])
+                writer.complete(seq)
+
+    def open_store(self, filename: str) -> RunStore:
+
+        """
+        Reopens the results of an earlier run, written in the 'store' format, in place of any loaded sequences.
+        Sequences are read-only views decoded from the file as they are accessed, so large runs can be looked up,
+        rendered or written out in another format with little memory and without running the services again.
+        The index is rebuilt from the stored features when first used, decoding each sequence once. Services can't
+        be run on the store, nor more sequences loaded alongside it.
+
+        :param filename: path to the run store.
+        :return: the store, also set as the loaded sequences; close it once done, or load other sequences.
+        """
+
+        store = RunStore(filename)
+        self._clear()
+        self.sequences = self._unindexed = store
+        logger.info(f'{len(store)} total sequences opened from {filename}.')
+        return store
+
+    def _clear(self) -> None:
+        """Drops the loaded sequences and their index, closing any run store they were opened from."""
+        if isinstance(self.sequences, RunStore):
+            self.sequences.close()
+        self.sequences = {}
+        self._unindexed = None
+        self._index.clear()
+
+    def _check_writable(self) -> None:
+        if isinstance(self.sequences, RunStore):
+            raise ValueError(f'Sequences opened from the run store {self.sequences.filename} are read-only; load '
+                             f'them into a new Surveyor, or replace them with overwrite=True.')
 
-        """Generate a representation of all sequences with their features tabulated and write to a file."""
+    def _create_services(self) -> list[ServiceBaseClass]:
+        selected = service_registry if self.services is None else load_services(self.services)
+        return [service_cls(self.user_email, **self.service_options.get(name, {}))
+                for name, service_cls in selected.items()]
 
-        with open(filename, 'w') as file:
+    def _process_pool(self, services: list[ServiceBaseClass]) -> ProcessPoolExecutor | nullcontext:
+        """Starts worker processes for the run if any of the services are CPU-bound."""
+        if any(service.cpu_bound for service in services):
+            return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return nullcontext()
+
+    @staticmethod
+    async def _gather_services(services: list[ServiceBaseClass],
+                               sequences: list[ProteinSequence],
+                               pool: ProcessPoolExecutor | None = None,
+                               ) -> None:
+
+        """
+        Runs services concurrently on one event loop, so a run takes about as long as its slowest service.
+        CPU-bound services are spread across the process pool, if there is one.
+        """
+
+        async def _timed(service: ServiceBaseClass) -> None:
+            with metrics.timer('service_seconds', service=type(service).__name__):
+                if service.cpu_bound:
+                    await service.arun(sequences, executor=pool)
+                else:
+                    await service.arun(sequences)
+
+        await asyncio.gather(*map(_timed, services))
+
+    def _run_services(self,
+                      services: list[ServiceBaseClass],
+                      pool: ProcessPoolExecutor | None = None,
+                      writer: OutputWriter | None = None,
+                      ) -> None:
+
+        """
+        Run the services concurrently against the loaded protein sequences. Sequences with identical content are
+        only run once, with the results then shared between them. Each sequence is added to the index as soon as
+        every service has finished with it, and passed to the writer, if one is given.
+        """
+
+        groups = SequenceGroups(self.sequences.values())
+        if groups.saved:
+            logger.info(f'{groups.total} sequences grouped into {len(groups)} unique sequences, '
+                        f'saving {groups.saved * len(services)} service jobs.')
+
+        if writer:
+            writer.expect(self.sequences.values())
+        remaining = {id(rep): len(services) for rep in groups.representatives}  # Services yet to finish.
+
+        def _on_complete(rep: ProteinSequence) -> None:
+            remaining[id(rep)] -= 1
+            if remaining[id(rep)] == 0:
+                groups.fan_out_group(rep)
+                for seq in (rep, *groups.members(rep)):
+                    self._index.add(seq)
+                    if writer:
+                        writer.complete(seq)
+
+        for service in services:
+            service.on_complete = _on_complete
+        metrics.count('sequences', groups.total)
+        metrics.count('unique_sequences', len(groups))
+        with metrics.timer('batch_seconds'):
+            asyncio.run(self._gather_services(services, groups.representatives, pool))
+
+        for rep in groups.representatives:  # Catch any sequence a service didn't report as complete.
+            if remaining[id(rep)] > 0:
+                remaining[id(rep)] = 1
+                _on_complete(rep)
+
+        if self.compact_features:
+            table = FeatureTable()
             for seq in self.sequences.values():
-                display = SequenceDisplay(seq)
-                file.write(display())
-                file.write('\n')
+                seq.compact(table)
+
+    def run(self, outfile: str, *, output_format: str | None = None) -> None:
 
-    def run(self, outfile: str) -> None:
+        """
+        Run the services against the loaded protein sequences and write out the results.
+
+        :param outfile: file name to write results to.
+        :param output_format: name of the output format, default = chosen by file extension.
+        :raises: ValueError if the sequences were opened from a run store.
+        """
+
+        self._check_writable()
+        services = self._create_services()
+        with self._process_pool(services) as pool, OutputWriter(outfile, output_format=output_format) as writer:
+            self._run_services(services, pool, writer)
+        if metrics.enabled:
+            logger.info(f'Run summary:\n{metrics.summary()}')
+
+    def run_fasta(self,
+                  __file: str,
+                  /,
+                  outfile: str,
+                  *,
+                  batch_size: int = 1000,
+                  output_format: str | None = None,
+                  shard: tuple[int, int] | None = None,
+                  ) -> None:
+
+        """
+        Stream sequences from a fasta-formatted file, running the services one batch at a time, so only a single
+        batch of sequences is held in memory. Each sequence's results are written out as soon as they are complete.
+        Replaces any currently loaded sequences. The index covers every sequence in the file once the run is over,
+        although only the last batch stays loaded.
+
+        :param __file: path to file, which may be gzip-compressed.
+        :param outfile: file name to write results to.
+        :param batch_size: number of sequences to load and run per batch, default = 1000.
+        :param output_format: name of the output format, default = chosen by file extension.
+        :param shard: (i, N) to only run the sequences in the i-th of N shards, split by sequence content. The
+                      outputs of all shards can be combined with sharding.merge_shards.
+        """
 
-        """Run each service in turn against the loaded protein sequences and write out the results."""
+        services = self._create_services()
+        self._clear()
+        total = 0
+        sequences = read_fasta(__file) if shard is None else select_shard(read_fasta(__file), *shard)
+        with self._process_pool(services) as pool, OutputWriter(outfile, output_format=output_format) as writer:
+            batches = batched(sequences, batch_size)
+            for i in count(1):
+                with metrics.timer('read_fasta_seconds'):
+                    batch = next(batches, None)
+                if batch is None:
+                    break
+                self.sequences = {seq.name: seq for seq in batch}
+                total += len(self.sequences)
+                logger.info(f'Running batch {i} ({total} sequences so far)...')
+                self._run_services(services, pool, writer)
 
-        for name, service_cls in service_registry.items():
-            service = service_cls(self.user_email)
-            service.run(self.sequences.values())
-        self.write_out(filename=outfile)
\ No newline at end of file
+        logger.info(f'{total} total sequences processed.')
+        if metrics.enabled:
+            logger.info(f'Run summary:\n{metrics.summary()}')
@@ -0,0 +1,75 @@
+from collections import deque
+from collections.abc import Iterable
+
+from residual.metrics import metrics
+from residual.protein_sequence import ProteinSequence
+from residual.surveyor.exporters import get_exporter
+
+
+class OutputWriter:
+
+    """
+    Writes each sequence's results to file as soon as services have finished with it, rather than once the
+    whole run is over. Output keeps the order the sequences were given in: a finished sequence is held back
+    only until those before it have finished too, then passed to the exporter and flushed.
+    """
+
+    def __init__(self, filename: str, *, append: bool = False, output_format: str | None = None) -> None:
+
+        """
+        :param filename: file to write to.
+        :param append: whether to add to the end of an existing file.
+        :param output_format: name of the output format, default = chosen by file extension.
+        """
+
+        self.filename = filename
+        self.written = 0
+        self._exporter = get_exporter(filename, output_format, append=append)
+        self._queue: deque[ProteinSequence] = deque()  # Sequences awaiting writing, in output order.
+        self._finished: set[int] = set()  # Ids of queued sequences which are ready to write.
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *_):
+        self.close(complete=exc_type is None)
+
+    def expect(self, sequences: Iterable[ProteinSequence]) -> None:
+        """Adds sequences to the end of the output order."""
+        self._queue.extend(sequences)
+
+    def _write(self, seq: ProteinSequence) -> None:
+        with metrics.timer('write_seconds'):
+            self._exporter.write(seq)
+        self.written += 1
+
+    def complete(self, seq: ProteinSequence) -> None:
+
+        """Marks a sequence as finished, writing it and any following finished sequences that are now unblocked."""
+
+        self._finished.add(id(seq))
+        if self._queue and id(self._queue[0]) in self._finished:
+            while self._queue and id(self._queue[0]) in self._finished:
+                ready = self._queue.popleft()
+                self._finished.discard(id(ready))
+                self._write(ready)
+            self._exporter.flush()
+
+    def complete_all(self) -> None:
+        """Marks all queued sequences as finished, writing everything out."""
+        for seq in list(self._queue):
+            self.complete(seq)
+
+    def close(self, *, complete: bool = True) -> None:
+
+        """
+        Closes the file, first writing out any sequences still queued.
+
+        :param complete: whether to write the queued sequences. Left False when closing after an error, as
+                         services may not have finished with them, so they are left out rather than written partly
+                         annotated.
+        """
+
+        if complete:
+            self.complete_all()
+        self._exporter.close()
@@ -0,0 +1,163 @@
+import json
+
+import pytest
+
+from residual.protein_sequence import ProteinSequence, Feature, GoTerm
+from residual.surveyor.exporters import *
+
+
+def _annotated_sequences() -> list[ProteinSequence]:
+    seq_1 = ProteinSequence(name='seq_1', sequence='MSFTLTNKNV')
+    seq_1.add_features([Feature('Service 1', 'Signature A', [(1, 10), (50, 60)],
+                                [GoTerm('GO:0000001', 'BIOLOGICAL PROCESS', 'Replication')]),
+                        Feature('Service 2', 'Whole sequence', [])])
+    return [seq_1, ProteinSequence(name='seq_2', sequence='MSTAGKVIKC')]
+
+
+def test_format_selection(tmp_path) -> None:
+    assert isinstance(get_exporter(str(tmp_path / 'out.jsonl')), JsonLinesExporter)
+    assert isinstance(get_exporter(str(tmp_path / 'out.txt')), TextExporter)
+    assert isinstance(get_exporter(str(tmp_path / 'out.jsonl'), 'tsv'), TableExporter)
+    assert isinstance(get_exporter(str(tmp_path / 'results')), TextExporter)
+    with pytest.raises(ValueError):
+        get_exporter(str(tmp_path / 'out'), 'xml')
+
+
+def test_jsonl_export(tmp_path) -> None:
+    with get_exporter(str(tmp_path / 'out.jsonl')) as exporter:
+        for seq in _annotated_sequences():
+            exporter.write(seq)
+
+    with open(tmp_path / 'out.jsonl') as file:
+        records = [json.loads(line) for line in file]
+    assert [r['name'] for r in records] == ['seq_1', 'seq_2']
+    assert records[0]['features'][0]['locations'] == [[1, 10], [50, 60]]
+    assert records[0]['features'][0]['go_terms'][0]['id'] == 'GO:0000001'
+    assert records[1]['features'] == []
+
+
+def test_tsv_export(tmp_path) -> None:
+    sequences = _annotated_sequences()
+    sequences[0].features[1].inferred = True
+    with get_exporter(str(tmp_path / 'out.tsv')) as exporter:
+        for seq in sequences:
+            exporter.write(seq)
+
+    with open(tmp_path / 'out.tsv') as file:
+        rows = [line.rstrip('\n').split('\t') for line in file]
+    assert rows == [['sequence', 'service', 'name', 'start', 'end', 'go_terms', 'inferred'],
+                    ['seq_1', 'Service 1', 'Signature A', '1', '10', 'GO:0000001', 'false'],
+                    ['seq_1', 'Service 1', 'Signature A', '50', '60', 'GO:0000001', 'false'],
+                    ['seq_1', 'Service 2', 'Whole sequence', '', '', '', 'true']]
+
+
+def test_tsv_quoting(tmp_path) -> None:
+    import csv
+
+    seq = ProteinSequence(name='seq_1', sequence='MSFTLTNKNV')
+    seq.add_features([Feature('Service 1', 'Tab\tand\nnewline', [(1, 2)]), Feature('Service 1', 'Plain', [(3, 4)])])
+    with get_exporter(str(tmp_path / 'out.tsv')) as exporter:
+        exporter.write(seq)
+        exporter.write(ProteinSequence(name='seq_2', sequence='MK'))
+
+    with open(tmp_path / 'out.tsv', newline='') as file:
+        rows = list(csv.reader(file, delimiter='\t'))
+    assert [row[2] for row in rows[1:]] == ['Tab\tand\nnewline', 'Plain']
+    records = list(TableExporter.records(str(tmp_path / 'out.tsv')))
+    assert [name for name, _ in records] == ['seq_1'] and records[0][1].count('\n') == 3
+
+
+def test_parquet_export(tmp_path) -> None:
+    pq = pytest.importorskip('pyarrow.parquet')
+
+    with get_exporter(str(tmp_path / 'out.parquet')) as exporter:
+        for seq in _annotated_sequences():
+            exporter.write(seq)
+
+    table = pq.read_table(tmp_path / 'out.parquet')
+    assert table.column('start').to_pylist() == [1, 50, None]
+    assert table.column('go_terms').to_pylist()[0] == ['GO:0000001']
+    assert table.column('inferred').to_pylist() == [False, False, False]
+
+
+@pytest.mark.parametrize('suffix', ['txt', 'jsonl', 'tsv'])
+def test_merge_shards(tmp_path, suffix) -> None:
+    from residual.surveyor.sharding import merge_shards, select_shard
+
+    sequences = _annotated_sequences() + [ProteinSequence(name=f'seq_{i}', sequence='MK' * i) for i in range(3, 12)]
+    for seq in sequences[2:]:
+        seq.add_features([Feature('Service 1', f'Repeat {len(seq.sequence)}', [(1, 2)])])
+    (tmp_path / 'in.fasta').write_text(''.join(f'>{seq.name}\n{seq.sequence}\n' for seq in sequences))
+
+    shard_files = []
+    for i in range(3):
+        shard_files.append(str(tmp_path / f'shard_{i}.{suffix}'))
+        with get_exporter(shard_files[-1]) as exporter:
+            for seq in select_shard(sequences, i, 3):
+                exporter.write(seq)
+    with get_exporter(str(tmp_path / f'whole.{suffix}')) as exporter:
+        for seq in sequences:
+            exporter.write(seq)
+
+    merge_shards(str(tmp_path / 'in.fasta'), shard_files, str(tmp_path / f'merged.{suffix}'))
+    assert (tmp_path / f'merged.{suffix}').read_text() == (tmp_path / f'whole.{suffix}').read_text()
+
+    with pytest.raises(ValueError):  # Shards given out of order.
+        merge_shards(str(tmp_path / 'in.fasta'), shard_files[::-1], str(tmp_path / f'bad.{suffix}'))
+    if suffix == 'tsv':  # Checked before anything is written, as the mismatch only shows at the end.
+        assert not (tmp_path / 'bad.tsv').exists()
+
+
+def test_parse_shard() -> None:
+    from residual.surveyor.sharding import parse_shard
+
+    assert parse_shard('1/4') == (1, 4)
+    for spec in ['4/4', '-1/4', '1', 'a/b']:
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+
+def test_run_store(tmp_path) -> None:
+    from residual.surveyor import Surveyor
+
+    sequences = _annotated_sequences() + [ProteinSequence(name=f'extra_{i}', sequence='MK' * (i + 1)) for i in range(50)]
+    sequences[0].features[1].inferred = True
+    with get_exporter(str(tmp_path / 'run.rstore')) as exporter:
+        for seq in sequences:
+            exporter.write(seq)
+
+    sv = Surveyor(user_email='')
+    with sv.open_store(str(tmp_path / 'run.rstore')) as store:
+        assert len(store) == len(sequences) and list(store) == [seq.name for seq in sequences]
+        for seq in reversed(sequences):
+            stored = store[seq.name]
+            assert (stored.name, stored.sequence, stored.features) == (seq.name, seq.sequence, seq.features)
+        assert store.at(1).name == 'seq_2' and 'seq_3' not in store
+        with pytest.raises(KeyError):
+            store['seq_3']
+
+        # Views render and export as the original sequences do.
+        sv.write_out(str(tmp_path / 'stored.txt'))
+        with get_exporter(str(tmp_path / 'original.txt')) as exporter:
+            for seq in sequences:
+                exporter.write(seq)
+        assert (tmp_path / 'stored.txt').read_text() == (tmp_path / 'original.txt').read_text()
+
+    # The index is rebuilt from the store once used, and views stay the same objects while in use.
+    store = sv.open_store(str(tmp_path / 'run.rstore'))
+    assert len(sv._index) == 0
+    assert len(sv.index) == len(sequences) and sv.index.sequences('name', 'Signature A') == ['seq_1']
+    stored = store['seq_2']
+    stored.add_features([Feature('added', 'In memory', [(1, 2)])])
+    assert store['seq_2'] is stored and store.at(-len(store) + 1) is stored
+    assert store['seq_2'].features[-1].service == 'added'
+    with pytest.raises(ValueError):
+        sv.load_strings(['MKV'], overwrite=False)
+    with pytest.raises(ValueError):
+        sv.run(str(tmp_path / 'rerun.txt'))
+
+    sv.load_strings(['MKV'])  # Replacing the store unmaps it.
+    assert store.closed and len(sv.index) == 0
+
+    with pytest.raises(ValueError):
+        sv.open_store(str(tmp_path / 'stored.txt'))
@@ -0,0 +1,63 @@
+import json
+
+from residual.metrics import Metrics, metrics
+
+
+def test_disabled_metrics() -> None:
+    m = Metrics()
+    m.count('requests')
+    with m.timer('stage_seconds'), m.in_flight('jobs'):
+        ...
+    assert not (m.counters or m.gauges or m.histograms)
+
+
+def test_metric_outputs(tmp_path) -> None:
+    m = Metrics(enabled=True)
+    m.count('http_responses', status=200)
+    m.count('http_responses', 2, status=200)
+    m.count('http_responses', status=503)
+    with m.in_flight('jobs_in_flight'):
+        with m.in_flight('jobs_in_flight'):
+            ...
+    for seconds in (0.002, 0.02, 0.2, 2):
+        m.observe('service_seconds', seconds, service='Hydropathy')
+
+    assert m.counters[('http_responses', (('status', 200),))] == 3
+    assert (m.gauges[('jobs_in_flight', ())].value, m.gauges[('jobs_in_flight', ())].peak) == (0, 2)
+    assert m.histograms[('service_seconds', (('service', 'Hydropathy'),))].quantile(0.5) == 0.05
+
+    text = m.prometheus().splitlines()
+    assert 'residual_http_responses_total{status="503"} 1' in text
+    assert 'residual_jobs_in_flight_peak 2' in text
+    assert 'residual_service_seconds_bucket{service="Hydropathy",le="0.1"} 2' in text
+    assert 'residual_service_seconds_bucket{service="Hydropathy",le="+Inf"} 4' in text
+    assert 'residual_service_seconds_count{service="Hydropathy"} 4' in text
+
+    assert 'service_seconds (Hydropathy)' in m.summary()
+
+    m.dump(str(tmp_path / 'metrics.json'))
+    with open(tmp_path / 'metrics.json') as file:
+        dumped = json.load(file)
+    assert dumped['histograms'][0]['count'] == 4
+
+
+def test_run_metrics(tmp_path) -> None:
+    from residual.protein_sequence import Feature
+    from residual.services import ServiceBaseClass
+    from residual.surveyor import Surveyor
+
+    class SimpleService(ServiceBaseClass):
+        def run(self, inputs):
+            for seq in inputs:
+                seq.add_features([Feature('simple', 'A', [(1, 2)])])
+
+    sv = Surveyor(user_email='')
+    sv.load_strings(['MSFTLTNKNV', 'MSTAGKVIKC', 'MSFTLTNKNV'])
+    metrics.enable()
+    try:
+        sv._run_services([SimpleService()])
+        assert metrics.histograms[('service_seconds', (('service', 'SimpleService'),))].count == 1
+        assert metrics.counters[('unique_sequences', ())] == 2
+    finally:
+        metrics.enabled = False
+        metrics.reset()
@@ -28,4 +28,119 @@ def test_feature_into_rows() -> None:
     display = SequenceDisplay(ProteinSequence(name='seq_1', sequence=''))
     feature1_as_rows = [('Service 1', 'Signature A', '1-10', 'GO:0000001 (BIOLOGICAL PROCESS) Replication'),
                         ('', '', '50-60', '')]
-    assert display.feature_into_rows(feature1) == feature1_as_rows
\ No newline at end of file
+    assert display.feature_into_rows(feature1) == feature1_as_rows
+    assert display.feature_into_rows(Feature('Service 1', 'Signature B', [(1, 5)], inferred=True)) == [
+        ('Service 1', 'Signature B', '1-5', '', 'yes')]
+
+    # Only tables with an inferred feature get the column.
+    seq = ProteinSequence(name='seq_1', sequence='MKV')
+    seq.add_features([feature1])
+    assert 'Inferred' not in str(SequenceDisplay(seq))
+    seq.add_features([Feature('Service 1', 'Signature B', [(1, 5)], inferred=True)])
+    assert 'Inferred' in str(SequenceDisplay(seq))
+
+
+def test_encoding() -> None:
+    import numpy as np
+    from residual.protein_sequence.encoding import EncodedBatch, decode
+
+    seq = ProteinSequence(name='seq_1', sequence='ACDY')
+    assert seq.encoded.tolist() == [0, 1, 2, 19]
+    assert decode(seq.encoded) == 'ACDY'
+
+    batch = EncodedBatch.from_sequences([seq, 'MSFT', 'GG'])
+    assert len(batch) == 3
+    assert decode(batch[1]) == 'MSFT'
+
+    # Windows never span two sequences, and sequences shorter than the window get none.
+    means = batch.window_means(np.arange(20, dtype=float), window=3)
+    assert [m.tolist() for m in means] == [[1.0, (1 + 2 + 19) / 3], [(10 + 15 + 4) / 3, (15 + 4 + 16) / 3], []]
+
+    kmers = batch.kmer_codes(2)
+    assert [k.tolist() for k in kmers] == [[1, 22, 59], [10 * 20 + 15, 15 * 20 + 4, 4 * 20 + 16], [5 * 20 + 5]]
+    assert batch.kmer_profile(1)[2, 5] == 2
+
+def test_feature_table() -> None:
+    go_term = ('GO:0000001', 'BIOLOGICAL PROCESS', 'Replication')
+    assert go_term_registry.intern(*go_term) is go_term_registry.intern(*go_term)
+
+    features = [Feature('Service 1', 'Signature A', [(1, 10), (50, 60)], [GoTerm(*go_term)]),
+                Feature('Service 1', 'Signature B', [], [])]
+    seq = ProteinSequence(name='seq_1', sequence='MSFTLTNKNV')
+    seq.features = list(features)
+
+    table = FeatureTable()
+    seq.compact(table)
+    assert len(table) == 2
+    assert list(seq.features) == features
+    assert seq.features[0].go_terms[0] is go_term_registry.intern(*go_term)
+
+    seq.add_features([Feature('Service 2', 'Signature C', [(3, 4)])])
+    assert [ft.name for ft in seq.features] == ['Signature A', 'Signature B', 'Signature C']
+
+def test_feature_index() -> None:
+    seq = ProteinSequence(name='seq_1', sequence='MSFTLTNKNV')
+    domain = Feature('Service 1', 'Domain', [(100, 200)])
+    repeats = Feature('Service 1', 'Repeats', [(10, 20), (150, 160)])
+    motif = Feature('Service 2', 'Motif', [(300, 310)])
+    seq.add_features([domain, motif])
+
+    index = seq.feature_index
+    assert index.overlapping(190, 250) == [domain]
+
+    seq.add_features([repeats])  # Index catches up with features added after it was built.
+    index = seq.feature_index
+    assert index.in_order() == [repeats, domain, motif]
+    assert index.overlapping(120, 180) == [domain, repeats]
+    assert index.overlapping(201, 299) == []
+    assert index.within(100, 200) == [domain, repeats]
+    assert index.nearest(250) == domain
+    assert index.nearest(280) == motif
+    assert index.nearest(15) == repeats
+
+    seq.features = [motif]  # A replaced list is indexed afresh, even without getting shorter.
+    assert seq.feature_index.in_order() == [motif]
+
+
+def test_feature_index_long_features() -> None:
+    import random
+
+    rng = random.Random(0)
+    seq = ProteinSequence(name='seq_1', sequence='MSFTLTNKNV')
+    for i in range(500):
+        start = rng.randint(1, 5000)
+        length = 4000 if i % 100 == 0 else rng.randint(1, 50)  # A few long features among many short ones.
+        seq.add_features([Feature('Service 1', f'Feature {i}', [(start, start + length)])])
+
+    index = seq.feature_index
+    for _ in range(200):
+        start = rng.randint(1, 9000)
+        end = start + rng.randint(0, 100)
+        expected = {id(ft) for ft in seq.features for s, e in ft.locations if s <= end and e >= start}
+        assert {id(ft) for ft in index.overlapping(start, end)} == expected
+
+
+def test_go_term_registry_threads() -> None:
+    from concurrent.futures import ThreadPoolExecutor
+    from residual.protein_sequence.feature import GoTermRegistry
+
+    registry = GoTermRegistry()
+    terms = [GoTerm(f'GO:{i:07}', 'MOLECULAR_FUNCTION', f'Term {i}') for i in range(2000)]
+    with ThreadPoolExecutor(8) as pool:
+        indices = list(pool.map(registry.index, terms * 4))
+    assert len(registry) == len(terms)
+    assert all(registry.terms[index] == term for index, term in zip(indices, terms * 4))
+
+
+def test_display_override() -> None:
+    import io
+
+    class NamesOnly(SequenceDisplay):
+        def tabulate_features(self, features):
+            return [ft.name for ft in features]
+
+    seq = ProteinSequence(name='seq_1', sequence='MSFTLTNKNV')
+    seq.add_features([Feature('Service 1', 'Signature B', [(5, 6)]), Feature('Service 1', 'Signature A', [(1, 2)])])
+    sink = io.StringIO()
+    NamesOnly(seq).write(sink)
+    assert sink.getvalue() == str(NamesOnly(seq)) + '\n' == '>seq_1\nMSFTLTNKNV\n\nSignature A\nSignature B\n'
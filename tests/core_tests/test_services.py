@@ -7,4 +7,49 @@ def test_register_service() -> None:
         def run(self, inputs):
             ...
 
-    assert service_registry == {'TestService': TestService}
\ No newline at end of file
+    assert service_registry == {'TestService': TestService}
+
+def test_sequence_grouping() -> None:
+    from residual.protein_sequence import ProteinSequence, Feature
+    from residual.services.grouping import SequenceGroups
+
+    seqs = [ProteinSequence('isoform_1', 'MSFTLTNKNV'),
+            ProteinSequence('strain_1', 'MSTAGKVIKC'),
+            ProteinSequence('isoform_2', 'MSFTLTNKNV'),
+            ProteinSequence('isoform_3', 'MSFTLTNKNV')]
+    groups = SequenceGroups(seqs)
+
+    assert len(groups) == 2
+    assert groups.saved == 2
+    assert groups.representatives == seqs[:2]
+    assert groups.members(seqs[0]) == [seqs[2], seqs[3]]
+
+    seqs[0].features.append(Feature('Service 1', 'Signature A', [(1, 5)]))
+    groups.fan_out()
+    assert seqs[3].features == seqs[0].features
+    assert seqs[1].features == []
+
+def test_service_selection() -> None:
+    import pytest
+    from residual.services.loader import available_services, load_services
+    from residual.surveyor import Surveyor
+
+    assert {'InterProScan', 'Hydropathy', 'Composition'} <= set(available_services())
+    with pytest.raises(ValueError):
+        load_services(['NoSuchService'])
+
+    loaded = load_services(['Composition'])
+    assert loaded['Composition'].__name__ == 'Composition'
+    services = Surveyor('', services=['Composition', 'Hydropathy'])._create_services()
+    assert [type(service).__name__ for service in services] == ['Composition', 'Hydropathy']
+
+
+def test_plugin_registered_once(monkeypatch) -> None:
+    from residual.services import base_class, loader
+
+    monkeypatch.setattr(base_class, 'service_registry', dict(base_class.service_registry))
+    monkeypatch.setattr(loader, 'available_services',
+                        lambda: {'composition-plugin': 'residual.services.local_analysis:Composition'})
+    loaded = loader.load_services()
+    assert list(loaded) == ['Composition']
+    assert list(base_class.service_registry.values()).count(loaded['Composition']) == 1
@@ -1,4 +1,7 @@
+import pytest
+
 from residual.surveyor import *
+from residual.surveyor.writer import OutputWriter
 
 
 def test_fasta_loading() -> None:
@@ -30,3 +33,164 @@ def test_iterable_loading() -> None:
 
     sv.load_strings(sequences) # With automatic names
     assert sv.sequences['sequence_003'].sequence == 'MGTQGKVIKC'
+
+def test_gzip_fasta_streaming(tmp_path) -> None:
+    import gzip
+    from residual.protein_sequence import read_fasta
+
+    with open('data/tests/adh.fasta', 'rb') as file, gzip.open(tmp_path / 'adh.fasta.gz', 'wb') as gz_file:
+        gz_file.write(file.read())
+
+    plain = list(read_fasta('data/tests/adh.fasta', chunk_size=7))  # Small chunks split lines across reads.
+    zipped = read_fasta(str(tmp_path / 'adh.fasta.gz'))
+
+    assert next(zipped).name == 'P00334'
+    assert [seq.sequence for seq in plain] == [seq.sequence for seq in read_fasta(str(tmp_path / 'adh.fasta.gz'))]
+    assert [seq.name for seq in plain] == ['P00334', 'P28469', 'Q9QYY9']
+
+def test_concurrent_services() -> None:
+    import asyncio
+    import threading
+    from residual.protein_sequence import Feature
+    from residual.services import ServiceBaseClass
+
+    started = threading.Barrier(3, timeout=10)  # Only passed once every service is running at the same time.
+
+    class BlockingService(ServiceBaseClass):
+        def run(self, inputs):
+            started.wait()
+            for seq in inputs:
+                seq.add_features([Feature('blocking', 'A', [(1, 2)])])
+
+    class AsyncService(ServiceBaseClass):
+        def run(self, inputs):
+            ...
+
+        async def arun(self, inputs):
+            await asyncio.to_thread(started.wait)
+            for seq in inputs:
+                seq.add_features([Feature('async', 'B', [(3, 4)])])
+
+    sv = Surveyor(user_email='')
+    sv.load_strings(['MSFTLTNKNV', 'MSTAGKVIKC', 'MSFTLTNKNV'])
+    sv._run_services([BlockingService(), BlockingService(), AsyncService()])  # Services overlap, or the barrier breaks.
+
+    for seq in sv.sequences.values():
+        assert sorted(ft.service for ft in seq.features) == ['async', 'blocking', 'blocking']
+
+def test_incremental_writer(tmp_path) -> None:
+    import asyncio
+    from residual.protein_sequence import Feature
+    from residual.services import ServiceBaseClass
+
+    class StaggeredService(ServiceBaseClass):
+        """Finishes sequences in reverse order, checking each is only written once complete."""
+
+        def __init__(self, outfile):
+            self.outfile = outfile
+
+        def run(self, inputs):
+            ...
+
+        async def arun(self, inputs):
+            for seq in reversed(list(inputs)):
+                with open(self.outfile) as file:
+                    assert f'>{seq.name}\n' not in file.read()
+                seq.add_features([Feature('staggered', f'Feature of {seq.name}', [(1, 2)])])
+                self.completed(seq)
+                await asyncio.sleep(0)
+
+    outfile = str(tmp_path / 'out.txt')
+    sv = Surveyor(user_email='')
+    sv.load_strings(['MSFTLTNKNV', 'MSTAGKVIKC', 'MSFTLTNKNV'], names=['seq_1', 'seq_2', 'seq_3'])
+
+    with OutputWriter(outfile) as writer:
+        sv._run_services([StaggeredService(outfile)], writer=writer)
+        assert writer.written == 3
+
+    with open(outfile) as file:
+        lines = file.read().splitlines()
+    assert [line for line in lines if line.startswith('>')] == ['>seq_1', '>seq_2', '>seq_3']
+    assert sum('Feature of seq_1' in line for line in lines) == 2  # Shared with its duplicate, seq_3.
+
+
+def test_writer_error(tmp_path) -> None:
+    from residual.protein_sequence import ProteinSequence
+
+    outfile = str(tmp_path / 'out.txt')
+    first, second = ProteinSequence('seq_1', 'MSFTLTNKNV'), ProteinSequence('seq_2', 'MSTAGKVIKC')
+    with pytest.raises(RuntimeError), OutputWriter(outfile) as writer:
+        writer.expect([first, second])
+        writer.complete(first)
+        raise RuntimeError('Service failed')
+
+    with open(outfile) as file:
+        assert [line for line in file if line.startswith('>')] == ['>seq_1\n']  # Unfinished seq_2 left out.
+
+
+def test_annotation_index() -> None:
+    from residual.protein_sequence import Feature, GoTerm
+    from residual.services import ServiceBaseClass
+
+    oxidoreductase = GoTerm('GO:0016491', 'MOLECULAR_FUNCTION', 'oxidoreductase activity')
+    binding = GoTerm('GO:0005488', 'MOLECULAR_FUNCTION', 'binding')
+
+    class DomainService(ServiceBaseClass):
+        def run(self, inputs):
+            for seq in inputs:
+                if seq.sequence.startswith('MS'):
+                    seq.add_features([Feature('domains', 'ADH', [(1, 5)], [oxidoreductase, binding]),
+                                      Feature('domains', 'ADH', [(6, 9)], [oxidoreductase])])
+                seq.add_features([Feature('domains', 'Tail', [(9, 10)])])
+
+    class MotifService(ServiceBaseClass):
+        def run(self, inputs):
+            for seq in inputs:
+                seq.add_features([Feature('motifs', 'Tail', [(8, 10)])])
+
+    sv = Surveyor(user_email='')
+    sv.load_strings(['MSFTLTNKNV', 'MSTAGKVIKC', 'MGTQGKVIKC', 'MSFTLTNKNV'])
+    sv._run_services([DomainService()])
+
+    index = sv.index
+    assert len(index) == 4
+    assert index.sequences('go', 'GO:0016491') == ['sequence_001', 'sequence_004', 'sequence_002']
+    assert dict(index.lookup('name', 'ADH'))['sequence_002'] == [0, 1]
+    assert index.count('go', 'GO:0016491') == 3 and index.count('go', 'GO:0016491', features=True) == 6
+    assert index.count('category', 'MOLECULAR_FUNCTION', features=True) == 6  # Not once per term.
+    assert index.summary() == {'MOLECULAR_FUNCTION': {'terms': 2, 'sequences': 3, 'features': 6}}
+    assert dict(index.terms('MOLECULAR_FUNCTION')) == {'GO:0016491': 'oxidoreductase activity', 'GO:0005488': 'binding'}
+
+    sv._run_services([MotifService()])  # Only the new features are indexed.
+    assert index.count('service', 'domains', features=True) == 10
+    assert dict(index.counts('name')) == {'ADH': 3, 'Tail': 4}
+    assert dict(index.counts('name', service='motifs')) == {'Tail': 4}
+    assert index.most_common('name', 1, service='domains') == [('Tail', 4)]
+    assert dict(index.lookup('name', 'Tail'))['sequence_003'] == [0, 1]
+
+    with pytest.raises(ValueError):
+        index.counts('service', service='motifs')
+
+    sv.load_strings(['MSFTLTNKNV'])
+    assert len(sv.index) == 0 and index.count('name', 'ADH') == 0
+
+
+def test_annotation_index_replaced() -> None:
+    from residual.protein_sequence import Feature, ProteinSequence
+    from residual.surveyor.annotation_index import AnnotationIndex
+
+    index = AnnotationIndex()
+    first = ProteinSequence('seq_1', 'MSFTLTNKNV')
+    first.add_features([Feature('domains', name, [(1, 5)]) for name in 'AB'])
+    index.add(first)
+    assert index.most_common('name') == [('A', 1), ('B', 1)]
+
+    second = ProteinSequence('seq_1', 'MSTAGKVIKC')  # Same name, more features: replaces rather than extends.
+    second.add_features([Feature('domains', name, [(1, 5)]) for name in 'CDE'])
+    index.add(second)
+    assert len(index) == 1
+    assert dict(index.counts('name')) == {'C': 1, 'D': 1, 'E': 1}
+    assert dict(index.counts('name', service='domains')) == {'C': 1, 'D': 1, 'E': 1}
+    assert index.count('service', 'domains', features=True) == 3
+    assert index.most_common('name', 1) == [('C', 1)]
+    assert index.sequences('name', 'A') == []
@@ -0,0 +1,206 @@
+"""
+Local stand-in for the EBI iprscan5 REST API (run, status and result), for exercising InterProScan offline.
+Jobs finish after a set latency, a share of them can be made to fail, and a share of all requests can be answered
+with server errors. Results are taken from the JSON fixtures in data/tests, with their matches reused for each
+submitted sequence, or made up if there are none.
+
+    python -m tests.mock_ebi [--port 8080] [--latency 0.05] [--failure_rate 0] [--error_rate 0]
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import multiprocessing
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from itertools import count
+from multiprocessing.connection import Connection
+
+from aiohttp import ClientError, ClientSession, web
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.05  # Seconds a job runs for.
+    seconds_per_residue: float = 0.0
+    failure_rate: float = 0.0  # Share of jobs that end with status FAILURE.
+    error_rate: float = 0.0  # Share of requests answered with a 5xx error.
+    error_statuses: tuple[int, ...] = (500, 502, 503)
+    seed: int = 0
+
+
+def _load_fixtures(pattern: str = 'data/tests/*.json') -> list[list[dict]]:
+    """Matches of each result in the fixture files."""
+    fixtures = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as file:
+            fixtures.extend(result['matches'] for result in json.load(file)['results'])
+    return fixtures
+
+
+def _synthetic_matches(rng: random.Random, length: int) -> list[dict]:
+    matches = []
+    for _ in range(rng.randint(0, 6)):
+        start = rng.randint(1, max(1, length - 30))
+        i = rng.randint(0, 5000)
+        go_refs = [{'id': f'GO:{rng.randint(0, 9999):07}', 'category': 'BIOLOGICAL_PROCESS',
+                    'name': f'process {i}', 'databaseName': 'GO'} for _ in range(rng.randint(0, 3))]
+        matches.append({'signature': {'accession': f'PF{i:05}', 'name': f'family_{i}', 'description': None,
+                                      'entry': {'accession': f'IPR{i:06}', 'name': f'Family {i}',
+                                                'description': f'Family {i} domain', 'goXRefs': go_refs}},
+                        'locations': [{'start': start, 'end': min(length, start + rng.randint(10, 60))}]})
+    return matches
+
+
+def _parse_fasta(text: str) -> list[tuple[str, str]]:
+    """(id, sequence) of each record; a bare sequence is given the id 'sequence'."""
+    if not text.startswith('>'):
+        return [('sequence', ''.join(text.split()))]
+    records = []
+    for record in text[1:].split('\n>'):
+        header, _, sequence = record.partition('\n')
+        records.append((header.split()[0], ''.join(sequence.split())))
+    return records
+
+
+class MockIprScan:
+
+    """Serves the iprscan5 endpoints from memory, counting the requests made to each."""
+
+    def __init__(self, config: MockConfig | None = None, fixtures: list[list[dict]] | None = None) -> None:
+        self.config = config or MockConfig()
+        self.fixtures = _load_fixtures() if fixtures is None else fixtures
+        self.requests: Counter[str] = Counter()
+        self.errors = 0  # Errors injected.
+        self.jobs: dict[str, tuple[float, list[tuple[str, str]], bool]] = {}  # Id -> (finish time, records, failed)
+        self._ids = count()
+        self._rng = random.Random(self.config.seed)
+
+    @property
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/run', self._run)
+        app.router.add_get('/status/{job_id}', self._status)
+        app.router.add_get('/result/{job_id}/json', self._result)
+        app.router.add_get('/stats', self._stats)
+        return app
+
+    def _error(self) -> web.Response | None:
+        if self._rng.random() < self.config.error_rate:
+            self.errors += 1
+            return web.Response(status=self._rng.choice(self.config.error_statuses), text='Injected error')
+        return None
+
+    async def _run(self, request: web.Request) -> web.Response:
+        self.requests['run'] += 1
+        if error := self._error():
+            return error
+        form = await request.post()
+        if 'email' not in form or 'sequence' not in form:
+            return web.Response(status=400, text='email and sequence are required')
+
+        records = _parse_fasta(form['sequence'])
+        job_id = f'iprscan5-R{next(self._ids):08}-p1m'
+        run_time = self.config.latency + self.config.seconds_per_residue * sum(len(seq) for _, seq in records)
+        self.jobs[job_id] = (time.monotonic() + run_time, records, self._rng.random() < self.config.failure_rate)
+        return web.Response(text=job_id)
+
+    async def _status(self, request: web.Request) -> web.Response:
+        self.requests['status'] += 1
+        if error := self._error():
+            return error
+        if (job := self.jobs.get(request.match_info['job_id'])) is None:
+            return web.Response(text='NOT_FOUND')
+        finish, _, failed = job
+        if time.monotonic() < finish:
+            return web.Response(text='RUNNING')
+        return web.Response(text='FAILURE' if failed else 'FINISHED')
+
+    async def _result(self, request: web.Request) -> web.Response:
+        self.requests['result'] += 1
+        if error := self._error():
+            return error
+        if (job := self.jobs.get(request.match_info['job_id'])) is None or time.monotonic() < job[0] or job[2]:
+            return web.Response(status=400, text='Results not available')
+
+        results = []
+        for id_, sequence in job[1]:
+            rng = random.Random(sequence)  # The same sequence always gets the same matches.
+            matches = rng.choice(self.fixtures) if self.fixtures else _synthetic_matches(rng, len(sequence))
+            results.append({'sequence': sequence, 'md5': '', 'matches': matches, 'xref': [{'name': id_, 'id': id_}]})
+        return web.json_response({'interproscan-version': 'mock', 'results': results})
+
+    async def _stats(self, _: web.Request) -> web.Response:
+        return web.json_response({'requests': self.requests, 'errors': self.errors, 'jobs': len(self.jobs)})
+
+
+def _serve(config: MockConfig, port: int, host: str = '127.0.0.1', ready: Connection | None = None) -> None:
+    """Serves the mock API until the process is stopped, sending the port it listens on through ready."""
+
+    async def _run():
+        runner = web.AppRunner(MockIprScan(config).app)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        if ready is not None:
+            ready.send(runner.addresses[0][1])
+        await asyncio.Event().wait()
+
+    asyncio.run(_run())
+
+
+@contextmanager
+def mock_server(config: MockConfig | None = None, port: int = 0):
+
+    """
+    Runs the mock API in a separate process, so that it doesn't compete with the code under test for the
+    event loop or show up in its memory use.
+
+    :param port: port to listen on, default = any free port.
+    :return: base URL of the API.
+    """
+
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_serve, args=(config or MockConfig(), port, '127.0.0.1', sender), daemon=True)
+    process.start()
+    try:
+        if not receiver.poll(10):
+            raise TimeoutError('The mock API did not start.')
+        base_url = f'http://127.0.0.1:{receiver.recv()}/'
+        asyncio.run(_wait_until_up(base_url))
+        yield base_url
+    finally:
+        process.terminate()
+        process.join()
+
+
+async def _wait_until_up(base_url: str, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with ClientSession() as session:
+        while True:
+            try:
+                async with session.get(f'{base_url}stats'):
+                    return
+            except ClientError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(0.05)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8080)
+    for name, value in asdict(MockConfig()).items():
+        if isinstance(value, float):
+            parser.add_argument(f'--{name}', type=float, default=value)
+    args = parser.parse_args()
+    config = MockConfig(**{name: getattr(args, name) for name in asdict(MockConfig()) if hasattr(args, name)})
+    _serve(config, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import json
+from collections.abc import Callable
+
+import pytest
+
+
+class FakeResponse:
+    """Stands in for an aiohttp response with a fixed body, readable as text or streamed as JSON."""
+
+    def __init__(self, body):
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        ...
+
+    def raise_for_status(self):
+        ...
+
+    async def text(self):
+        return self._body
+
+    @property
+    def content(self):
+        return self
+
+    async def iter_chunked(self, size: int):
+        body = json.dumps(self._body).encode()
+        for i in range(0, len(body), size):
+            yield body[i:i + size]
+
+
+class FakeSession:
+
+    """
+    Stands in for an HTTP session, answering each request with the body its handler returns for the URL (and the
+    posted data). Handlers may raise to simulate a failed request. Requested URLs are recorded in order.
+    """
+
+    def __init__(self, get: Callable[[str], object] | None = None, post: Callable[[str, dict], object] | None = None):
+        self._get, self._post = get, post
+        self.urls: list[str] = []
+
+    def get(self, url: str):
+        self.urls.append(url)
+        return FakeResponse(self._get(url))
+
+    def post(self, url: str, data: dict | None = None):
+        self.urls.append(url)
+        return FakeResponse(self._post(url, data))
+
+
+@pytest.fixture
+def fake_session() -> type[FakeSession]:
+    """Factory for sessions answering requests through the given get and post handlers."""
+    return FakeSession
@@ -0,0 +1,68 @@
+import asyncio
+from collections import deque
+
+from residual.protein_sequence import ProteinSequence
+from residual.services.batching import BatchSizer
+from residual.services.interpro_scan import InterProScan
+from residual.services.journal import JobJournal
+from residual.services.polling import PollingConfig, StatusPoller
+
+
+def _batch_handlers(jobs: dict[str, list[str]], titles: list[str]):
+    """Handlers running multi-FASTA jobs straight away, giving each sequence one match over its first five residues."""
+
+    def _post(url: str, data: dict):
+        job_id = f'job_{len(jobs)}'
+        jobs[job_id] = [line[1:] for line in data['sequence'].splitlines() if line.startswith('>')]
+        titles.append(data['title'])
+        return job_id
+
+    def _get(url: str):
+        if url.startswith('status'):
+            return 'FINISHED'
+        return {'results': [{'xref': [{'id': id_, 'name': id_}],
+                             'matches': [{'signature': {'accession': 'PF00001', 'name': 'family'},
+                                          'locations': [{'start': 1, 'end': 5}]}]}
+                            for id_ in jobs[url.split('/')[1]]]}
+
+    return {'get': _get, 'post': _post}
+
+
+def test_batch_packing() -> None:
+    sizer = BatchSizer(max_sequences=3, residues=25, target_latency=10, smoothing=1, min_residues=5)
+    pending = deque(ProteinSequence(f'seq_{i}', 'M' * length) for i, length in enumerate([10, 10, 10, 40, 5]))
+
+    assert [seq.name for seq in sizer.take(pending)] == ['seq_0', 'seq_1']
+    assert [seq.name for seq in sizer.take(pending)] == ['seq_2']
+    assert [seq.name for seq in sizer.take(pending)] == ['seq_3']  # Over budget alone, so sent by itself.
+
+    sizer.record(residues=40, latency=20)  # Took twice as long as the target, so halve the batch.
+    assert sizer.residues == 20
+    sizer.record(residues=40, latency=1)
+    assert sizer.residues == 40  # Grows at most twofold per job.
+
+
+def test_batch_scan(tmp_path, fake_session) -> None:
+    sequences = [ProteinSequence(f'seq_{i}', 'MSFTLTNKNV' * (i + 1)) for i in range(7)]
+    journal = JobJournal(str(tmp_path / 'jobs.jsonl'))
+    ipr_scan = InterProScan(user_email='test@test.com', journal=journal, max_jobs=2,
+                            batching=BatchSizer(max_sequences=3))
+    completed = []
+    ipr_scan.on_complete = completed.append
+
+    jobs: dict[str, list[str]] = {}
+    titles: list[str] = []
+
+    async def _scan():
+        session = fake_session(**_batch_handlers(jobs, titles))
+        poller = StatusPoller(session, PollingConfig(initial_delay=0, seconds_per_residue=0))
+        await ipr_scan._dispatch_batches(sequences, session, poller)
+        poller.close()
+
+    asyncio.run(_scan())
+    assert sorted(map(len, jobs.values())) == [1, 3, 3]
+    assert sum(' and ' not in title for title in titles) == 1  # A batch of one is titled by its sequence alone.
+    assert sorted(seq.name for seq in completed) == sorted(seq.name for seq in sequences)
+    assert all([(ft.name, ft.locations) for ft in seq.features] == [('family', [(1, 5)])] for seq in sequences)
+    assert journal.resumable(ipr_scan._job_key(sequences[0])) in jobs
+    journal.close()
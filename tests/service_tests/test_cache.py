@@ -0,0 +1,92 @@
+import threading
+
+from residual.protein_sequence import ProteinSequence
+from residual.services.cache import ResultCache
+from residual.services.interpro_scan import InterProScan, MatchParser
+
+_result = {'results': [{'matches': [{'signature': {'accession': 'PF00106', 'name': 'adh_short'},
+                                     'locations': [{'start': 5, 'end': 100}]}]}]}
+
+
+def test_cache_lookup_and_eviction(tmp_path) -> None:
+    cache = ResultCache(str(tmp_path / 'cache.db'), max_entries=2)
+    key = cache.make_key('abc', {'goterms': True})
+
+    assert key == cache.make_key('abc', {'goterms': True})
+    assert key != cache.make_key('abc', {'goterms': False})
+    assert cache.get(key) is None
+
+    cache.put(key, _result)
+    assert cache.get(key) == _result
+
+    cache.put('second', {})
+    cache.put('third', {})
+    assert len(cache) == 2
+    assert cache.get(key) is None  # Least recently used entry evicted.
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.ttl = -1  # Everything is now stale.
+    assert cache.evict() == 2 and len(cache) == 0
+    cache.close()
+
+
+def test_cache_sweep(tmp_path) -> None:
+    with ResultCache(str(tmp_path / 'cache.db'), sweep_every=3) as cache:
+        cache.put('first', {})
+        cache.put('first', {})  # Replaced, not counted twice.
+        assert len(cache) == 1
+        cache.ttl = -1
+        assert cache.get('first') is None and len(cache) == 1  # Stale, but only swept out...
+        cache.put('second', {})
+        assert len(cache) == 0  # ...on every third put.
+
+    with ResultCache(str(tmp_path / 'cache.db'), ttl=None) as cache:
+        cache.put('third', {})
+    with ResultCache(str(tmp_path / 'cache.db')) as cache:  # The count is read back on opening.
+        assert len(cache) == 1
+
+
+def test_cached_scan_skips_network(tmp_path) -> None:
+    cache = ResultCache(str(tmp_path / 'cache.db'))
+    ipr_scan = InterProScan(user_email='test@test.com', cache=cache)
+    seq = ProteinSequence('seq_1', 'MSFTLTNKNV')
+    cache.put(cache.make_key(seq.digest, ipr_scan.params), _result)
+
+    async def _fail(*_):
+        raise AssertionError('Network should not be used for cached sequences.')
+    ipr_scan._submit_sequence = _fail
+
+    threads = []
+
+    class RecordingParser(MatchParser):
+        def _parse_match(self, match):
+            threads.append(threading.get_ident())
+            return super()._parse_match(match)
+    ipr_scan.parser = RecordingParser()
+
+    ipr_scan.run([seq])
+    assert [ft.name for ft in seq.features] == ['adh_short']
+    assert threads and threading.get_ident() not in threads  # Parsed off the event loop.
+
+
+def test_clustered_scan_looks_up_once(tmp_path) -> None:
+    from residual.services.clustering import ClusterConfig
+
+    cache = ResultCache(str(tmp_path / 'cache.db'))
+    ipr_scan = InterProScan(user_email='test@test.com', cache=cache, clustering=ClusterConfig())
+    family = 'MSFTLTNKNVIFVAGLGGIGLDTSKELLKRDLKNLVILDRIENPAAIAE' * 2
+    sequences = [ProteinSequence('cached', 'MKV' * 30), ProteinSequence('rep', family),
+                 ProteinSequence('member', family[:-1] + 'W')]
+    cache.put(cache.make_key(sequences[0].digest, ipr_scan.params), _result)
+
+    scanned = []
+
+    async def _submit(_session, _poller, seq):
+        scanned.append(seq.name)
+    ipr_scan._submit_sequence = _submit
+
+    ipr_scan.run(sequences)
+    assert len(scanned) == 1
+    assert (cache.hits, cache.misses) == (1, 2)  # The representative isn't looked up again before its scan.
+    cache.close()
+    assert cache.hits == 1
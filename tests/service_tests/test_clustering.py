@@ -0,0 +1,49 @@
+import random
+
+from residual.protein_sequence import ProteinSequence, Feature
+from residual.protein_sequence.alphabet import ALPHABET
+from residual.protein_sequence.encoding import encode
+from residual.services.clustering import ClusterConfig, SequenceClusters, align
+
+
+def _variant(rng: random.Random, sequence: str, substitutions: int) -> str:
+    residues = list(sequence)
+    for i in rng.sample(range(len(residues)), substitutions):
+        residues[i] = rng.choice(ALPHABET.replace(residues[i], ''))
+    return ''.join(residues)
+
+
+def test_banded_alignment() -> None:
+    a = 'MSFTLTNKNVIFVAGLGGIGLDTSKELLKRDLKNLVILDRIENPAAIAE'
+    b = a[:10] + a[13:30] + 'WW' + a[30:]  # Three residues deleted, two inserted.
+
+    identity, mapping = align(encode(a), encode(b), band_width=8)
+    assert identity == (len(a) - 3) / len(a)
+    assert list(mapping[1:10]) == list(range(1, 10))
+    assert (mapping[1:] == 0).sum() == 3  # Deleted residues are aligned to gaps...
+    assert mapping[30] == 27 and mapping[31] == 30 and mapping[-1] == len(b)  # ...and the rest step over the insertion.
+
+    assert align(encode(a), encode(a[::-1]), band_width=8, min_identity=0.9) == (0.0, None)
+
+
+def test_clusters_and_transfer() -> None:
+    rng = random.Random(0)
+    families = [''.join(rng.choice(ALPHABET) for _ in range(length)) for length in (120, 200, 300)]
+    sequences = [ProteinSequence(f'seq_{i}', _variant(rng, families[i % 3], len(families[i % 3]) // 25))
+                 for i in range(30)]
+    sequences.append(ProteinSequence('short', 'MKV'))
+
+    clusters = SequenceClusters(sequences, ClusterConfig(identity=0.9))
+    assert len(clusters) == 4 and clusters.saved == 27
+    families_by_cluster = [{int(seq.name[4:]) % 3 for seq in (rep, *clusters.members(rep))}
+                           for rep in clusters.representatives if rep.name != 'short']
+    assert sorted(families_by_cluster, key=min) == [{0}, {1}, {2}]  # Each family forms a cluster of its own.
+
+    rep = next(rep for rep in clusters.representatives if len(rep) == 200)
+    rep.add_features([Feature('iprscan5', 'Domain', [(5, 60), (150, 190)]), Feature('iprscan5', 'Whole', [])])
+    members = clusters.transfer(rep, rep.features)
+    assert len(members) == 9
+    for seq in members:
+        assert [ft.locations for ft in seq.features] == [[(5, 60), (150, 190)], []]  # Substitutions only.
+        assert all(ft.inferred for ft in seq.features)
+    assert not any(ft.inferred for ft in rep.features)
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from aiohttp import web
+
+from residual.services.http_client import ClientPool, RateLimit, TokenBucket
+
+
+def test_token_bucket() -> None:
+    bucket = TokenBucket(RateLimit(rate=50, burst=5))
+
+    async def _acquire_all(n: int) -> float:
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(n)))
+        return time.monotonic() - start
+
+    assert asyncio.run(_acquire_all(5)) < 0.05  # Burst goes straight through...
+    assert asyncio.run(_acquire_all(10)) >= 0.15  # ...then requests are paced at the rate.
+
+    sent = time.monotonic()
+    assert bucket.throttle(retry_after=0, sent=sent)
+    assert not bucket.throttle(retry_after=0, sent=sent)  # In flight at the same time, so already accounted for.
+    assert bucket.rate == 25
+    for _ in range(300):
+        bucket.recover()
+    assert bucket.rate == 50
+
+
+def test_throttled_retry() -> None:
+    statuses = [429, 503, 200]
+
+    async def _handler(_):
+        return web.Response(status=statuses.pop(0), text='done', headers={'Retry-After': '0'})
+
+    async def _request():
+        app = web.Application()
+        app.router.add_get('/api/status', _handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        pool = ClientPool()
+        try:
+            async with pool.client(f'http://127.0.0.1:{port}/api/', RateLimit(rate=100, recovery=0)) as client:
+                async with client.get('status') as res:
+                    return res.status, await res.text(), client._host
+        finally:
+            await runner.cleanup()
+
+    status, text, host = asyncio.run(_request())
+    assert (status, text) == (200, 'done')
+    assert host.requests == 3
+    assert host.throttled == {429: 1, 503: 1}
+    assert host.bucket.rate == 25
+    assert host.session is None  # Closed once no longer in use.
+
+
+def test_stricter_limit() -> None:
+
+    async def _open():
+        pool = ClientPool()
+        async with pool.client('http://127.0.0.1:1/a/', RateLimit(rate=10)) as first:
+            async with pool.client('http://127.0.0.1:1/b/', RateLimit(rate=2, burst=1)):
+                ...
+            async with pool.client('http://127.0.0.1:1/c/', RateLimit(rate=5)):
+                ...
+            return first._host
+
+    host = asyncio.run(_open())
+    assert host.limit.rate == host.bucket.rate == 2
+    assert host.bucket.limit.burst == 1
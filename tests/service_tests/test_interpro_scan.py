@@ -25,3 +25,33 @@ def test_parse_match(_ipr_scan, _job_data) -> None:
     for ft in features:
         print(ft)
 
+
+def test_streamed_results(_ipr_scan) -> None:
+    matches = [{'signature': {'accession': f'PF{i:05}', 'name': f'family_{i}', 'description': 'Domain é {"[\\',
+                              'entry': {'accession': f'IPR{i:06}', 'description': f'Entry {i}',
+                                        'goXRefs': [{'id': 'GO:0016491', 'category': 'MOLECULAR_FUNCTION',
+                                                     'name': 'oxidoreductase activity', 'databaseName': 'GO'}]}},
+                'locations': [{'start': i + 1, 'end': i + 20, 'score': 1.5e-10}]} for i in range(20)]
+    data = {'interproscan-version': '5.67-99.0',
+            'results': [{'sequence': 'MSFTLTNKNV', 'md5': 'abc', 'matches': matches, 'xref': [{'id': 'seq_1'}]}]}
+    body = json.dumps(data, indent=1).encode()
+
+    stream = ResultStream(_ipr_scan.parser)
+    for i in range(0, len(body), 7):  # Chunks cut through keys, numbers and multibyte characters.
+        stream.feed(body[i:i + 7])
+    stream.close()
+
+    expected = json.loads(body)
+    assert stream.features[0] == _ipr_scan.parser(expected)
+    assert stream.data == expected
+    assert list(stream.split()) == ['seq_1']
+
+    stream = ResultStream(_ipr_scan.parser)
+    for i in range(len(body)):  # Each match spread over hundreds of chunks.
+        stream.feed(body[i:i + 1])
+    assert stream.close().data == expected
+
+    with pytest.raises(json.JSONDecodeError):
+        stream = ResultStream(_ipr_scan.parser)
+        stream.feed(body[:-10])
+        stream.close()
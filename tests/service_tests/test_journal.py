@@ -0,0 +1,53 @@
+import asyncio
+
+from residual.protein_sequence import ProteinSequence
+from residual.services.interpro_scan import InterProScan
+from residual.services.journal import JobJournal
+from residual.services.polling import StatusPoller
+
+_result = {'results': [{'matches': [{'signature': {'accession': 'PF00106', 'name': 'adh_short'},
+                                     'locations': [{'start': 5, 'end': 100}]}]}]}
+
+
+def _refuse(*_):
+    raise AssertionError('Recorded jobs should not be resubmitted.')
+
+
+def test_journal_resume(tmp_path) -> None:
+    path = str(tmp_path / 'jobs.jsonl')
+
+    with JobJournal(path) as journal:
+        journal.submitted('key_a', 'digest_a', 'job_a')
+        journal.submitted('key_b', 'digest_b', 'job_b')
+        journal.update('job_b', 'ERROR')
+    with open(path, 'a') as file:
+        file.write('{"key": "key_c", "job')  # Simulates a write cut off by the process dying.
+
+    with JobJournal(path, resume=True) as journal:
+        assert journal.resumable('key_a') == 'job_a'
+        assert journal.resumable('key_b') is None  # Failed jobs are resubmitted.
+        assert journal.resumable('key_c') is None
+        journal.submitted('key_d', 'digest_d', 'job_d')
+
+    with JobJournal(path, resume=True) as journal:  # The entry written after the cut-off one was kept.
+        assert journal.resumable('key_d') == 'job_d'
+
+    with JobJournal(path) as journal:  # Not resuming starts afresh.
+        assert journal.resumable('key_a') is None
+
+
+def test_reattach_to_recorded_job(tmp_path, fake_session) -> None:
+    seq = ProteinSequence('seq_1', 'MSFTLTNKNV')
+    journal = JobJournal(str(tmp_path / 'jobs.jsonl'))
+    ipr_scan = InterProScan(user_email='test@test.com', journal=journal)
+    journal.submitted(ipr_scan._job_key(seq), seq.digest, 'job_a')
+
+    async def _submit():
+        # Serves results for jobs that are already complete, and refuses any new submissions.
+        session = fake_session(get=lambda url: 'FINISHED' if url.startswith('status') else _result, post=_refuse)
+        return session, await ipr_scan._submit_sequence(session, StatusPoller(session), seq)
+
+    session, results = asyncio.run(_submit())
+    assert results.data == _result
+    assert session.urls == ['status/job_a', 'result/job_a/json']
+    journal.close()
@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+
+import pytest
+
+from residual.protein_sequence import ProteinSequence
+from residual.services.local_analysis import *
+
+# Soluble flanks around a 21-residue hydrophobic stretch.
+_tm_protein = 'MSDEKRNQ' + 'LLIVALLGFVAILLVGAIFAL' + 'KRDESNQEK'
+
+
+def test_hydropathy() -> None:
+    features = Hydropathy().analyse(_tm_protein)
+    assert len(features) == 1
+    start, end = features[0].locations[0]
+    assert 5 <= start <= 9 and 28 <= end <= 32
+    assert Hydropathy().analyse('MSDEKRNQ') == []  # Shorter than the window.
+    assert Hydropathy().analyse_chunk([_tm_protein, 'MSDEKRNQ', _tm_protein]) == [features, [], features]
+
+
+def test_low_complexity() -> None:
+    features = LowComplexity().analyse('MSTAGKVIKCLWEH' + 'Q' * 20 + 'MSTAGKVIKCLWEH')
+    assert [ft.locations for ft in features] == [[(10, 39)]]
+
+
+def test_composition() -> None:
+    assert Composition(top=2).analyse('AAAAGGC')[0].name == 'Most abundant: A 57.1%, G 28.6%'
+
+
+def test_physical_properties() -> None:
+    props = PhysicalProperties()
+    assert props.molecular_weight('ACDEFGHIKLMNPQRSTVWY') == pytest.approx(2395.7, abs=0.1)
+    assert props.isoelectric_point('KKKKKRRR') > 10
+    assert props.isoelectric_point('DDEEDDEE') < 4
+
+
+def test_pooled_run_matches_local_run() -> None:
+    local = [ProteinSequence('seq_1', _tm_protein), ProteinSequence('seq_2', 'MSFTLTNKNV')]
+    pooled = [ProteinSequence('seq_1', _tm_protein), ProteinSequence('seq_2', 'MSFTLTNKNV')]
+
+    service = Hydropathy()
+    service.chunk_size = 1
+    service.run(local)
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context('spawn')) as pool:
+        asyncio.run(service.arun(pooled, executor=pool))
+
+    assert [seq.features for seq in pooled] == [seq.features for seq in local]
@@ -0,0 +1,82 @@
+import asyncio
+
+from aiohttp import web
+
+from tests.mock_ebi import MockConfig, MockIprScan
+from residual.protein_sequence import ProteinSequence
+from residual.services.batching import BatchSizer
+from residual.services.http_client import RateLimit
+from residual.services.interpro_scan import InterProScan
+from residual.services.polling import PollingConfig
+
+
+def _scan(config: MockConfig, sequences: list[ProteinSequence], **options) -> MockIprScan:
+
+    mock = MockIprScan(config, fixtures=[])
+
+    async def _serve_and_scan():
+        runner = web.AppRunner(mock.app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            ipr_scan = InterProScan('test@test.com', base_url=f'http://127.0.0.1:{port}/',
+                                    rate_limit=RateLimit(rate=1000, burst=100, min_rate=100),
+                                    polling=PollingConfig(initial_delay=0.01, seconds_per_residue=0, max_delay=0.02),
+                                    **options)
+            await ipr_scan.arun(sequences)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(_serve_and_scan())
+    return mock
+
+
+def test_scan_against_mock() -> None:
+    sequences = [ProteinSequence(f'seq_{i}', 'MSFTLTNKNVIFVAGLGGIGLDTSKELLKRDLKNLVILDRIENPAAIAELKAINPKVTVTFYPYDVTVPIAETTKL'
+                                 * (i % 3 + 1)) for i in range(20)]
+    mock = _scan(MockConfig(latency=0.01), sequences)
+    assert mock.requests['run'] == mock.requests['result'] == 20
+    assert all(seq.features == sequences[i % 3].features for i, seq in enumerate(sequences))
+    assert any(seq.features for seq in sequences)
+
+
+def test_injected_errors() -> None:
+    clean, throttled = ([ProteinSequence(f'seq_{i}', 'MSFTLTNKNV' * (i + 1)) for i in range(30)] for _ in range(2))
+    _scan(MockConfig(latency=0.01), clean, batching=BatchSizer(max_sequences=5))
+    mock = _scan(MockConfig(latency=0.01, error_rate=0.3, error_statuses=(503,)), throttled,
+                 batching=BatchSizer(max_sequences=5))
+
+    assert mock.errors  # Throttled requests were retried...
+    assert [seq.features for seq in throttled] == [seq.features for seq in clean]  # ...until all results came back.
+
+
+def test_clustered_scan() -> None:
+    from residual.services.clustering import ClusterConfig
+
+    base = 'MSFTLTNKNVIFVAGLGGIGLDTSKELLKRDLKNLVILDRIENPAAIAELKAINPKVTVTFYPYDVTVPIAETTKL'
+    variants = [base[:i] + 'W' + base[i + 1:] for i in range(0, 40, 4)]  # Single substitutions.
+    sequences = [ProteinSequence(f'seq_{i}', sequence) for i, sequence in enumerate([base, *variants])]
+    mock = _scan(MockConfig(latency=0.01), sequences, clustering=ClusterConfig(identity=0.9))
+
+    assert mock.requests['run'] == 1
+    assert sequences[0].features and not any(ft.inferred for ft in sequences[0].features)
+    for seq in sequences[1:]:
+        assert [(ft.name, ft.locations) for ft in seq.features] == [(ft.name, ft.locations)
+                                                                     for ft in sequences[0].features]
+        assert all(ft.inferred for ft in seq.features)
+
+
+def test_mock_server() -> None:
+    from aiohttp import ClientSession
+    from tests.mock_ebi import mock_server
+
+    async def _stats(base_url: str) -> dict:
+        async with ClientSession() as session:
+            async with session.get(f'{base_url}stats') as res:
+                return await res.json()
+
+    with mock_server() as base_url:  # Listens on a free port, rather than a fixed one that may be taken.
+        assert not base_url.endswith(':0/')
+        assert asyncio.run(_stats(base_url))['jobs'] == 0
@@ -0,0 +1,67 @@
+import asyncio
+
+from residual.services.polling import PollingConfig, StatusPoller
+
+
+def _status_after(checks_needed: dict[str, int]):
+    """Status handler reporting each job as running until it has been checked a set number of times."""
+
+    def _get(url: str):
+        job_id = url.split('/')[-1]
+        checks_needed[job_id] -= 1
+        return 'FINISHED' if checks_needed[job_id] <= 0 else 'RUNNING'
+
+    return _get
+
+
+def test_delays() -> None:
+    config = PollingConfig(initial_delay=2, seconds_per_residue=0.01, backoff=2, max_delay=5, jitter=0)
+
+    assert config.first_delay(100) == 3
+    assert config.next_delay(2) == 4
+    assert config.next_delay(4) == 5  # Capped
+
+
+def test_shared_polling(fake_session) -> None:
+    session = fake_session(get=_status_after({'job_a': 1, 'job_b': 3, 'job_c': 2}))
+    config = PollingConfig(initial_delay=0.01, seconds_per_residue=0, backoff=1.5, max_delay=0.05)
+
+    async def _wait_all():
+        poller = StatusPoller(session, config)
+        statuses = await asyncio.gather(*(poller.wait(job_id, 50) for job_id in ('job_a', 'job_b', 'job_c')))
+        return poller, statuses
+
+    poller, statuses = asyncio.run(_wait_all())
+    assert statuses == ['FINISHED'] * 3
+    assert poller.requests == {'job_a': 1, 'job_b': 3, 'job_c': 2}
+    assert poller._task.done()
+
+
+def test_check_errors(fake_session) -> None:
+    checks_needed = {'job_a': 2, 'job_c': 1000}
+    status = _status_after(checks_needed)
+
+    def _flaky(url: str):
+        """Times out on the first check of job_a, and can't read job_b's status at all."""
+        job_id = url.split('/')[-1]
+        if job_id == 'job_b':
+            raise UnicodeDecodeError('utf-8', b'', 0, 1, 'bad body')
+        if checks_needed[job_id] == 2:
+            checks_needed[job_id] -= 1
+            raise TimeoutError
+        return status(url)
+
+    config = PollingConfig(initial_delay=0.01, seconds_per_residue=0, backoff=1, max_delay=0.01)
+
+    async def _wait_all():
+        poller = StatusPoller(fake_session(get=_flaky), config)
+        stuck = asyncio.create_task(poller.wait('job_c'))
+        await asyncio.sleep(0.05)
+        stuck.cancel()  # A cancelled waiter's job stops being checked.
+        results = await asyncio.gather(poller.wait('job_a'), poller.wait('job_b'), return_exceptions=True)
+        return poller, results
+
+    poller, (status_a, error_b) = asyncio.run(asyncio.wait_for(_wait_all(), 5))
+    assert status_a == 'FINISHED' and poller.requests['job_a'] == 2
+    assert isinstance(error_b, UnicodeDecodeError)
+    assert 'job_c' not in poller._pending